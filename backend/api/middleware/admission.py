@@ -0,0 +1,140 @@
+"""
+Admission middleware — rate limits LLM-backed requests before any work is done.
+
+For POSTs under ADMISSION_PATHS it reads the (small) JSON body once to
+find the learner_id(s) and the batch size, charges the tenant and learner
+token buckets (services.admission) and answers 429 + Retry-After straight
+away when one is empty. The buffered body is replayed to the app, and the
+tenant is put in context so the app's LLM calls queue fairly.
+
+Bodies over ADMISSION_MAX_BODY_BYTES are answered 413 without being
+parsed — otherwise padding a batch would make it free.
+"""
+
+import json
+import os
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.admission import (
+    ADMISSION_ENABLED,
+    AdmissionRejected,
+    get_rate_limiter,
+    resolve_tenant,
+    retry_after_header,
+    tenant_scope,
+)
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional — stdlib json is fine for bodies this size
+    _loads = json.loads
+
+ADMISSION_PATHS          = tuple(p for p in os.getenv("ADMISSION_PATHS", "/explain,/practice").split(",") if p)
+ADMISSION_MAX_BODY_BYTES = int(os.getenv("ADMISSION_MAX_BODY_BYTES", str(1024 * 1024)))
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def request_cost(body: bytes) -> tuple[dict[str, float], float]:
+    """
+    ({learner id: cost}, total cost): a batch costs the tenant one token per
+    item and each learner one per item of theirs.
+    """
+    if len(body) > ADMISSION_MAX_BODY_BYTES:
+        raise BodyTooLarge(f"Request body over {ADMISSION_MAX_BODY_BYTES} bytes")
+    if not body:
+        return {}, 1.0
+    try:
+        data = _loads(body)
+    except ValueError:
+        return {}, 1.0  # let validation answer 422
+    if not isinstance(data, dict):
+        return {}, 1.0
+    items = data.get("items")
+    if isinstance(items, list):
+        learners: dict[str, float] = {}
+        for item in items:
+            learner_id = item.get("learner_id") if isinstance(item, dict) else None
+            if isinstance(learner_id, str) and learner_id:
+                learners[learner_id] = learners.get(learner_id, 0.0) + 1.0
+        return learners, float(max(1, len(items)))
+    learner_id = data.get("learner_id")
+    return ({learner_id: 1.0} if isinstance(learner_id, str) and learner_id else {}), 1.0
+
+
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        client = scope.get("client")
+        tenant = resolve_tenant(
+            headers.get("x-api-key"), client[0] if client else None, headers.get("x-forwarded-for"),
+        )
+
+        if scope["method"] != "POST" or not scope["path"].startswith(ADMISSION_PATHS):
+            with tenant_scope(tenant):
+                await self.app(scope, receive, send)
+            return
+
+        declared = headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > ADMISSION_MAX_BODY_BYTES:
+            await _reject(send, f"Request body over {ADMISSION_MAX_BODY_BYTES} bytes", status=413)
+            return
+
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body and size <= ADMISSION_MAX_BODY_BYTES:
+            message = await receive()
+            if message["type"] != "http.request":
+                break  # disconnected before sending the body
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        try:
+            learner_costs, cost = request_cost(body)
+            get_rate_limiter().admit(tenant, learner_costs, cost)
+        except BodyTooLarge as e:
+            await _reject(send, str(e), status=413)
+            return
+        except AdmissionRejected as e:
+            await _reject(send, str(e), e.retry_after)
+            return
+
+        replayed = False
+
+        async def replay() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        with tenant_scope(tenant):
+            await self.app(scope, replay, send)
+
+
+async def _reject(send: Send, detail: str, retry_after: Optional[float] = None, status: int = 429) -> None:
+    content = {"detail": detail}
+    headers = [(b"content-type", b"application/json")]
+    if retry_after is not None:
+        content["retry_after"] = round(retry_after, 3)
+        headers.append((b"retry-after", retry_after_header(retry_after).encode("latin-1")))
+    payload = json.dumps(content).encode("utf-8")
+    headers.append((b"content-length", str(len(payload)).encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": payload})
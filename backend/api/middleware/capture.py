@@ -0,0 +1,83 @@
+"""
+Capture middleware — records sampled request bodies for traffic replay
+(services.capture). A no-op unless CAPTURE_ENABLED.
+
+The body is copied as the app reads it (nothing is buffered ahead of the
+app) and recorded, anonymized, once the response has been sent, together
+with the status and the time to the last byte. Bodies that are not a JSON
+object or exceed CAPTURE_MAX_BODY_BYTES are skipped.
+"""
+
+import json
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.capture import (
+    CAPTURE_ENABLED,
+    CAPTURE_MAX_BODY_BYTES,
+    capture_paths,
+    capture_scope,
+    get_capture_recorder,
+)
+from services.tracing import current_request_id
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional — stdlib json is fine for bodies this size
+    _loads = json.loads
+
+
+class CaptureMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.paths = capture_paths()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_id = current_request_id()
+        if (
+            not CAPTURE_ENABLED
+            or scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"].rstrip("/") not in self.paths
+            or request_id is None
+            or not get_capture_recorder().sampled(request_id)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        started_wall, started = time.time(), time.perf_counter()
+        chunks: list[bytes] = []
+        size = 0
+        status = 500
+
+        async def copying_receive() -> Message:
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request" and size <= CAPTURE_MAX_BODY_BYTES:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                chunks.append(chunk)
+            return message
+
+        async def status_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            with capture_scope(request_id):
+                await self.app(scope, copying_receive, status_send)
+        finally:
+            if size <= CAPTURE_MAX_BODY_BYTES:
+                try:
+                    body = _loads(b"".join(chunks))
+                except ValueError:
+                    body = None
+                if isinstance(body, dict):
+                    get_capture_recorder().record_request(
+                        request_id, scope["path"], started_wall, body, status,
+                        (time.perf_counter() - started) * 1000,
+                    )
@@ -0,0 +1,158 @@
+"""
+Compression middleware — negotiated brotli/gzip response compression.
+
+- Picks the encoding from Accept-Encoding (q-values honoured): brotli when
+  the optional `brotli` package is installed and accepted, else gzip.
+- Bodies under COMPRESSION_MIN_BYTES are sent as-is (framing overhead
+  would outweigh the saving).
+- Streaming responses are compressed chunk by chunk with a sync flush, so
+  each chunk still reaches the client as soon as it is produced.
+- Only text-like content types are touched; responses that already carry
+  a Content-Encoding pass through.
+"""
+
+import gzip
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional — gzip only
+    brotli = None
+
+COMPRESSION_MIN_BYTES     = int(os.getenv("COMPRESSION_MIN_BYTES", "500"))
+COMPRESSION_GZIP_LEVEL    = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# brotli 4-5 is roughly gzip-6 speed with noticeably smaller output on text
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+_COMPRESSIBLE_PREFIXES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Best encoding we support from an Accept-Encoding header, or None."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name.lower()] = q
+
+    def q_for(encoding: str) -> float:
+        return offered.get(encoding, offered.get("*", 0.0))
+
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=q_for)  # ties keep the preferred (earlier) one
+    return best if q_for(best) > 0 else None
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressedResponder:
+    """Per-request state: holds the start message until the first body chunk decides."""
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Message | None = None
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or not content_type.startswith(_COMPRESSIBLE_PREFIXES)
+            )
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            if self.start is not None:
+                await self.send(self.start)
+                self.start = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            # First body chunk: decide whether to compress at all
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.start)
+                self.start = None
+                await self.send(message)
+                self.passthrough = True
+                return
+
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                compressed = self._compress_whole(body)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start)
+                self.start = None
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            del headers["Content-Length"]
+            self.compressor = self._stream_compressor()
+            await self.send(self.start)
+            self.start = None
+
+        await self.send({
+            "type": "http.response.body",
+            "body": self.compressor(body, finish=not more_body),
+            "more_body": more_body,
+        })
+
+    def _compress_whole(self, body: bytes) -> bytes:
+        if self.encoding == "br":
+            return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+    def _stream_compressor(self):
+        if self.encoding == "br":
+            c = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+            def compress(chunk: bytes, finish: bool) -> bytes:
+                out = c.process(chunk)
+                return out + (c.finish() if finish else c.flush())
+        else:
+            c = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+            def compress(chunk: bytes, finish: bool) -> bytes:
+                out = c.compress(chunk)
+                return out + c.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+        return compress
@@ -0,0 +1,80 @@
+"""
+Deadline middleware — gives every request a latency budget and stops work
+nobody is waiting for.
+
+- Sets the request deadline (services.deadline) from X-Request-Timeout-Ms
+  or the endpoint default before the app runs.
+- Once the request body has been read, watches for http.disconnect. If the
+  client goes away before the response is complete, it flags the request
+  as cancelled (no new LLM calls start; worker threads finish their
+  current call and stop) and cancels the route.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.deadline import REQUEST_TIMEOUT_HEADER, budget_for, deadline_scope
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = budget_for(scope["path"], Headers(scope=scope).get(REQUEST_TIMEOUT_HEADER))
+        cancelled = threading.Event()
+        body_read = asyncio.Event()
+        response_done = False
+        started = time.monotonic()
+
+        async def tracking_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                body_read.set()
+            elif message["type"] == "http.disconnect":
+                cancelled.set()
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_done
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_done = True
+            await send(message)
+
+        with deadline_scope(budget, cancelled):
+            # The task copies the current context, deadline included
+            app_task = asyncio.create_task(self.app(scope, tracking_receive, tracking_send))
+
+        async def watch_disconnect() -> None:
+            await body_read.wait()
+            # Servers only answer this once the client has gone (or the response is complete)
+            message = await receive()
+            if message["type"] == "http.disconnect" and not response_done and not app_task.done():
+                cancelled.set()
+                app_task.cancel()
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not cancelled.is_set():
+                raise  # we were cancelled ourselves, not the client
+            logger.info(
+                f"Client disconnected from {scope['method']} {scope['path']} after "
+                f"{(time.monotonic() - started) * 1000:.0f}ms; request cancelled"
+            )
+        finally:
+            watcher.cancel()
+            if not app_task.done():
+                app_task.cancel()
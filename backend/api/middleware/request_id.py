@@ -0,0 +1,53 @@
+"""
+Request-ID middleware — correlates logs, traces and clients.
+
+- Reuses the caller's X-Request-ID (when it looks sane) or mints one, and
+  echoes it on the response.
+- Opens the request's root span (services.tracing) for the whole ASGI
+  call, so streamed bodies are timed to their last chunk; the trace is
+  exported / slow-logged when the response finishes.
+"""
+
+import re
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.tracing import finish_trace, start_trace
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Anything else (too long, odd characters) is replaced rather than logged verbatim
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class RequestIdMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = Headers(scope=scope).get(REQUEST_ID_HEADER, "")
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        trace, root, tokens = start_trace(
+            request_id, f"{scope['method']} {scope['path']}",
+            method=scope["method"], path=scope["path"],
+        )
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(raw=message["headers"])[REQUEST_ID_HEADER] = request_id
+                root.set(status_code=message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            finish_trace(trace, root, tokens)
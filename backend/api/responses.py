@@ -0,0 +1,68 @@
+"""
+Responses — the app-wide JSON response class and `fields=` projection.
+
+- JSON_RESPONSE_CLASS: orjson-backed ORJSONResponse when orjson is
+  installed (several times faster to render), plain JSONResponse otherwise.
+- project(): opt-in sparse fieldsets. `fields=explanation,key_insight`
+  keeps only those keys; dotted paths reach into nested objects and lists
+  (`questions.question,questions.options`).
+"""
+
+from typing import Optional
+
+from fastapi import HTTPException, Query, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson  # noqa: F401 — ORJSONResponse needs it at render time
+    from fastapi.responses import ORJSONResponse as JSON_RESPONSE_CLASS
+except ImportError:
+    JSON_RESPONSE_CLASS = JSONResponse
+
+FIELDS_QUERY = Query(
+    None,
+    description="Comma-separated fields to return (dotted paths for nested ones), e.g. "
+                "`explanation,key_insight`. Omit for the full response.",
+)
+
+
+def project(model: BaseModel, fields: Optional[str]):
+    """`model` unchanged when `fields` is empty, else a response holding only those fields."""
+    if not fields:
+        return model
+    tree = _parse_fields(fields)
+    data = model.model_dump(mode="json")
+    return JSON_RESPONSE_CLASS(content=_apply(data, tree, ""))
+
+
+def _parse_fields(fields: str) -> dict:
+    tree: dict = {}
+    for path in fields.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for part in path.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _apply(data, tree: dict, prefix: str):
+    if isinstance(data, list):
+        return [_apply(item, tree, prefix) for item in data]
+    if not isinstance(data, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"fields: '{prefix}' has no sub-fields",
+        )
+    out = {}
+    for key, subtree in tree.items():
+        if key not in data:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"fields: unknown field '{prefix}{key}'",
+            )
+        value = data[key]
+        out[key] = _apply(value, subtree, f"{prefix}{key}.") if subtree and value is not None else value
+    return out
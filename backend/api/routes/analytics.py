@@ -0,0 +1,57 @@
+"""
+/analytics endpoints — instructor-facing cohort rollups.
+"""
+
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from models.schemas import CohortAnalyticsResponse, CohortConceptStats, CohortTrendPoint
+from memory.cohort_analytics import ALL_COHORTS, get_cohort_analytics
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+@router.get(
+    "/cohort",
+    response_model=CohortAnalyticsResponse,
+    summary="Which concepts a cohort is most confused about, and how",
+    description=(
+        "Top concepts by explanation sessions with confusion-type breakdown and "
+        "mastery rates, plus a per-day confusion trend. Served from pre-aggregated "
+        "rollups; omit cohort_id for all learners."
+    ),
+)
+async def cohort_analytics(
+    cohort_id: Optional[str] = Query(None, description="Cohort/class ID; omit for all learners"),
+    top: int = Query(10, ge=1, le=100),
+    days: int = Query(14, ge=1, le=365),
+) -> CohortAnalyticsResponse:
+    try:
+        # SQLite may wait on the writer's lock: not on the event loop
+        summary = await asyncio.to_thread(
+            get_cohort_analytics().cohort_summary, cohort_id or ALL_COHORTS, top=top, days=days,
+        )
+    except sqlite3.Error as e:
+        logger.exception(f"Error in /analytics/cohort: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        )
+
+    return CohortAnalyticsResponse(
+        cohort_id=summary["cohort_id"],
+        concepts=[CohortConceptStats(**c) for c in summary["concepts"]],
+        trend=[
+            CohortTrendPoint(
+                bucket_start=datetime.fromtimestamp(t["bucket_start"], tz=timezone.utc),
+                confusion_counts=t["confusion_counts"],
+            )
+            for t in summary["trend"]
+        ],
+    )
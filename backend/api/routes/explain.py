@@ -3,17 +3,81 @@
 POST /explain → detect confusion → select strategy → generate explanation
 """
 
+import asyncio
 import logging
+import os
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, status
 
-from models.schemas import ExplainRequest, ExplainResponse, DiagnosisResult
+from models.schemas import (
+    ExplainRequest, ExplainResponse, DiagnosisResult,
+    ExplainBatchRequest, ExplainBatchResponse, ExplainBatchItem,
+)
 from core.confusion_detector import detect_confusion
+from core.input_processor import prepare_code_snippet
 from core.explanation_generator import generate_explanation
-from memory.learner_memory import get_memory
+from memory.learner_memory import Interaction, LearnerMemory, get_memory
+from api.responses import FIELDS_QUERY, project
+from services.deadline import has_budget, stage
+from services.usage import QuotaExceeded, get_usage_meter, usage_scope
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/explain", tags=["Explanation"])
 
+# Max pipelines in flight per batch request (each is two LLM calls)
+EXPLAIN_BATCH_CONCURRENCY = int(os.getenv("EXPLAIN_BATCH_CONCURRENCY", "4"))
+# Most of the request deadline diagnosis may use, so the explanation keeps the rest
+DEADLINE_DIAGNOSIS_SHARE = float(os.getenv("DEADLINE_DIAGNOSIS_SHARE", "0.4"))
+
+
+def _follow_up_context(request: ExplainRequest, memory: Optional[LearnerMemory]) -> Optional[dict]:
+    """The explanation this doubt follows up on, if any (see ExplainRequest.follow_up)."""
+    if memory is None or request.follow_up is False:
+        return None
+    return memory.get_follow_up_context(request.concept)
+
+
+def _run_pipeline(
+    request: ExplainRequest,
+    learner_context: Optional[str],
+    previous_explanation: Optional[dict] = None,
+) -> tuple[DiagnosisResult, ExplainResponse]:
+    """Diagnose + explain one doubt. Blocking (two LLM calls)."""
+    with usage_scope(learner_id=request.learner_id, concept=request.concept):
+        # Step 0: Clean and cut the snippet once; both prompts get the same one
+        code_snippet = prepare_code_snippet(request.code_snippet, request.user_doubt, request.concept)
+
+        # Step 1: Diagnose confusion (UNKNOWN if it runs out of its share)
+        with stage(DEADLINE_DIAGNOSIS_SHARE):
+            diagnosis = detect_confusion(
+                concept=request.concept,
+                user_doubt=request.user_doubt,
+                code_snippet=code_snippet,
+                learner_context=learner_context,
+            )
+
+        # Step 2 + 3: Generate explanation
+        response = generate_explanation(
+            concept=request.concept,
+            user_doubt=request.user_doubt,
+            confusion_type=diagnosis.confusion_type,
+            code_snippet=code_snippet,
+            difficulty_level=request.difficulty_level or "beginner",
+            learner_context=learner_context,
+            previous_explanation=previous_explanation,
+        )
+    return diagnosis, response
+
+
+def _diagnose(request: ExplainRequest) -> DiagnosisResult:
+    """Diagnosis only. Blocking (one LLM call)."""
+    return detect_confusion(
+        concept=request.concept,
+        user_doubt=request.user_doubt,
+        code_snippet=prepare_code_snippet(request.code_snippet, request.user_doubt, request.concept),
+    )
+
 
 @router.post(
     "",
@@ -24,45 +88,44 @@ router = APIRouter(prefix="/explain", tags=["Explanation"])
         "explanation strategy, and returns a personalized explanation."
     ),
 )
-async def explain_concept(request: ExplainRequest) -> ExplainResponse:
+async def explain_concept(request: ExplainRequest, fields: Optional[str] = FIELDS_QUERY) -> ExplainResponse:
     """
     Full pipeline:
     1. Detect confusion type from learner input
     2. Select best explanation strategy
     3. Generate adaptive explanation
     4. Optionally store in learner memory
+
+    The learner's memory is loaded once up front: its precomputed profile
+    personalizes both prompts, and the same instance records the session.
     """
     logger.info(f"Explain request: concept='{request.concept}', learner='{request.learner_id}'")
+    get_usage_meter().check_quota(request.learner_id)  # QuotaExceeded -> 429 (main.py)
 
     try:
-        # Step 1: Diagnose confusion
-        diagnosis: DiagnosisResult = detect_confusion(
-            concept=request.concept,
-            user_doubt=request.user_doubt,
-            code_snippet=request.code_snippet,
-        )
+        # File and SQLite I/O: keep it off the event loop
+        memory = await asyncio.to_thread(get_memory, request.learner_id, request.cohort_id)
+        learner_context = memory.get_prompt_context() if memory else None
+        previous = _follow_up_context(request, memory)
 
-        # Step 2 + 3: Generate explanation
-        response: ExplainResponse = generate_explanation(
-            concept=request.concept,
-            user_doubt=request.user_doubt,
-            confusion_type=diagnosis.confusion_type,
-            code_snippet=request.code_snippet,
-            difficulty_level=request.difficulty_level or "beginner",
-        )
+        # Steps 1-3: Diagnose, select strategy, explain (a delta for follow-ups).
+        # In a thread: waiting for an LLM slot must not block the event loop.
+        with usage_scope(endpoint="/explain"):
+            diagnosis, response = await asyncio.to_thread(_run_pipeline, request, learner_context, previous)
 
-        # Step 4: Persist to learner memory (optional)
-        memory = get_memory(request.learner_id)
-        if memory:
-            memory.record_session(
+        # Step 4: Persist to learner memory (optional — skipped when out of time)
+        if memory and not has_budget():
+            logger.warning(f"Deadline nearly spent; not recording session for learner '{request.learner_id}'")
+        elif memory:
+            await asyncio.to_thread(
+                memory.record_session,
                 concept=request.concept,
                 confusion_type=diagnosis.confusion_type,
                 strategy_used=response.strategy_used.value,
                 explanation=response.explanation,
+                follow_up=previous is not None,
             )
 
-        return response
-
     except Exception as e:
         logger.exception(f"Unexpected error in /explain: {e}")
         raise HTTPException(
@@ -70,6 +133,111 @@ async def explain_concept(request: ExplainRequest) -> ExplainResponse:
             detail=f"Failed to generate explanation: {str(e)}",
         )
 
+    return project(response, fields)
+
+
+@router.post(
+    "/batch",
+    response_model=ExplainBatchResponse,
+    summary="Explain several doubts in one request",
+    description=(
+        "Runs the /explain pipeline for every item concurrently (bounded by "
+        "EXPLAIN_BATCH_CONCURRENCY). Identical items are answered once, failures "
+        "are reported per item, and learner memory is written once per learner."
+    ),
+)
+async def explain_batch(request: ExplainBatchRequest, fields: Optional[str] = FIELDS_QUERY) -> ExplainBatchResponse:
+    items = request.items
+    logger.info(f"Explain batch: {len(items)} item(s)")
+
+    # Load each learner's memory once; it personalizes all of their items
+    memories: dict[str, LearnerMemory] = {}
+    failed_learners: dict[str, str] = {}
+    for item in items:
+        lid = item.learner_id
+        if not lid or lid in memories or lid in failed_learners:
+            continue
+        try:
+            get_usage_meter().check_quota(lid)
+        except QuotaExceeded as e:
+            failed_learners[lid] = str(e)
+            continue
+        cohort_id = next((i.cohort_id for i in items if i.learner_id == lid and i.cohort_id), None)
+        try:
+            memories[lid] = await asyncio.to_thread(get_memory, lid, cohort_id)
+        except Exception as e:
+            logger.exception(f"Could not load memory for learner {lid}: {e}")
+            failed_learners[lid] = f"Failed to load learner memory: {e}"
+
+    # Items with the same prompt inputs get the same answer — run each once
+    unique: dict[tuple, tuple[ExplainRequest, Optional[str], Optional[dict]]] = {}
+    keys: list[Optional[tuple]] = []
+    for item in items:
+        if item.learner_id in failed_learners:
+            keys.append(None)
+            continue
+        memory = memories.get(item.learner_id) if item.learner_id else None
+        learner_context = memory.get_prompt_context() if memory else None
+        previous = _follow_up_context(item, memory)
+        key = (
+            item.concept, item.user_doubt, item.code_snippet,
+            item.difficulty_level or "beginner", learner_context or "",
+            previous["explanation"] if previous else "",
+        )
+        unique.setdefault(key, (item, learner_context, previous))
+        keys.append(key)
+
+    semaphore = asyncio.Semaphore(EXPLAIN_BATCH_CONCURRENCY)
+
+    async def run(item: ExplainRequest, learner_context: Optional[str], previous: Optional[dict]):
+        async with semaphore:
+            with usage_scope(endpoint="/explain/batch"):
+                return await asyncio.to_thread(_run_pipeline, item, learner_context, previous)
+
+    outcomes = dict(zip(
+        unique,
+        await asyncio.gather(*(run(*args) for args in unique.values()), return_exceptions=True),
+    ))
+
+    results: list[ExplainBatchItem] = []
+    sessions: dict[str, dict[tuple, Interaction]] = {}
+    for index, (item, key) in enumerate(zip(items, keys)):
+        if key is None:
+            results.append(ExplainBatchItem(index=index, error=failed_learners[item.learner_id]))
+            continue
+        outcome = outcomes[key]
+        if isinstance(outcome, Exception):
+            logger.error(f"Explain batch item {index} failed: {outcome}")
+            results.append(ExplainBatchItem(index=index, error=f"Failed to generate explanation: {outcome}"))
+            continue
+        diagnosis, response = outcome
+        results.append(ExplainBatchItem(index=index, response=response))
+        if item.learner_id:
+            # A learner repeating the same doubt in one batch is one session
+            sessions.setdefault(item.learner_id, {})[key] = Interaction(
+                item.concept, diagnosis.confusion_type,
+                response.strategy_used.value, response.explanation,
+                follow_up=bool(key[-1]),
+            )
+
+    # One commit per learner for all of their sessions (optional — skipped when out of time)
+    if sessions and not has_budget():
+        logger.warning(f"Deadline nearly spent; not recording batch sessions for {len(sessions)} learners")
+        sessions = {}
+    for lid, learner_sessions in sessions.items():
+        try:
+            await asyncio.to_thread(memories[lid].record_sessions, list(learner_sessions.values()))
+        except Exception as e:
+            logger.exception(f"Could not record batch sessions for learner {lid}: {e}")
+
+    failed = sum(1 for r in results if r.error)
+    return project(ExplainBatchResponse(
+        results=results,
+        succeeded=len(results) - failed,
+        failed=failed,
+        deduplicated=sum(1 for k in keys if k is not None) - len(unique),
+    ), fields)
+
 
 @router.post(
     "/diagnose",
@@ -79,12 +247,10 @@ async def explain_concept(request: ExplainRequest) -> ExplainResponse:
 )
 async def diagnose_only(request: ExplainRequest) -> DiagnosisResult:
     """Return only the confusion diagnosis without generating an explanation."""
+    get_usage_meter().check_quota(request.learner_id)
     try:
-        return detect_confusion(
-            concept=request.concept,
-            user_doubt=request.user_doubt,
-            code_snippet=request.code_snippet,
-        )
+        with usage_scope(endpoint="/explain/diagnose", learner_id=request.learner_id, concept=request.concept):
+            return await asyncio.to_thread(_diagnose, request)
     except Exception as e:
         logger.exception(f"Error in /explain/diagnose: {e}")
         raise HTTPException(
@@ -0,0 +1,65 @@
+"""
+/health endpoints — liveness and readiness probes for the load balancer.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Response, status
+
+from models.schemas import HealthResponse, ReadinessResponse
+from services.health import readiness_report
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/health", tags=["Health"])
+
+API_VERSION = "1.0.0"
+
+
+@router.get(
+    "/live",
+    response_model=HealthResponse,
+    summary="Liveness probe",
+    description="The process is up and serving HTTP. Never touches dependencies.",
+)
+async def live() -> HealthResponse:
+    return HealthResponse(status="ok", version=API_VERSION)
+
+
+@router.get(
+    "/ready",
+    response_model=ReadinessResponse,
+    summary="Readiness probe",
+    description=(
+        "200 once startup warm-up has finished and required dependencies respond, "
+        "503 otherwise. Reports per-dependency latency; a failing optional LLM probe "
+        "shows as 'degraded' without taking the pod out of rotation."
+    ),
+    responses={503: {"model": ReadinessResponse, "description": "Warming up or a required dependency is down"}},
+)
+async def ready(response: Response) -> ReadinessResponse:
+    report = await asyncio.to_thread(readiness_report)
+    if not report["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    warmup = report["warmup"]
+    return ReadinessResponse(
+        status=report["status"],
+        ready=report["ready"],
+        version=API_VERSION,
+        warmup={
+            **warmup,
+            "started_at": _utc(warmup["started_at"]),
+            "finished_at": _utc(warmup["finished_at"]),
+        },
+        dependencies={
+            name: {**dep, "checked_at": _utc(dep["checked_at"])}
+            for name, dep in report["dependencies"].items()
+        },
+    )
+
+
+def _utc(ts: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(ts, tz=timezone.utc) if ts is not None else None
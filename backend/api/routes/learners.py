@@ -0,0 +1,47 @@
+"""
+/learners endpoints — per-learner data export.
+"""
+
+import asyncio
+import logging
+
+from fastapi import APIRouter, HTTPException, status
+
+from models.schemas import LearnerHistoryResponse
+from memory.learner_memory import LearnerMemory
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/learners", tags=["Learners"])
+
+
+@router.get(
+    "/{learner_id}/history",
+    response_model=LearnerHistoryResponse,
+    summary="Export a learner's full session history",
+    description=(
+        "Every recorded session, including those archived out of the hot window, "
+        "plus the per-concept weekly rollups. Archive segments are only read for this export."
+    ),
+)
+async def export_history(learner_id: str) -> LearnerHistoryResponse:
+    try:
+        # File reads and archive decompression: keep them off the event loop
+        return await asyncio.to_thread(_load_history, learner_id)
+    except Exception as e:
+        logger.exception(f"Error in /learners/{learner_id}/history: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        )
+
+
+def _load_history(learner_id: str) -> LearnerHistoryResponse:
+    memory = LearnerMemory(learner_id)
+    sessions = list(memory.get_full_history())
+    return LearnerHistoryResponse(
+        learner_id=learner_id,
+        total_sessions=memory.get_learner_context()["total_sessions"],
+        archived_sessions=memory.archived_session_count,
+        rollups=memory.get_rollups(),
+        sessions=sessions,
+    )
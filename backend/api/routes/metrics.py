@@ -0,0 +1,90 @@
+"""
+/metrics endpoints — operational counters for tuning the LLM pipeline.
+"""
+
+import logging
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from models.schemas import CacheReport, CpuPoolReport, TokenBudgetReport, UsageReport
+from services.cache import cache_report
+from services.cpu_pool import cpu_pool_report
+from services.token_budget import get_token_budgeter
+from services.usage import GROUP_BY_OPTIONS, USAGE_BUCKET_SECONDS, get_usage_meter
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get(
+    "/token-budget",
+    response_model=TokenBudgetReport,
+    summary="Per-call-site max_tokens budgets and what they saved",
+    description=(
+        "Reports the max_tokens budget in use for each call site bucket, observed "
+        "p95 completion lengths, truncation retries, and estimated tokens/latency saved "
+        "versus the single global LLM_MAX_TOKENS."
+    ),
+)
+async def token_budget_report() -> TokenBudgetReport:
+    return TokenBudgetReport(**get_token_budgeter().report())
+
+
+@router.get(
+    "/cache",
+    response_model=CacheReport,
+    summary="Hit rates of the two-tier result cache, per namespace",
+    description=(
+        "Local (in-process) and shared-tier hits, misses, negative entries and "
+        "stampede waits for each cache namespace this worker has used."
+    ),
+)
+async def cache_stats() -> CacheReport:
+    return CacheReport(namespaces=cache_report())
+
+
+@router.get(
+    "/cpu-pool",
+    response_model=CpuPoolReport,
+    summary="CPU task pool: mode, backlog and per-task timing",
+    description=(
+        "Where each registered CPU task ran (pool, inline, or inline because "
+        "the pool was full), with queue and run times, for this worker."
+    ),
+)
+async def cpu_pool_stats() -> CpuPoolReport:
+    return CpuPoolReport(**cpu_pool_report())
+
+
+@router.get(
+    "/usage",
+    response_model=UsageReport,
+    summary="LLM token usage and cost by learner, concept, strategy and time",
+    description=(
+        "Aggregated prompt/completion tokens and estimated cost, grouped by any of "
+        f"{', '.join(GROUP_BY_OPTIONS)}. Pending in-process counts are flushed first."
+    ),
+)
+async def usage_report(
+    group_by: str = Query("endpoint,strategy", description=f"Comma-separated: {', '.join(GROUP_BY_OPTIONS)}"),
+    since_hours: float = Query(24, gt=0, description="Look-back window"),
+    bucket_seconds: int = Query(USAGE_BUCKET_SECONDS, description="Time bucket width when grouping by bucket"),
+    learner_id: Optional[str] = None,
+    concept: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+) -> UsageReport:
+    dimensions = tuple(g.strip() for g in group_by.split(",") if g.strip())
+    try:
+        report = get_usage_meter().report(
+            group_by=dimensions,
+            since=time.time() - since_hours * 3600,
+            bucket_seconds=bucket_seconds,
+            learner_id=learner_id,
+            concept=concept,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return UsageReport(**report)
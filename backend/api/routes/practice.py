@@ -2,8 +2,13 @@
 /practice endpoint — generate micro-practice questions + evaluate answers.
 """
 
+import asyncio
 import logging
+import threading
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 
 from models.schemas import (
     PracticeRequest,
@@ -11,12 +16,17 @@ from models.schemas import (
     FeedbackRequest,
     FeedbackResponse,
 )
-from core.practice_generator import generate_practice_questions, evaluate_answer
+from core.practice_generator import generate_practice_questions, stream_practice_questions, evaluate_answer
 from memory.learner_memory import get_memory
+from api.responses import FIELDS_QUERY, project
+from services.usage import get_usage_meter, usage_scope
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/practice", tags=["Practice"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+_END_OF_STREAM = object()
+
 
 @router.post(
     "",
@@ -27,20 +37,23 @@ router = APIRouter(prefix="/practice", tags=["Practice"])
         "and the explanation already shown to the learner."
     ),
 )
-async def get_practice_questions(request: PracticeRequest) -> PracticeResponse:
+async def get_practice_questions(request: PracticeRequest, fields: Optional[str] = FIELDS_QUERY) -> PracticeResponse:
     """
     Generate 1-5 micro-practice questions targeted at the diagnosed confusion type.
     """
     logger.info(f"Practice request: concept='{request.concept}', confusion='{request.confusion_type}'")
+    get_usage_meter().check_quota(request.learner_id)  # QuotaExceeded -> 429 (main.py)
 
     try:
-        return generate_practice_questions(
-            concept=request.concept,
-            confusion_type=request.confusion_type,
-            explanation_given=request.explanation_given,
-            difficulty_level=request.difficulty_level or "beginner",
-            num_questions=request.num_questions or 2,
-        )
+        with usage_scope(endpoint="/practice", learner_id=request.learner_id, concept=request.concept):
+            response = await asyncio.to_thread(
+                generate_practice_questions,
+                concept=request.concept,
+                confusion_type=request.confusion_type,
+                explanation_given=request.explanation_given,
+                difficulty_level=request.difficulty_level or "beginner",
+                num_questions=request.num_questions or 2,
+            )
     except Exception as e:
         logger.exception(f"Error in /practice: {e}")
         raise HTTPException(
@@ -48,37 +61,96 @@ async def get_practice_questions(request: PracticeRequest) -> PracticeResponse:
             detail=str(e),
         )
 
+    return project(response, fields)
+
+
+@router.post(
+    "/stream",
+    response_class=StreamingResponse,
+    summary="Stream micro-practice questions as they are generated",
+    description=(
+        "Same input as /practice. Answers with NDJSON: one PracticeQuestion per "
+        "line, each sent as soon as the model has finished writing it, so the "
+        "learner can start on question 1 while the rest are generated."
+    ),
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}, "description": "One PracticeQuestion per line"}},
+)
+async def stream_practice(request: PracticeRequest) -> StreamingResponse:
+    logger.info(f"Practice stream: concept='{request.concept}', confusion='{request.confusion_type}'")
+    get_usage_meter().check_quota(request.learner_id)  # QuotaExceeded -> 429 (main.py)
+
+    async def lines():
+        # The LLM stream is consumed in one worker thread (spans, usage scope and
+        # the LLM slot all live there); questions come back through a queue.
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce() -> None:
+            questions = stream_practice_questions(
+                concept=request.concept,
+                confusion_type=request.confusion_type,
+                explanation_given=request.explanation_given,
+                difficulty_level=request.difficulty_level or "beginner",
+                num_questions=request.num_questions or 2,
+            )
+            try:
+                for question in questions:
+                    loop.call_soon_threadsafe(queue.put_nowait, question)
+                    if stop.is_set():
+                        break
+            except Exception as e:
+                logger.exception(f"Error in /practice/stream: {e}")
+            finally:
+                questions.close()  # releases the LLM slot if we stopped early
+                loop.call_soon_threadsafe(queue.put_nowait, _END_OF_STREAM)
+
+        with usage_scope(endpoint="/practice/stream", learner_id=request.learner_id, concept=request.concept):
+            producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        try:
+            while (question := await queue.get()) is not _END_OF_STREAM:
+                yield question.model_dump_json() + "\n"
+            await producer
+        finally:
+            stop.set()  # the client went away: stop after the current question
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
 
 @router.post(
     "/feedback",
     response_model=FeedbackResponse,
     summary="Evaluate a learner's answer and provide feedback",
 )
-async def submit_answer(request: FeedbackRequest) -> FeedbackResponse:
+async def submit_answer(request: FeedbackRequest, fields: Optional[str] = FIELDS_QUERY) -> FeedbackResponse:
     """
     Evaluate the learner's answer against the correct answer.
     Returns feedback, score, and optional re-explanation if incorrect.
     """
     logger.info(f"Feedback request: concept='{request.concept}', learner='{request.learner_id}'")
+    get_usage_meter().check_quota(request.learner_id)
 
     try:
-        result = evaluate_answer(
-            question=request.question,
-            correct_answer=request.correct_answer,
-            learner_answer=request.learner_answer,
-            concept=request.concept,
-        )
+        with usage_scope(endpoint="/practice/feedback", learner_id=request.learner_id, concept=request.concept):
+            result = await asyncio.to_thread(
+                evaluate_answer,
+                question=request.question,
+                correct_answer=request.correct_answer,
+                learner_answer=request.learner_answer,
+                concept=request.concept,
+            )
 
-        # Record to learner memory
-        memory = get_memory(request.learner_id)
+        # Record to learner memory — file and SQLite I/O, off the event loop
+        memory = await asyncio.to_thread(get_memory, request.learner_id, request.cohort_id)
         if memory:
-            memory.record_practice_result(
+            await asyncio.to_thread(
+                memory.record_practice_result,
                 concept=request.concept,
                 is_correct=result.get("is_correct", False),
                 score=result.get("score", 0.0),
             )
 
-        return FeedbackResponse(
+        response = FeedbackResponse(
             is_correct=result.get("is_correct", False),
             score=result.get("score", 0.0),
             feedback_message=result.get("feedback_message", ""),
@@ -91,4 +163,6 @@ async def submit_answer(request: FeedbackRequest) -> FeedbackResponse:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e),
-        )
\ No newline at end of file
+        )
+
+    return project(response, fields)
\ No newline at end of file
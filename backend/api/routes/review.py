@@ -0,0 +1,62 @@
+"""
+/review endpoint — spaced-repetition reviews that are due.
+"""
+
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from models.schemas import ReviewDueResponse, ReviewItem
+from memory.review_scheduler import get_review_scheduler
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/review", tags=["Review"])
+
+
+@router.get(
+    "/due",
+    response_model=ReviewDueResponse,
+    summary="Concepts due for spaced-repetition review",
+    description=(
+        "With learner_id: that learner's due reviews, most overdue first. "
+        "Without: the next N due reviews across all learners."
+    ),
+)
+async def get_due_reviews(
+    learner_id: Optional[str] = Query(None, description="Only return this learner's reviews"),
+    limit: int = Query(20, ge=1, le=500),
+) -> ReviewDueResponse:
+    scheduler = get_review_scheduler()
+    try:
+        # SQLite may wait on the writer's lock: not on the event loop
+        if learner_id:
+            rows = await asyncio.to_thread(scheduler.due_for_learner, learner_id, limit=limit)
+        else:
+            rows = await asyncio.to_thread(scheduler.next_due, limit=limit)
+    except sqlite3.Error as e:
+        logger.exception(f"Error in /review/due: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        )
+
+    return ReviewDueResponse(
+        learner_id=learner_id,
+        items=[_to_item(r) for r in rows],
+    )
+
+
+def _to_item(row: dict) -> ReviewItem:
+    return ReviewItem(
+        learner_id=row["learner_id"],
+        concept=row["concept"],
+        due_at=datetime.fromtimestamp(row["due_at"], tz=timezone.utc),
+        interval_days=row["interval_days"],
+        repetitions=row["repetitions"],
+        easiness=row["easiness"],
+        last_score=row["last_score"],
+    )
@@ -0,0 +1,135 @@
+"""
+Admission benchmark — what rate limiting costs per request, and what fair
+queueing buys a quiet tenant next to a noisy one.
+
+1. Overhead: the admission middleware around a no-op ASGI app (typical
+   /explain body), in-memory and SQLite bucket stores, versus no middleware.
+2. Fairness: 2 LLM slots, tenant "noisy" queues 40 calls, then "quiet"
+   queues 10. Compares quiet's waits under FIFO (a plain semaphore) and
+   under FairScheduler.
+
+No LLM calls are made. Run from backend/: python benchmarks/bench_admission.py
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("MEMORY_DIR", tempfile.mkdtemp(prefix="bb-admission-"))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.admission as admission
+from api.middleware.admission import AdmissionMiddleware
+from services.admission import FairScheduler, MemoryBucketStore, RateLimiter, SqliteBucketStore
+
+REQUESTS = 20000
+BODY = json.dumps({
+    "concept": "recursion",
+    "user_doubt": "I don't understand why the function calls itself. Won't it go on forever?",
+    "code_snippet": "def factorial(n):\n    if n == 0:\n        return 1\n    return n * factorial(n - 1)",
+    "difficulty_level": "beginner",
+    "learner_id": "user_001",
+}).encode("utf-8")
+
+CALL_SECONDS = 0.005
+SLOTS = 2
+
+
+async def _noop_app(scope, receive, send):
+    await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def per_request_us(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": BODY, "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "method": "POST", "path": "/explain",
+            "headers": [(b"content-type", b"application/json")],
+            "client": (f"10.0.{i % 250}.{i % 200}", 1234),
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def overhead() -> None:
+    # Generous limits: measure the bookkeeping, not rejections
+    admission.ADMISSION_LEARNER_RATE = admission.ADMISSION_TENANT_RATE = 1e9
+    # Per-IP tenants, so both the tenant and the learner bucket are charged
+    admission.ADMISSION_IP_TENANTS = True
+    baseline = asyncio.run(per_request_us(_noop_app, REQUESTS))
+
+    print("=" * 64)
+    print(f"  {'admission overhead':<36} | {'µs/request':>10} | {'added':>8}")
+    print("-" * 64)
+    print(f"  {'no middleware':<36} | {baseline:>10.1f} | {'':>8}")
+    for label, store, n in (
+        ("middleware, memory store", MemoryBucketStore(), REQUESTS),
+        ("middleware, sqlite store (shared)", SqliteBucketStore(), REQUESTS // 10),
+    ):
+        admission._rate_limiter = RateLimiter(store)
+        us = asyncio.run(per_request_us(AdmissionMiddleware(_noop_app), n))
+        print(f"  {label:<36} | {us:>10.1f} | {us - baseline:>+8.1f}")
+
+
+class _FifoScheduler:
+    def __init__(self, slots: int):
+        self._sem = threading.Semaphore(slots)
+
+    def slot(self, tenant, weight=1.0):
+        return self._sem
+
+
+def quiet_tenant_waits(scheduler) -> tuple[list[float], float]:
+    waits: dict[str, list[float]] = {"noisy": [], "quiet": []}
+    lock = threading.Lock()
+
+    def call(tenant: str) -> None:
+        queued = time.perf_counter()
+        with scheduler.slot(tenant, 1.0):
+            with lock:
+                waits[tenant].append(time.perf_counter() - queued)
+            time.sleep(CALL_SECONDS)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=call, args=("noisy",)) for _ in range(40)]
+    for t in threads:
+        t.start()
+    time.sleep(CALL_SECONDS)  # the noisy backlog is already queued
+    quiet = [threading.Thread(target=call, args=("quiet",)) for _ in range(10)]
+    for t in quiet:
+        t.start()
+    for t in threads + quiet:
+        t.join()
+    return waits["quiet"], time.perf_counter() - started
+
+
+def fairness() -> None:
+    print("=" * 64)
+    print(f"  {SLOTS} slots, {CALL_SECONDS * 1000:.0f}ms calls: 40 'noisy' queued, then 10 'quiet'")
+    print(f"  {'scheduler':<20} | {'quiet p50 ms':>12} | {'quiet max ms':>12} | {'total ms':>9}")
+    print("-" * 64)
+    for label, scheduler in (("FIFO (semaphore)", _FifoScheduler(SLOTS)), ("fair queueing", FairScheduler(SLOTS))):
+        waits, total = quiet_tenant_waits(scheduler)
+        print(
+            f"  {label:<20} | {statistics.median(waits) * 1000:>12.1f} | "
+            f"{max(waits) * 1000:>12.1f} | {total * 1000:>9.1f}"
+        )
+    print("=" * 64)
+
+
+if __name__ == "__main__":
+    overhead()
+    fairness()
@@ -0,0 +1,212 @@
+"""
+Cache benchmark — what the shared tier buys once there is more than one
+worker, and what each tier costs per lookup.
+
+1. Lookup cost: local (LRU) hit, shared-tier hit, and miss + store, for the
+   SQLite tier and for a Redis tier.
+2. Hit rate across workers: 4 "workers" (separate TwoTierCache instances,
+   i.e. separate local LRUs) take turns serving Zipf-distributed keys.
+   Local-only caching is compared with local + shared.
+3. Stampede: 32 threads miss the same cold key at once (50ms compute).
+
+The Redis rows run against a small in-process RESP stand-in (GET/SET/DEL,
+no persistence) unless CACHE_REDIS_URL points at a real server; they need
+the optional `redis` package and are skipped without it.
+
+No LLM calls are made. Run from backend/: python benchmarks/bench_cache.py
+"""
+
+import os
+import random
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("MEMORY_DIR", tempfile.mkdtemp(prefix="bb-cache-"))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache import RedisTier, SqliteTier, TwoTierCache
+
+LOOKUPS = 20000
+WORKERS = 4
+KEYS = 2000
+REQUESTS = 20000
+LOCAL_MAX_ITEMS = 256  # small next to the key space, like a busy worker's LRU
+VALUE = {
+    "concept": "recursion",
+    "confusion_type": "conceptual",
+    "explanation": "Think of recursion like a set of Russian dolls... " * 8,
+    "key_insight": "Every recursive function needs a base case.",
+}
+
+
+# ── Redis stand-in ─────────────────────────────────────────────
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Just enough RESP2 for the cache: PING, GET, SET [PX ms] [NX], DEL."""
+
+    store: dict = {}
+    lock = threading.Lock()
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            self.wfile.write(self._run([args[0].upper()] + args[1:]))
+
+    def _run(self, args) -> bytes:
+        command, now = args[0], time.monotonic()
+        with self.lock:
+            if command == b"PING":
+                return b"+PONG\r\n"
+            if command == b"GET":
+                entry = self.store.get(args[1])
+                if entry is None or entry[1] < now:
+                    return b"$-1\r\n"
+                return b"$%d\r\n%s\r\n" % (len(entry[0]), entry[0])
+            if command == b"SET":
+                options = [a.upper() for a in args[3:]]
+                expires = float("inf")
+                if b"PX" in options:
+                    expires = now + int(args[3 + options.index(b"PX") + 1]) / 1000
+                live = args[1] in self.store and self.store[args[1]][1] >= now
+                if b"NX" in options and live:
+                    return b"$-1\r\n"
+                self.store[args[1]] = (args[2], expires)
+                return b"+OK\r\n"
+            if command == b"DEL":
+                return b":%d\r\n" % sum(1 for key in args[1:] if self.store.pop(key, None))
+        return b"-ERR unknown command\r\n"
+
+
+def redis_tier():
+    """A RedisTier on CACHE_REDIS_URL, else on a stand-in; None without redis-py."""
+    url = os.getenv("CACHE_REDIS_URL")
+    if url is None:
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"redis://127.0.0.1:{server.server_address[1]}/0"
+    try:
+        return RedisTier(url)
+    except ImportError:
+        return None
+
+
+# ── Benchmarks ─────────────────────────────────────────────────
+
+def lookup_cost(tiers: dict) -> None:
+    print("=" * 64)
+    print(f"  {'lookup':<34} | {'µs/op':>10}")
+    print("-" * 64)
+    cache = TwoTierCache("bench-local", "v1", shared=None)
+    cache.set(("k",), VALUE)
+    started = time.perf_counter()
+    for _ in range(LOOKUPS):
+        cache.get(("k",))
+    print(f"  {'local hit':<34} | {(time.perf_counter() - started) / LOOKUPS * 1e6:>10.1f}")
+
+    for name, tier in tiers.items():
+        n = LOOKUPS // 10
+        writer = TwoTierCache(f"bench-{name}", "v1", shared=tier)
+        started = time.perf_counter()
+        for i in range(n):
+            writer.get_or_compute(("miss", i), lambda: VALUE)
+        print(f"  {name + ' miss + store':<34} | {(time.perf_counter() - started) / n * 1e6:>10.1f}")
+
+        started = time.perf_counter()
+        for i in range(n):
+            # A fresh local tier each time: every lookup goes to the shared tier
+            TwoTierCache(f"bench-{name}", "v1", shared=tier).get(("miss", i))
+        print(f"  {name + ' shared hit':<34} | {(time.perf_counter() - started) / n * 1e6:>10.1f}")
+
+
+def hit_rates(tiers: dict) -> None:
+    rng = random.Random(7)
+    weights = [1 / (rank + 1) for rank in range(KEYS)]
+    keys = rng.choices(range(KEYS), weights=weights, k=REQUESTS)
+
+    print("=" * 64)
+    print(f"  {WORKERS} workers, {REQUESTS} requests over {KEYS} Zipf keys, LRU {LOCAL_MAX_ITEMS}/worker")
+    print(f"  {'tiers':<20} | {'hit rate':>8} | {'computes':>8} | {'ms total':>9}")
+    print("-" * 64)
+    for label, tier in [("local only", None)] + [(f"local + {name}", t) for name, t in tiers.items()]:
+        namespace = f"bench-zipf-{label}"
+        workers = [
+            TwoTierCache(namespace, "v1", shared=tier, local_max_items=LOCAL_MAX_ITEMS) for _ in range(WORKERS)
+        ]
+        computes = 0
+
+        def compute():
+            nonlocal computes
+            computes += 1
+            return VALUE
+
+        started = time.perf_counter()
+        for i, key in enumerate(keys):
+            workers[i % WORKERS].get_or_compute((key,), compute)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"  {label:<20} | {1 - computes / REQUESTS:>8.1%} | {computes:>8} | {elapsed:>9.1f}")
+
+
+def stampede(tiers: dict) -> None:
+    print("=" * 64)
+    print("  32 threads miss one cold key at once (50ms compute)")
+    print(f"  {'setup':<28} | {'computes':>8} | {'ms':>7}")
+    print("-" * 64)
+
+    def run(get_or_compute) -> tuple[int, float]:
+        computes = []
+
+        def compute():
+            computes.append(1)
+            time.sleep(0.05)
+            return VALUE
+
+        threads = [threading.Thread(target=get_or_compute, args=(compute,)) for _ in range(32)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return len(computes), (time.perf_counter() - started) * 1000
+
+    def naive(compute):
+        # get, then compute and set on a miss — what a plain cache does
+        if naive_cache.get(("cold",)) is None:
+            naive_cache.set(("cold",), compute())
+
+    naive_cache = TwoTierCache("bench-naive", "v1", shared=None)
+    computes, ms = run(naive)
+    print(f"  {'get-then-set (no protection)':<28} | {computes:>8} | {ms:>7.1f}")
+
+    cache = TwoTierCache("bench-stampede", "v1", shared=None)
+    computes, ms = run(lambda compute: cache.get_or_compute(("cold",), compute))
+    print(f"  {'one worker, single-flight':<28} | {computes:>8} | {ms:>7.1f}")
+
+    for name, tier in tiers.items():
+        # 4 workers (separate caches) share the tier: the lease spans them
+        workers = [TwoTierCache(f"bench-stampede-{name}", "v1", shared=tier) for _ in range(WORKERS)]
+        counter = iter(range(32))
+        computes, ms = run(lambda compute: workers[next(counter) % WORKERS].get_or_compute(("cold",), compute))
+        print(f"  {f'{WORKERS} workers + {name} lease':<28} | {computes:>8} | {ms:>7.1f}")
+    print("=" * 64)
+
+
+if __name__ == "__main__":
+    tiers = {"sqlite": SqliteTier()}
+    redis = redis_tier()
+    if redis is not None:
+        tiers["redis"] = redis
+    else:
+        print("(redis package not installed: Redis rows skipped)")
+    lookup_cost(tiers)
+    hit_rates(tiers)
+    stampede(tiers)
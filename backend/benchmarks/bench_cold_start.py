@@ -0,0 +1,132 @@
+"""
+Cold-start benchmark — what a fresh (autoscaled) container pays before and
+at its first request.
+
+1. Import profile: `python -X importtime -c "import main"`, slowest modules
+   by cumulative time plus our own modules.
+2. Time-to-ready: import + lifespan startup (with and without warm-up), and
+   the one-off cost the first request pays when warm-up is skipped.
+
+Each scenario runs in a fresh interpreter. No LLM calls are made.
+
+Run from backend/: python benchmarks/bench_cold_start.py [--runs 5] [--write benchmarks/importtime_baseline.txt]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_PARTY = ("main", "api", "core", "memory", "models", "services")
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+_READY_SNIPPET = """
+import json, logging, time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter()
+logging.disable(logging.CRITICAL)
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+client.__enter__()
+if main.WARMUP_ON_STARTUP:
+    # Warm-up runs in the background; ready is when it has finished
+    from services.warmup import get_warmup_report
+    while get_warmup_report()["state"] != "done":
+        time.sleep(0.001)
+t_ready = time.perf_counter()
+client.get("/health")
+t_first = time.perf_counter()
+from services.warmup import warm_up
+# With warm-up skipped, this is the one-off work the first real request would absorb
+first_request_penalty = 0.0 if main.WARMUP_ON_STARTUP else warm_up()["duration_ms"]
+client.__exit__(None, None, None)
+print(json.dumps({
+    "import_ms": (t_import - t0) * 1000,
+    "startup_ms": (t_ready - t_import) * 1000,
+    "ready_ms": (t_ready - t0) * 1000,
+    "first_health_ms": (t_first - t_ready) * 1000,
+    "first_request_penalty_ms": first_request_penalty,
+}))
+"""
+
+
+def run_python(args: list[str], env: dict) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+
+
+def import_profile(env: dict, runs: int) -> list[tuple[str, int, int, int]]:
+    """(module, self µs, cumulative µs, depth), median over runs."""
+    samples: dict[str, list[tuple[int, int, int]]] = {}
+    for _ in range(runs):
+        stderr = run_python(["-X", "importtime", "-c", "import main"], env).stderr
+        for line in stderr.splitlines():
+            m = _IMPORTTIME_RE.match(line)
+            if m:
+                self_us, cum_us, indent, name = int(m[1]), int(m[2]), m[3], m[4]
+                samples.setdefault(name, []).append((self_us, cum_us, len(indent) // 2))
+    return [
+        (name, int(statistics.median(s[0] for s in v)), int(statistics.median(s[1] for s in v)), v[0][2])
+        for name, v in samples.items()
+    ]
+
+
+def time_to_ready(env: dict, runs: int) -> dict:
+    results = [json.loads(run_python(["-c", _READY_SNIPPET], env).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    return {k: statistics.median(r[k] for r in results) for k in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start profile of the API")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--write", help="also write the report to this file (tracked baseline)")
+    args = parser.parse_args()
+
+    env = {**os.environ, "MEMORY_DIR": tempfile.mkdtemp(prefix="bb-coldstart-")}
+    lines = []
+
+    profile = import_profile(env, args.runs)
+    total = next(cum for name, _, cum, depth in profile if name == "main" and depth == 0)
+    lines.append("=" * 72)
+    lines.append(f"  import main: {total / 1000:.1f} ms (median of {args.runs}, python -X importtime)")
+    lines.append("-" * 72)
+    lines.append(f"  {'slowest top-level imports':<44} | {'self ms':>9} | {'cumul ms':>9}")
+    top_level = sorted((p for p in profile if p[3] <= 1), key=lambda p: -p[2])[: args.top]
+    for name, self_us, cum_us, _ in top_level:
+        lines.append(f"  {name:<44} | {self_us / 1000:>9.1f} | {cum_us / 1000:>9.1f}")
+    lines.append("-" * 72)
+    lines.append(f"  {'first-party modules':<44} | {'self ms':>9} | {'cumul ms':>9}")
+    ours = sorted((p for p in profile if p[0].split(".")[0] in FIRST_PARTY), key=lambda p: -p[2])
+    for name, self_us, cum_us, _ in ours[: args.top]:
+        lines.append(f"  {name:<44} | {self_us / 1000:>9.1f} | {cum_us / 1000:>9.1f}")
+
+    lines.append("=" * 72)
+    lines.append(f"  {'time to ready (median ms)':<28} | {'import':>8} | {'startup':>8} | {'ready':>8} | {'1st-req penalty':>15}")
+    lines.append("-" * 72)
+    for label, warm in (("warm-up in lifespan", "true"), ("no warm-up", "false")):
+        r = time_to_ready({**env, "WARMUP_ON_STARTUP": warm}, args.runs)
+        lines.append(
+            f"  {label:<28} | {r['import_ms']:>8.1f} | {r['startup_ms']:>8.1f} | "
+            f"{r['ready_ms']:>8.1f} | {r['first_request_penalty_ms']:>15.1f}"
+        )
+    lines.append("=" * 72)
+
+    report = "\n".join(lines)
+    print(report)
+    if args.write:
+        with open(args.write, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
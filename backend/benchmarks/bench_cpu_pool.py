@@ -0,0 +1,122 @@
+"""
+CPU pool benchmark — what moving CPU tasks off the request threads buys at
+high concurrency.
+
+Each simulated request runs the CPU work of a big /explain: cutting a
+pasted ~40KB Python file down to the snippet budget (ast selection) on the
+pool, then parsing a ~6KB JSON output inline (outputs are capped by the
+token ceiling; that size parses in tens of µs, less than a round trip to a
+worker process would cost). Requests run through asyncio.to_thread, like
+the routes do, at several concurrency levels, with the pool in each mode:
+
+- inline:  as before the pool (every request thread competes for the GIL)
+- thread:  the pool's threads (bounded, but still one GIL)
+- process: worker processes (CPU_POOL_WORKERS, default cores - 1)
+
+Reported: throughput, p95 request latency, and the worst event-loop lag
+seen by a 1ms ticker while the load runs (how long other requests' I/O
+would have waited). Process mode only wins on a multi-core host; on one
+core it pays pickling for nothing, which is why CPU_POOL_MODE=auto stays
+inline there.
+
+No LLM calls are made. Run from backend/: python benchmarks/bench_cpu_pool.py
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("MEMORY_DIR", tempfile.mkdtemp(prefix="bb-cpu-pool-"))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.cpu_pool as cpu_pool
+from core.input_processor import prepare_code_snippet
+from services.cpu_pool import CpuPool
+from services.llm_client import _parse_json_output
+
+REQUESTS = 48
+CONCURRENCY = (1, 8, 32)
+CORES = os.cpu_count() or 1
+WORKERS = max(2, CORES - 1)
+
+SNIPPET = "\n\n".join(
+    f"def helper_{i}(items, depth={i}):\n"
+    f"    total = 0\n"
+    f"    for item in items:\n"
+    f"        total += item * depth if item % 2 else helper_{i + 1}([item], depth - 1)\n"
+    f"    return total"
+    for i in range(300)
+) + "\n\ndef factorial(n):\n    return 1 if n == 0 else n * factorial(n - 1)\n"
+DOUBT = "why does factorial call itself and when does it stop?"
+OUTPUT = "```json\n" + json.dumps({
+    "questions": [
+        {"question_id": i, "question": f"What does call {i} return?" * 3, "options": ["a", "b", "c", "d"],
+         "correct_answer": "a", "explanation": "Each call waits for the one below it. " * 4}
+        for i in range(22)
+    ],
+}) + "\n```"
+
+
+def one_request() -> float:
+    started = time.perf_counter()
+    prepare_code_snippet(SNIPPET, DOUBT, "recursion")
+    _parse_json_output(OUTPUT)
+    return (time.perf_counter() - started) * 1000
+
+
+async def load(concurrency: int) -> tuple[float, float, float]:
+    gate = asyncio.Semaphore(concurrency)
+    worst_lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst_lag
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst_lag = max(worst_lag, (time.perf_counter() - before) * 1000 - 1)
+
+    async def request() -> float:
+        async with gate:
+            return await asyncio.to_thread(one_request)
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(request() for _ in range(REQUESTS)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    return REQUESTS / elapsed, p95, worst_lag
+
+
+def main() -> None:
+    print("=" * 72)
+    print(f"  {REQUESTS} requests (40KB snippet cut + 6KB JSON parse), {CORES} core(s)")
+    print(f"  {'mode':<22} | {'concurrency':>11} | {'req/s':>7} | {'p95 ms':>8} | {'loop lag ms':>11}")
+    print("-" * 72)
+    for mode in ("inline", "thread", "process"):
+        if mode == "inline":
+            cpu_pool._pool = None
+            label = "inline"
+        else:
+            cpu_pool._pool = CpuPool(
+                mode, workers=WORKERS, threads=CORES,
+                max_pending=4 * WORKERS, queue_timeout=60,
+            )
+            cpu_pool._pool.warm_up()
+            label = f"{mode} ({WORKERS} workers)" if mode == "process" else f"thread ({CORES})"
+        for concurrency in CONCURRENCY:
+            rps, p95, lag = asyncio.run(load(concurrency))
+            print(f"  {label:<22} | {concurrency:>11} | {rps:>7.1f} | {p95:>8.1f} | {lag:>11.1f}")
+        if cpu_pool._pool is not None:
+            cpu_pool.stop_cpu_pool()
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
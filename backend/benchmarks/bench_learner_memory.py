@@ -0,0 +1,49 @@
+"""
+Learner memory benchmark — per-learner footprint and update cost.
+Shows that practice stats stay constant-size no matter how many attempts.
+
+Run from backend/: python benchmarks/bench_learner_memory.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MEMORY_DIR", tempfile.mkdtemp(prefix="bench_memory_"))
+
+from memory.learner_memory import LearnerMemory
+
+ATTEMPT_COUNTS = [10, 100, 1_000, 10_000]
+CONCEPTS = ["recursion", "pointers", "closures", "big-o", "graphs"]
+
+print("=" * 70)
+print("  Learner memory: practice stats footprint")
+print("=" * 70)
+print(f"  {'attempts':>10} | {'stats bytes':>11} | {'legacy list bytes':>17} | {'us / update':>11}")
+print("-" * 70)
+
+for n in ATTEMPT_COUNTS:
+    memory = LearnerMemory(f"bench_{n}")
+    memory.clear()
+    memory._save = lambda: memory._flush_state()  # measure the update, not disk I/O
+
+    scores = [((i * 37) % 100) / 100 for i in range(n)]
+    started = time.perf_counter()
+    for i, score in enumerate(scores):
+        memory.record_practice_result(CONCEPTS[i % len(CONCEPTS)], score >= 0.5, score)
+    per_update_us = (time.perf_counter() - started) / n * 1e6
+
+    memory._flush_state()
+    stats_bytes = sum(
+        len(json.dumps(entry.get("stats", {})))
+        for entry in memory._data["concepts_seen"].values()
+    )
+    legacy_bytes = sum(
+        len(json.dumps(scores[i::len(CONCEPTS)])) for i in range(len(CONCEPTS))
+    )
+    print(f"  {n:>10} | {stats_bytes:>11} | {legacy_bytes:>17} | {per_update_us:>11.2f}")
+
+print("=" * 70)
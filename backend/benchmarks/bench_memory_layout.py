@@ -0,0 +1,92 @@
+"""
+Memory layout benchmark — flat directory vs sharded fan-out.
+
+Creates N small learner files in each layout, then times random lookups
+(stat + read) and fresh creates. Use --learners 1000000 for the 1M run
+(needs a few GB of inodes and several minutes).
+
+Run from backend/: python benchmarks/bench_memory_layout.py [--learners 100000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.layout import encode_learner_id, shard_key
+
+PAYLOAD = b'{"learner_id": "x", "sessions": []}'
+
+
+def flat_path(root: Path, learner_id: str) -> Path:
+    return root / f"{encode_learner_id(learner_id)}.json"
+
+
+def sharded_path(root: Path, learner_id: str) -> Path:
+    key = shard_key(learner_id)
+    return root / key[:2] / key[2:4] / f"{encode_learner_id(learner_id)}.json"
+
+
+def run(layout: str, root: Path, ids: list[str], samples: int) -> dict:
+    path_for = flat_path if layout == "flat" else sharded_path
+    made: set[Path] = set()
+
+    started = time.perf_counter()
+    for learner_id in ids:
+        path = path_for(root, learner_id)
+        if path.parent not in made:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            made.add(path.parent)
+        path.write_bytes(PAYLOAD)
+    populate_s = time.perf_counter() - started
+
+    probe = random.sample(ids, min(samples, len(ids)))
+    started = time.perf_counter()
+    for learner_id in probe:
+        path = path_for(root, learner_id)
+        os.stat(path)
+        path.read_bytes()
+    lookup_us = (time.perf_counter() - started) / len(probe) * 1e6
+
+    started = time.perf_counter()
+    for i in range(samples):
+        path = path_for(root, f"new_learner_{i}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(PAYLOAD)
+    create_us = (time.perf_counter() - started) / samples * 1e6
+
+    return {"populate_s": populate_s, "lookup_us": lookup_us, "create_us": create_us}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--learners", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=5_000)
+    parser.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    args = parser.parse_args()
+
+    ids = [f"learner_{i:08d}" for i in range(args.learners)]
+
+    print("=" * 64)
+    print(f"  {args.learners:,} learners, {args.samples:,} lookups/creates per layout")
+    print("=" * 64)
+    print(f"  {'layout':<8} | {'populate':>10} | {'lookup us':>10} | {'create us':>10}")
+    print("-" * 64)
+    for layout in ("flat", "sharded"):
+        root = Path(tempfile.mkdtemp(prefix=f"bench_{layout}_", dir=args.dir))
+        try:
+            r = run(layout, root, ids, args.samples)
+            print(f"  {layout:<8} | {r['populate_s']:>9.1f}s | {r['lookup_us']:>10.1f} | {r['create_us']:>10.1f}")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    print("=" * 64)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Payload benchmark — bytes on the wire and render time for typical
+/explain and /practice responses: stdlib json vs orjson, raw vs gzip vs
+brotli, and full vs `fields=` projected.
+
+Run from backend/: python benchmarks/bench_payloads.py
+"""
+
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.middleware.compression import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL
+from api.responses import _apply, _parse_fields
+from models.schemas import ExplainResponse, PracticeQuestion, PracticeResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+REPEAT = 2000
+
+EXPLANATION = (
+    "Think of recursion like a set of Russian dolls. Each time you open a doll you find a smaller "
+    "one inside, and you keep going until you reach the tiniest doll, which does not open. That "
+    "smallest doll is the base case: the point where the function stops calling itself and returns "
+    "a value directly. Every other call waits for the smaller call inside it to finish, then uses "
+    "that result to build its own answer — like closing the dolls back up one by one. "
+) * 2
+
+PAYLOADS = {
+    "explain": ExplainResponse(
+        concept="recursion",
+        confusion_type="misconception",
+        strategy_used="code_first",
+        explanation=EXPLANATION,
+        analogy="Recursion is like Russian dolls: each one holds a smaller one until the last, solid doll.",
+        key_insight="Every recursive function needs a base case that returns without recursing.",
+        common_mistake="Forgetting the base case, or writing one the recursion never reaches.",
+        follow_up_hint="Trace factorial(3) by hand and write down each call and its return value.",
+    ),
+    "practice x5": PracticeResponse(
+        concept="recursion",
+        confusion_type="conceptual",
+        questions=[
+            PracticeQuestion(
+                question_id=i,
+                question=f"What does factorial({i}) return, and how many calls are made before the base case?",
+                question_type="mcq",
+                options=[f"{i} calls", f"{i + 1} calls", "Infinite calls", "It raises an error"],
+                correct_answer=f"{i + 1} calls",
+                explanation="Each call reduces n by one until n == 0, which returns 1 without recursing. " * 2,
+            )
+            for i in range(1, 6)
+        ],
+    ),
+}
+
+PROJECTIONS = {
+    "explain": "explanation,key_insight",
+    "practice x5": "questions.question,questions.options",
+}
+
+
+def timed_us(fn) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - started) / REPEAT * 1e6
+
+
+def render_stdlib(data: dict) -> bytes:
+    # What starlette's JSONResponse does
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+print("=" * 78)
+print(f"  {'payload':<12} | {'variant':<11} | {'raw B':>7} | {'gzip B':>7} | {'br B':>7} | {'json µs':>8} | {'orjson µs':>9}")
+print("-" * 78)
+for name, model in PAYLOADS.items():
+    full = model.model_dump(mode="json")
+    projected = _apply(full, _parse_fields(PROJECTIONS[name]), "")
+    for variant, data in (("full", full), ("fields=", projected)):
+        raw = render_stdlib(data)
+        gz = len(gzip.compress(raw, compresslevel=COMPRESSION_GZIP_LEVEL))
+        br = len(brotli.compress(raw, quality=COMPRESSION_BROTLI_QUALITY)) if brotli else None
+        t_json = timed_us(lambda: render_stdlib(data))
+        t_orjson = timed_us(lambda: orjson.dumps(data)) if orjson else None
+        print(
+            f"  {name:<12} | {variant:<11} | {len(raw):>7} | {gz:>7} | "
+            f"{br if br is not None else 'n/a':>7} | {t_json:>8.1f} | "
+            f"{f'{t_orjson:.1f}' if t_orjson is not None else 'n/a':>9}"
+        )
+print("=" * 78)
+if brotli is None:
+    print("  (brotli not installed — pip install brotli for br numbers)")
+if orjson is None:
+    print("  (orjson not installed — pip install orjson for orjson numbers)")
@@ -0,0 +1,69 @@
+"""
+Serializer benchmark — file size and load/save time per learner record.
+
+Run from backend/: python benchmarks/bench_serializers.py
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory.serializers import SERIALIZERS
+
+SESSION_COUNTS = [1_000, 10_000, 100_000]
+CONCEPTS = ["recursion", "pointers in C", "closures", "big-o notation", "graphs", "dynamic programming"]
+CONFUSIONS = ["conceptual", "procedural", "abstraction_gap", "misconception", "transfer"]
+STRATEGIES = ["analogy_based", "step_by_step", "intuition_first", "code_first", "simplified_rephrasing"]
+
+
+def make_record(n: int) -> dict:
+    rng = random.Random(n)
+    start = datetime(2025, 1, 1)
+    sessions = [
+        {
+            "timestamp": (start + timedelta(seconds=37 * i, microseconds=rng.randrange(10**6))).isoformat(),
+            "concept": rng.choice(CONCEPTS),
+            "confusion_type": rng.choice(CONFUSIONS),
+            "strategy_used": rng.choice(STRATEGIES),
+            "explanation_preview": "Think of it like a set of Russian dolls, each holding a smaller one... "[: rng.randrange(40, 70)] * 3,
+        }
+        for i in range(n)
+    ]
+    return {
+        "learner_id": "bench",
+        "created_at": start.isoformat(),
+        "sessions": sessions,
+        "concepts_seen": {c: {"count": n // len(CONCEPTS), "confusion_counts": {}} for c in CONCEPTS},
+        "confusion_counts": {c: n // len(CONFUSIONS) for c in CONFUSIONS},
+        "mastered_concepts": CONCEPTS[:2],
+        "struggling_concepts": CONCEPTS[4:],
+        "version": n,
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+print("=" * 72)
+print(f"  {'sessions':>9} | {'format':<7} | {'size':>12} | {'save ms':>9} | {'load ms':>9}")
+print("-" * 72)
+for n in SESSION_COUNTS:
+    record = make_record(n)
+    repeat = 5 if n < 100_000 else 2
+    for serializer in SERIALIZERS.values():
+        raw = serializer.dumps(record)
+        assert serializer.loads(raw) == record, f"{serializer.name} round-trip mismatch"
+        save_ms = timed(lambda: serializer.dumps(record), repeat)
+        load_ms = timed(lambda: serializer.loads(raw), repeat)
+        print(f"  {n:>9,} | {serializer.name:<7} | {len(raw):>10,} B | {save_ms:>9.1f} | {load_ms:>9.1f}")
+print("=" * 72)
@@ -0,0 +1,371 @@
+"""
+Replay — drives the app with captured traffic (services.capture) and
+compares two builds on it.
+
+    # on each build (e.g. before and after a change), from backend/:
+    python benchmarks/replay.py run /path/to/capture --out before.json
+    python benchmarks/replay.py run /path/to/capture --out after.json
+    python benchmarks/replay.py diff before.json after.json
+
+`run` starts the app in-process (lifespan included) on a fresh MEMORY_DIR,
+with Bedrock replaced by a record/replay stub, and sends every captured
+request with its original X-Request-ID:
+
+- Timing: requests go out at their captured arrival times divided by
+  --speed (2 = twice as fast; 0 = back to back, --concurrency at a time).
+- The stub answers each LLM call with the captured response for the same
+  (anonymized) prompt; failing that, the next unused response captured for
+  the same request; failing that, one captured for a prompt with the same
+  template (first 200 characters). Otherwise the call fails, as an outage
+  would. It waits the captured latency times --llm-latency (0 = instant),
+  streaming calls in a few chunks spread over that time.
+- Reported: latency percentiles per endpoint (with the captured ones for
+  reference), cache hit rates per namespace, and how LLM calls were
+  matched. --out saves that plus every response body for `diff`.
+
+`diff` compares two --out files: latency percentiles and cache hit rates
+side by side, and which responses changed (status, or which fields).
+
+Admission control is off (captured traffic was already admitted once)
+unless --admission is given. No real LLM calls are made.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEMPLATE_CHARS = 200
+STREAM_CHUNKS = 8
+
+
+# ── Capture files ──────────────────────────────────────────────
+
+def load_capture(paths: list[str]) -> tuple[list[dict], list[dict]]:
+    """(requests by arrival time, LLM calls by start time) from files or directories."""
+    files: list[Path] = []
+    for p in map(Path, paths):
+        files += sorted(p.glob("*.jsonl")) if p.is_dir() else [p]
+    requests, llm_calls = [], []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                (requests if record["kind"] == "request" else llm_calls).append(record)
+    requests.sort(key=lambda r: r["ts"])
+    llm_calls.sort(key=lambda r: r["ts"])
+    return requests, llm_calls
+
+
+# ── Record/replay LLM stub ─────────────────────────────────────
+
+class _StreamBody:
+    def __init__(self, events):
+        self._events = events
+
+    def __iter__(self):
+        return iter(self._events)
+
+
+class ReplayBedrockClient:
+    """Stands in for the bedrock-runtime client, answering from a capture."""
+
+    def __init__(self, llm_calls: list[dict], latency_scale: float):
+        from services.capture import prompt_key, scrub_text
+
+        self._prompt_key, self._scrub = prompt_key, scrub_text
+        self.latency_scale = latency_scale
+        self.matches: Counter = Counter()
+        self._by_key: dict[str, list[dict]] = defaultdict(list)
+        self._by_request: dict[str, list[dict]] = defaultdict(list)
+        self._by_template: dict[str, list[dict]] = defaultdict(list)
+        for call in llm_calls:
+            self._by_key[call["key"]].append(call)
+            self._by_request[call["rid"]].append(call)
+            if "prompt" in call:
+                self._by_template[call["prompt"][:TEMPLATE_CHARS]].append(call)
+        self._used: Counter = Counter()
+
+    def _next(self, how: str, bucket: str, calls: list[dict]) -> dict:
+        i = self._used[(how, bucket)]
+        self._used[(how, bucket)] += 1
+        self.matches[how] += 1
+        return calls[i % len(calls)]
+
+    def _match(self, body: str) -> dict:
+        from services.tracing import current_request_id
+
+        prompt = self._scrub(json.loads(body)["messages"][0]["content"])
+        key = self._prompt_key(prompt)
+        if self._by_key.get(key):
+            return self._next("prompt", key, self._by_key[key])
+        request_id = current_request_id() or ""
+        calls = self._by_request.get(request_id, [])
+        if self._used[("request", request_id)] < len(calls):
+            return self._next("request", request_id, calls)
+        template = prompt[:TEMPLATE_CHARS]
+        if self._by_template.get(template):
+            return self._next("template", template, self._by_template[template])
+        self.matches["none"] += 1
+        raise RuntimeError("replay: no captured response for this prompt")
+
+    def invoke_model(self, body: str, modelId: str) -> dict:
+        call = self._match(body)
+        time.sleep(call["ms"] / 1000 * self.latency_scale)
+        return {"body": io.BytesIO(json.dumps({
+            "choices": [{"message": {"content": call["response"]}, "finish_reason": call["finish_reason"]}],
+        }).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, body: str, modelId: str) -> dict:
+        call = self._match(body)
+        text, pause = call["response"], call["ms"] / 1000 * self.latency_scale / STREAM_CHUNKS
+
+        def events():
+            size = max(1, -(-len(text) // STREAM_CHUNKS))
+            pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+            for n, piece in enumerate(pieces):
+                time.sleep(pause)
+                choice = {"delta": {"content": piece}}
+                if n == len(pieces) - 1:
+                    choice["finish_reason"] = call["finish_reason"]
+                yield {"chunk": {"bytes": json.dumps({"choices": [choice]}).encode("utf-8")}}
+
+        return {"body": _StreamBody(events())}
+
+
+# ── Run ────────────────────────────────────────────────────────
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"n": 0}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    return {"n": len(ordered), "p50": at(0.50), "p90": at(0.90), "p95": at(0.95), "p99": at(0.99), "max": ordered[-1]}
+
+
+def _build() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def _drive(app, requests: list[dict], speed: float, concurrency: int) -> dict:
+    import httpx
+
+    from api.middleware.request_id import REQUEST_ID_HEADER
+
+    results: dict[str, dict] = {}
+    gate = asyncio.Semaphore(concurrency)
+    t0 = requests[0]["ts"] if requests else 0
+    started = time.perf_counter()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay") as client:
+
+        async def send(record: dict) -> None:
+            if speed > 0:
+                await asyncio.sleep(max(0.0, (record["ts"] - t0) / speed - (time.perf_counter() - started)))
+            async with gate:
+                sent = time.perf_counter()
+                response = await client.post(
+                    record["path"], json=record["body"], headers={REQUEST_ID_HEADER: record["rid"]}, timeout=None,
+                )
+                ms = (time.perf_counter() - sent) * 1000
+            if record["path"].endswith("/stream"):
+                body = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+            else:
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = response.text
+            results[record["rid"]] = {"path": record["path"], "status": response.status_code, "ms": round(ms, 1), "response": body}
+
+        await asyncio.gather(*(send(r) for r in requests))
+    return results
+
+
+def run(args) -> None:
+    os.environ["MEMORY_DIR"] = args.memory_dir or tempfile.mkdtemp(prefix="bb-replay-")
+    os.environ["CAPTURE_ENABLED"] = "false"
+    os.environ["WARMUP_ON_STARTUP"] = "false"
+    if not args.admission:
+        os.environ["ADMISSION_ENABLED"] = "false"
+
+    requests, llm_calls = load_capture(args.capture)
+    if args.limit:
+        requests = requests[:args.limit]
+    if not requests:
+        sys.exit("replay: no captured requests found")
+
+    import services.llm_client as llm_client
+    from services.cache import cache_report
+
+    stub = ReplayBedrockClient(llm_calls, args.llm_latency)
+    llm_client.get_bedrock_client = lambda read_timeout=None: stub
+
+    from main import app
+
+    async def main() -> tuple[dict, float]:
+        async with app.router.lifespan_context(app):
+            started = time.perf_counter()
+            results = await _drive(app, requests, args.speed, args.concurrency)
+            return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(main())
+
+    by_path: dict[str, list[float]] = defaultdict(list)
+    captured: dict[str, list[float]] = defaultdict(list)
+    errors: Counter = Counter()
+    for record in requests:
+        result = results[record["rid"]]
+        by_path[record["path"]].append(result["ms"])
+        captured[record["path"]].append(record["ms"])
+        if result["status"] >= 400:
+            errors[record["path"]] += 1
+
+    summary = {
+        "requests": len(requests),
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(len(requests) / elapsed, 2),
+        "latency_ms": {path: percentiles(v) for path, v in sorted(by_path.items())},
+        "captured_latency_ms": {path: percentiles(v) for path, v in sorted(captured.items())},
+        "errors": dict(errors),
+        "cache": {c["namespace"]: c for c in cache_report()},
+        "llm_matches": dict(stub.matches),
+    }
+    print_summary(summary)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "build": _build(), "capture": args.capture, "speed": args.speed,
+                    "concurrency": args.concurrency, "llm_latency": args.llm_latency,
+                },
+                "summary": summary,
+                "results": results,
+            }, f, indent=1, ensure_ascii=False)
+        print(f"  saved to {args.out}")
+
+
+def print_summary(summary: dict) -> None:
+    print("=" * 78)
+    print(f"  {summary['requests']} requests in {summary['seconds']}s ({summary['throughput_rps']} req/s)")
+    print(f"  {'endpoint':<22} | {'n':>5} | {'p50':>8} | {'p95':>8} | {'p99':>8} | {'captured p50':>12} | {'errors':>6}")
+    print("-" * 78)
+    for path, p in summary["latency_ms"].items():
+        c = summary["captured_latency_ms"].get(path, {})
+        print(
+            f"  {path:<22} | {p['n']:>5} | {p['p50']:>8.1f} | {p['p95']:>8.1f} | {p['p99']:>8.1f} | "
+            f"{c.get('p50', 0):>12.1f} | {summary['errors'].get(path, 0):>6}"
+        )
+    print("-" * 78)
+    for namespace, c in summary["cache"].items():
+        print(f"  cache {namespace:<16} | hit rate {c['hit_rate']:>6.1%} | {c['misses']} misses, {c['coalesced']} coalesced")
+    matches = ", ".join(f"{how} {n}" for how, n in sorted(summary["llm_matches"].items())) or "no LLM calls"
+    print(f"  LLM stub matches: {matches}")
+    print("=" * 78)
+
+
+# ── Diff ───────────────────────────────────────────────────────
+
+def _changed_fields(a, b) -> list[str]:
+    if isinstance(a, dict) and isinstance(b, dict):
+        return sorted(k for k in a.keys() | b.keys() if a.get(k) != b.get(k))
+    return [] if a == b else ["(body)"]
+
+
+def diff(args) -> None:
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    a, b = before["summary"], after["summary"]
+
+    print("=" * 78)
+    print(f"  before: {before['meta']['build']}   after: {after['meta']['build']}")
+    print(f"  {'endpoint':<22} | {'':<3} | {'before':>9} | {'after':>9} | {'change':>8}")
+    print("-" * 78)
+    for path in sorted(a["latency_ms"].keys() | b["latency_ms"].keys()):
+        for q in ("p50", "p95", "p99"):
+            x, y = a["latency_ms"].get(path, {}).get(q), b["latency_ms"].get(path, {}).get(q)
+            change = f"{(y - x) / x:+.1%}" if x and y is not None else ""
+            print(f"  {path if q == 'p50' else '':<22} | {q:<3} | {x or 0:>9.1f} | {y or 0:>9.1f} | {change:>8}")
+    print(f"  {'throughput (req/s)':<28} | {a['throughput_rps']:>9} | {b['throughput_rps']:>9} |")
+    print("-" * 78)
+    for namespace in sorted(a["cache"].keys() | b["cache"].keys()):
+        x, y = a["cache"].get(namespace, {}).get("hit_rate", 0), b["cache"].get(namespace, {}).get("hit_rate", 0)
+        print(f"  cache {namespace:<22} | hit rate {x:>6.1%} -> {y:>6.1%}")
+    print("-" * 78)
+
+    same = 0
+    status_changed, fields = [], Counter()
+    examples: list[tuple[str, list[str]]] = []
+    for rid, x in before["results"].items():
+        y = after["results"].get(rid)
+        if y is None:
+            continue
+        if x["status"] != y["status"]:
+            status_changed.append((rid, x["status"], y["status"]))
+            continue
+        changed = _changed_fields(x["response"], y["response"])
+        if not changed:
+            same += 1
+            continue
+        fields.update(changed)
+        examples.append((rid, changed))
+
+    compared = same + len(status_changed) + len(examples)
+    print(f"  {compared} responses compared: {same} identical, {len(examples)} changed, {len(status_changed)} status changed")
+    for field, n in fields.most_common():
+        print(f"    {field:<30} changed in {n}")
+    for rid, x_status, y_status in status_changed[:args.examples]:
+        print(f"    {rid}: status {x_status} -> {y_status}")
+    for rid, changed in examples[:args.examples]:
+        x, y = before["results"][rid]["response"], after["results"][rid]["response"]
+        field = changed[0]
+        old, new = (x.get(field), y.get(field)) if field != "(body)" else (x, y)
+        print(f"    {rid} {before['results'][rid]['path']} {field}:")
+        print(f"      - {json.dumps(old, ensure_ascii=False)[:160]}")
+        print(f"      + {json.dumps(new, ensure_ascii=False)[:160]}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("run", help="replay a capture against this build")
+    p.add_argument("capture", nargs="+", help="capture files or directories (CAPTURE_DIR)")
+    p.add_argument("--out", help="save the summary and responses here, for diff")
+    p.add_argument("--speed", type=float, default=1.0, help="arrival-time speed-up; 0 = back to back")
+    p.add_argument("--concurrency", type=int, default=32, help="requests in flight at most")
+    p.add_argument("--llm-latency", type=float, default=1.0, help="scale for captured LLM latencies; 0 = instant")
+    p.add_argument("--limit", type=int, default=0, help="replay only the first N requests")
+    p.add_argument("--memory-dir", help="MEMORY_DIR to use (default: a fresh temporary one)")
+    p.add_argument("--admission", action="store_true", help="keep admission control on")
+    p.set_defaults(func=run)
+
+    p = commands.add_parser("diff", help="compare two run --out files")
+    p.add_argument("before")
+    p.add_argument("after")
+    p.add_argument("--examples", type=int, default=5, help="changed responses to show")
+    p.set_defaults(func=diff)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,85 @@
+"""
+Learner memory stress test — many processes hammering ONE learner.
+
+Every process records sessions and practice results for the same learner_id,
+each through a fresh LearnerMemory (like one request each). Afterwards the
+file must contain every single update; any shortfall is a lost update.
+
+Run from backend/:
+    python benchmarks/stress_learner_memory.py [--procs 8] [--writes 200]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LEARNER_ID = "stress_learner"
+
+
+def _worker(args) -> int:
+    worker_id, writes = args
+    from memory.learner_memory import LearnerMemory
+    from models.confusion_types import ConfusionType
+
+    for i in range(writes):
+        memory = LearnerMemory(LEARNER_ID)
+        if i % 2 == 0:
+            memory.record_session(
+                concept=f"concept_{worker_id % 4}",
+                confusion_type=ConfusionType.PROCEDURAL,
+                strategy_used="step_by_step",
+                explanation=f"worker {worker_id} write {i}",
+            )
+        else:
+            memory.record_practice_result(f"concept_{worker_id % 4}", True, 0.9)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--procs", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200, help="writes per process")
+    parser.add_argument("--fsync", choices=["none", "file", "full"], default="file")
+    args = parser.parse_args()
+
+    # Must be set before any worker imports memory modules
+    os.environ["MEMORY_DIR"] = tempfile.mkdtemp(prefix="stress_memory_")
+    os.environ["MEMORY_FSYNC"] = args.fsync
+
+    print("=" * 60)
+    print(f"  {args.procs} processes x {args.writes} writes -> 1 learner")
+    print(f"  fsync={args.fsync}")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    with Pool(args.procs) as pool:
+        pool.map(_worker, [(w, args.writes) for w in range(args.procs)])
+    elapsed = time.perf_counter() - started
+
+    from memory.learner_memory import LearnerMemory
+    memory = LearnerMemory(LEARNER_ID)
+    expected_sessions = args.procs * ((args.writes + 1) // 2)
+    expected_practice = args.procs * (args.writes // 2)
+    sessions = memory.get_learner_context()["total_sessions"]
+    practice = sum(
+        (memory.get_concept_stats(f"concept_{w}") or {}).get("attempts", 0)
+        for w in range(min(args.procs, 4))
+    )
+    lost = (expected_sessions - sessions) + (expected_practice - practice)
+
+    total = args.procs * args.writes
+    print(f"  sessions   : {sessions} / {expected_sessions}")
+    print(f"  practice   : {practice} / {expected_practice}")
+    print(f"  lost       : {lost}")
+    print(f"  throughput : {total / elapsed:,.0f} writes/s ({elapsed:.2f}s)")
+    print("=" * 60)
+    print("  PASS: no lost updates" if lost == 0 else "  FAIL: lost updates detected")
+    sys.exit(0 if lost == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,31 @@
 """
 Confusion Detector — analyzes learner input to classify confusion type.
 Uses the LLM with a structured prompt to return a DiagnosisResult.
+Diagnoses are cached (services.cache) by their prompt inputs; the UNKNOWN
+fallback for a failed call only briefly (negative entry).
 """
 
 import logging
-from pathlib import Path
 
 from models.confusion_types import ConfusionType
 from models.schemas import DiagnosisResult
+from core.strategy_selector import load_prompt, prompt_version
+from services.cache import get_cache
 from services.llm_client import call_llm_json, LLMError
+from services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
-# Load prompt template once at startup
-_BASE_DIR = Path(__file__).resolve().parent.parent
-_PROMPT_PATH = _BASE_DIR / "prompts" / "confusion_detection.txt"
-_PROMPT_TEMPLATE = _PROMPT_PATH.read_text(encoding="utf-8")
+_PROMPT_FILE = "confusion_detection.txt"
+_FAILED_REASONING = "Could not diagnose confusion type due to an error."
 
 
+@traced()
 def detect_confusion(
     concept: str,
     user_doubt: str,
     code_snippet: str | None = None,
+    learner_context: str | None = None,
 ) -> DiagnosisResult:
     """
     Classify the type of confusion a learner is experiencing.
@@ -30,20 +34,36 @@ def detect_confusion(
         concept:      The topic being studied (e.g., "recursion")
         user_doubt:   Raw text of what the learner said/typed
         code_snippet: Optional code the learner is confused about
+        learner_context: Optional precomputed learner summary (LearnerMemory.get_prompt_context)
 
     Returns:
         DiagnosisResult with confusion_type, confidence, and reasoning
     """
+    data = get_cache("diagnosis", prompt_version(_PROMPT_FILE)).get_or_compute(
+        (concept, user_doubt, code_snippet, learner_context),
+        lambda: _diagnose(concept, user_doubt, code_snippet, learner_context).model_dump(mode="json"),
+        is_negative=lambda data: data["reasoning"] == _FAILED_REASONING,
+    )
+    return DiagnosisResult(**data)
+
+
+def _diagnose(
+    concept: str,
+    user_doubt: str,
+    code_snippet: str | None,
+    learner_context: str | None,
+) -> DiagnosisResult:
     code_context = f"Code:\n```\n{code_snippet}\n```" if code_snippet else "No code provided."
 
-    prompt = _PROMPT_TEMPLATE.format(
+    prompt = load_prompt(_PROMPT_FILE).format(
         concept=concept,
         user_doubt=user_doubt,
         code_snippet=code_context,
+        learner_context=learner_context or "No prior history.",
     )
 
     try:
-        data = call_llm_json(prompt)
+        data = call_llm_json(prompt, call_site="diagnosis")
         confusion_type = _safe_parse_confusion_type(data.get("confusion_type", "unknown"))
         confidence = float(data.get("confidence", 0.7))
         reasoning = data.get("reasoning", "Unable to determine reasoning.")
@@ -61,7 +81,7 @@ def detect_confusion(
         return DiagnosisResult(
             confusion_type=ConfusionType.UNKNOWN,
             confidence=0.0,
-            reasoning="Could not diagnose confusion type due to an error.",
+            reasoning=_FAILED_REASONING,
         )
 
 
@@ -1,27 +1,137 @@
 """
 Explanation Generator — builds the adaptive explanation using LLM.
+
+Results are cached (services.cache) by every prompt input, so a repeated
+doubt is answered once across all workers; degraded answers only briefly.
+
+Before calling the LLM, the explanation index is searched for a past
+explanation of the same concept and confusion type:
+- near-duplicate doubt (>= EXPLANATION_REUSE_THRESHOLD, same difficulty,
+  no learner context to personalize for) → returned as-is, no LLM call
+- similar doubt (>= EXPLANATION_ADAPT_THRESHOLD) → the LLM adapts it
+- otherwise → the strategy prompt, as before
+
+Follow-ups (the learner was explained this concept moments ago) skip all of
+that: a short delta prompt carries the previous explanation and asks only
+for the missing piece, under a small "follow_up" token budget.
+
+If the LLM call fails (error, or the circuit breaker is open) the learner
+gets a degraded answer (degraded=True) from the first rung of
+EXPLANATION_FALLBACK_LADDER that has one:
+- cached:   the stored explanation of this concept and confusion type
+- nearest:  the closest stored explanation of this concept (any confusion
+            type), or of any concept if it is similar enough
+- template: a strategy-shaped, LLM-free guide (core.fallback_explanations)
+and only if none applies does the error propagate.
 """
 
+import json
 import logging
+import os
 
-from models.confusion_types import ConfusionType
+from models.confusion_types import ConfusionType, ExplanationStrategy
 from models.schemas import ExplainResponse
-from core.strategy_selector import select_strategy, load_prompt_template
+from core.strategy_selector import (
+    load_prompt,
+    load_prompt_template,
+    prompt_version,
+    select_strategy,
+    strategy_prompt_files,
+)
+from core.fallback_explanations import templated_explanation
+from memory.explanation_index import (
+    EXPLANATION_ADAPT_THRESHOLD,
+    EXPLANATION_REUSE_THRESHOLD,
+    get_explanation_index,
+    index_text,
+)
+from services.cache import get_cache
+from services.deadline import has_budget
 from services.llm_client import call_llm_json, LLMError
+from services.tracing import span, traced
+from services.usage import usage_scope
 
 logger = logging.getLogger(__name__)
 
+EXPLANATION_FALLBACK_LADDER = tuple(
+    step.strip() for step in os.getenv("EXPLANATION_FALLBACK_LADDER", "cached,nearest,template").split(",")
+    if step.strip()
+)
+
 
+@traced()
 def generate_explanation(
     concept: str,
     user_doubt: str,
     confusion_type: ConfusionType,
     code_snippet: str | None = None,
     difficulty_level: str = "beginner",
+    learner_context: str | None = None,
+    previous_explanation: dict | None = None,
 ) -> ExplainResponse:
+    """
+    previous_explanation: the learner's last full explanation of this concept
+    (LearnerMemory.get_follow_up_context) — switches to delta mode.
+    """
+    cache = get_cache(
+        "explanation",
+        prompt_version(*strategy_prompt_files(), "adapt_explanation.txt", "follow_up_delta.txt"),
+    )
+    data = cache.get_or_compute(
+        (
+            concept, user_doubt, confusion_type.value, code_snippet, difficulty_level, learner_context,
+            previous_explanation["explanation"] if previous_explanation else None,
+        ),
+        lambda: _generate_explanation(
+            concept, user_doubt, confusion_type, code_snippet,
+            difficulty_level, learner_context, previous_explanation,
+        ).model_dump(mode="json"),
+        is_negative=lambda data: data["degraded"],
+    )
+    return ExplainResponse(**data)
+
+
+def _generate_explanation(
+    concept: str,
+    user_doubt: str,
+    confusion_type: ConfusionType,
+    code_snippet: str | None,
+    difficulty_level: str,
+    learner_context: str | None,
+    previous_explanation: dict | None,
+) -> ExplainResponse:
+    index = get_explanation_index()
+    text = index_text(user_doubt, code_snippet)
+
+    if previous_explanation:
+        try:
+            return _generate_follow_up(
+                concept, user_doubt, confusion_type, previous_explanation,
+                code_snippet, difficulty_level, learner_context,
+            )
+        except LLMError as e:
+            strategy = ExplanationStrategy(previous_explanation["strategy_used"])
+            return _degraded_explanation(concept, confusion_type, strategy, text, index, None, e)
 
     strategy = select_strategy(confusion_type)
-    template = load_prompt_template(strategy)
+
+    match = None
+    if index is not None:
+        try:
+            with span("explanation_index.search") as s:
+                match = index.search(concept, confusion_type.value, text, difficulty_level)
+                s.set(score=round(match.score, 3) if match else None)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Explanation index lookup failed: {e}")
+
+    if (
+        match is not None
+        and match.score >= EXPLANATION_REUSE_THRESHOLD
+        and match.difficulty_level == difficulty_level
+        and not learner_context
+    ):
+        logger.info(f"Reusing stored explanation for '{concept}' (similarity {match.score:.2f})")
+        return ExplainResponse(**match.response)
 
     code_context = (
         f"\nCode the learner is working with:\n```\n{code_snippet}\n```"
@@ -29,17 +139,41 @@ def generate_explanation(
         else ""
     )
 
-    prompt = template.format(
-        concept=concept,
-        user_doubt=user_doubt,
-        code_context=code_context,
-        difficulty_level=difficulty_level,
+    learner_context = (
+        f"What we know about this learner: {learner_context}. "
+        "Build on what they have mastered and take extra care around what they struggle with.\n"
+        if learner_context
+        else ""
     )
 
-    # Raise error directly — do NOT silently fallback so we can see what's wrong
-    data = call_llm_json(prompt)
+    if match is not None and match.score >= EXPLANATION_ADAPT_THRESHOLD:
+        logger.info(f"Adapting stored explanation for '{concept}' (similarity {match.score:.2f})")
+        prompt = load_prompt("adapt_explanation.txt").format(
+            concept=concept,
+            confusion_type=confusion_type.value,
+            user_doubt=user_doubt,
+            code_context=code_context,
+            difficulty_level=difficulty_level,
+            learner_context=learner_context,
+            reference=json.dumps(_reference_fields(match.response), indent=2),
+        )
+    else:
+        prompt = load_prompt_template(strategy).format(
+            concept=concept,
+            user_doubt=user_doubt,
+            code_context=code_context,
+            difficulty_level=difficulty_level,
+            learner_context=learner_context,
+        )
 
-    return ExplainResponse(
+    # On LLM failure, fall back down EXPLANATION_FALLBACK_LADDER (marked degraded)
+    try:
+        with usage_scope(strategy=strategy.value):
+            data = call_llm_json(prompt, call_site="explanation", difficulty_level=difficulty_level)
+    except LLMError as e:
+        return _degraded_explanation(concept, confusion_type, strategy, text, index, match, e)
+
+    response = ExplainResponse(
         concept=concept,
         confusion_type=confusion_type,
         strategy_used=strategy,
@@ -50,21 +184,90 @@ def generate_explanation(
         follow_up_hint=data.get("follow_up_hint"),
     )
 
+    # Optional: only when there is time left to write it. Personalised
+    # answers are not stored — they would be reused for other learners
+    if index is not None and not learner_context and has_budget():
+        try:
+            index.add(concept, confusion_type.value, text, difficulty_level, response.model_dump(mode="json"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not add explanation to the index: {e}")
+    return response
+
+
+def _reference_fields(response: dict) -> dict:
+    """The parts of a stored explanation worth showing the LLM."""
+    return {
+        k: response.get(k)
+        for k in ("explanation", "analogy", "key_insight", "common_mistake", "follow_up_hint")
+        if response.get(k)
+    }
 
-def generate_explanation_full_pipeline(
+
+def _degraded_explanation(
     concept: str,
-    user_doubt: str,
-    code_snippet: str | None = None,
-    difficulty_level: str = "beginner",
-):
-    from core.confusion_detector import detect_confusion
+    confusion_type: ConfusionType,
+    strategy: ExplanationStrategy,
+    text: str,
+    index,
+    match,
+    error: LLMError,
+) -> ExplainResponse:
+    """Walk EXPLANATION_FALLBACK_LADDER; re-raise `error` if no rung has an answer."""
+    for step in EXPLANATION_FALLBACK_LADDER:
+        fields = None
+        try:
+            if step == "cached" and index is not None:
+                if match is None:
+                    match = index.search(concept, confusion_type.value, text, "")
+                fields = match.response if match is not None else None
+            elif step == "nearest" and index is not None:
+                nearest = index.nearest(concept, text)
+                fields = nearest.response if nearest is not None else None
+            elif step == "template":
+                fields = templated_explanation(concept, confusion_type, strategy)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Fallback '{step}' failed: {e}")
+            continue
+        if fields:
+            logger.warning(f"LLM unavailable ({error}); serving '{step}' explanation for '{concept}'")
+            return ExplainResponse(**{
+                **fields,
+                "confusion_type": confusion_type,
+                "degraded": True,
+                "fallback": step,
+            })
+    raise error
 
-    diagnosis = detect_confusion(concept, user_doubt, code_snippet)
-    explanation = generate_explanation(
+
+def _generate_follow_up(
+    concept: str,
+    user_doubt: str,
+    confusion_type: ConfusionType,
+    previous: dict,
+    code_snippet: str | None,
+    difficulty_level: str,
+    learner_context: str | None,
+) -> ExplainResponse:
+    """Delta answer: only what the previous explanation was missing."""
+    logger.info(f"Follow-up on '{concept}' — answering with a delta")
+    prompt = load_prompt("follow_up_delta.txt").format(
         concept=concept,
+        previous_explanation=previous["explanation"],
         user_doubt=user_doubt,
-        confusion_type=diagnosis.confusion_type,
-        code_snippet=code_snippet,
+        code_context=f"\nCode the learner is working with:\n```\n{code_snippet}\n```" if code_snippet else "",
+        confusion_type=confusion_type.value,
         difficulty_level=difficulty_level,
+        learner_context=f"What we know about this learner: {learner_context}.\n" if learner_context else "",
+    )
+    with usage_scope(strategy=previous["strategy_used"]):
+        data = call_llm_json(prompt, call_site="follow_up")
+
+    return ExplainResponse(
+        concept=concept,
+        confusion_type=confusion_type,
+        # Same conversation, same strategy as the explanation being refined
+        strategy_used=previous["strategy_used"],
+        explanation=data.get("explanation", "No explanation generated."),
+        key_insight=data.get("key_insight") or "",
+        follow_up_hint=data.get("follow_up_hint"),
     )
-    return explanation, diagnosis
\ No newline at end of file
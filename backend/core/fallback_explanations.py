@@ -0,0 +1,95 @@
+"""
+Fallback Explanations — templated, LLM-free explanations per strategy.
+
+The last rung of the degradation ladder in explanation_generator: when the
+LLM is unavailable and nothing similar has been explained before, the
+learner still gets a structured way into the concept, written in the
+voice of the strategy their confusion type maps to (see
+get_strategy_description), instead of a 500.
+"""
+
+from models.confusion_types import ConfusionType, ExplanationStrategy
+from core.strategy_selector import get_strategy_description
+
+_TEMPLATES: dict[ExplanationStrategy, dict[str, str]] = {
+    ExplanationStrategy.ANALOGY: {
+        "explanation": (
+            "Let's build a mental model of {concept}. Think of something everyday that behaves the "
+            "same way — a process with the same inputs, steps and result. Name each part of {concept} "
+            "and match it to a part of that everyday thing, then check where the comparison breaks "
+            "down: those edges are usually where the confusion sits."
+        ),
+        "analogy": "Like learning a new route by comparing it to one you already drive every day.",
+        "key_insight": "A good analogy maps every part of {concept} to something you already understand.",
+    },
+    ExplanationStrategy.STEP_BY_STEP: {
+        "explanation": (
+            "Let's take {concept} one step at a time. 1) Write down what goes in and what should "
+            "come out. 2) List the steps in between, in order, in your own words. 3) Walk through "
+            "them with a tiny concrete example and write down the state after each step. 4) Find "
+            "the first step where what you wrote differs from what you expected — that's the step "
+            "to focus on."
+        ),
+        "key_insight": "Tracing {concept} with a small example, step by step, shows exactly where it stops making sense.",
+    },
+    ExplanationStrategy.INTUITION_FIRST: {
+        "explanation": (
+            "Before the how, the why: {concept} exists because of a problem that is awkward to solve "
+            "without it. Try to state that problem in one sentence, and imagine solving it the long "
+            "way. The shortcut {concept} gives you is the idea to hold on to; the syntax and the "
+            "details are just how that idea is written down."
+        ),
+        "key_insight": "Understand which problem {concept} solves before memorising how it is written.",
+    },
+    ExplanationStrategy.CODE_FIRST: {
+        "explanation": (
+            "Let's let code settle it. Write the smallest program that uses {concept}, predict its "
+            "output before running it, then run it. If the output surprises you, change one thing "
+            "at a time and predict again. The place where your prediction and the real output "
+            "disagree is the exact belief about {concept} that needs correcting."
+        ),
+        "common_mistake": "Reasoning about {concept} in the abstract instead of testing a prediction with real code.",
+        "key_insight": "Predict, run, compare: the mismatch shows what to fix in your model of {concept}.",
+    },
+    ExplanationStrategy.VISUAL_REASONING: {
+        "explanation": (
+            "Let's draw {concept}. Sketch each piece as a box and each relationship as an arrow "
+            "between boxes. Then redraw the picture for a second situation where you want to use "
+            "{concept}: the boxes and arrows that stay the same are the pattern that carries over; "
+            "the ones that change are the details to adapt."
+        ),
+        "key_insight": "The shape of {concept} stays the same across problems — only the labels change.",
+    },
+    ExplanationStrategy.SIMPLIFIED: {
+        "explanation": (
+            "Let's restate {concept} in the simplest terms we can. Say in one sentence what it does, "
+            "without jargon. Then add one detail at a time, checking each against a small example, "
+            "until the full picture is back. If a detail contradicts your sentence, it's the sentence "
+            "that needs fixing — that's usually the hidden misconception."
+        ),
+        "key_insight": "Rebuild {concept} from a one-sentence version, adding one checked detail at a time.",
+    },
+}
+
+_NOTE = (
+    " (Our tutor is temporarily running in a reduced mode, so this is a general guide rather than "
+    "an answer to your exact question — ask again in a little while for a personalised explanation.)"
+)
+
+
+def templated_explanation(
+    concept: str,
+    confusion_type: ConfusionType,
+    strategy: ExplanationStrategy,
+) -> dict:
+    """ExplainResponse fields for a strategy-shaped explanation of `concept`, no LLM involved."""
+    template = _TEMPLATES.get(strategy, _TEMPLATES[ExplanationStrategy.SIMPLIFIED])
+    fields = {name: text.format(concept=concept) for name, text in template.items()}
+    fields["explanation"] += _NOTE
+    return {
+        "concept": concept,
+        "confusion_type": confusion_type,
+        "strategy_used": strategy,
+        "follow_up_hint": f"Approach: {get_strategy_description(strategy).lower()}.",
+        **fields,
+    }
@@ -0,0 +1,274 @@
+"""
+Input Processor — cleans the learner's code snippet before it reaches a prompt.
+
+The "Input Processing Module" of design.md. The same processed snippet is
+given to both the diagnosis and the explanation prompt, so a learner who
+pastes a whole file pays for (at most) SNIPPET_MAX_TOKENS of it, twice,
+instead of the whole file twice.
+
+- Always: line endings, tabs and trailing whitespace are normalized, blank
+  runs collapsed and the common indentation removed.
+- Over budget, in order until it fits:
+  1. dedupe:    repeated blocks and runs of one repeated line are collapsed
+  2. ast:       Python that parses is cut down to the functions/classes (and
+                top-level statements) that mention what the doubt talks
+                about, plus the functions those call
+  3. lines:     otherwise, the lines that mention it with a little context
+  4. truncated: otherwise, the head of the snippet
+  Omitted stretches are marked with "# ..." lines so the model knows
+  something was cut. Steps 1-4 run on the CPU pool (services.cpu_pool).
+"""
+
+import ast
+import keyword
+import logging
+import os
+import re
+import textwrap
+from typing import Optional
+
+from services.cpu_pool import cpu_task, run_cpu
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+SNIPPET_MAX_TOKENS    = int(os.getenv("SNIPPET_MAX_TOKENS", "600"))
+# Lines kept around each matching line when selecting by lines
+SNIPPET_CONTEXT_LINES = int(os.getenv("SNIPPET_CONTEXT_LINES", "3"))
+# A line repeated this many times in a row is collapsed to one
+SNIPPET_REPEAT_MIN    = int(os.getenv("SNIPPET_REPEAT_MIN", "3"))
+
+_CHARS_PER_TOKEN = 4  # same estimate llm_client uses when Bedrock reports no usage
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# Words in a doubt that say nothing about which code it is about
+_STOPWORDS = frozenset(
+    "about after again all also and any are because before but can cant could did does doesnt "
+    "dont even ever every for from get gets getting going has have here how into isnt just keep "
+    "know like line lines make many more much need not now one only other our out same see should "
+    "some than that the their them then there these they thing think this those though through "
+    "too understand use used using very want was way what when where which while who why will "
+    "with without wont work works would wrong yet you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """`text` cut to about `max_tokens`, at a word boundary, marked with '…'."""
+    limit = max_tokens * _CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(None, 1)[0] if " " in text[:limit] else text[:limit]
+    return cut.rstrip() + " …"
+
+
+def normalize_whitespace(code: str) -> str:
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").replace("\r", "\n").expandtabs(4).split("\n")]
+    kept: list[str] = []
+    for line in lines:
+        if line or (kept and kept[-1]):  # at most one blank line in a row
+            kept.append(line)
+    return textwrap.dedent("\n".join(kept)).strip("\n")
+
+
+def prepare_code_snippet(code_snippet: Optional[str], user_doubt: str, concept: str = "") -> Optional[str]:
+    """The snippet to put in prompts: normalized, and cut to SNIPPET_MAX_TOKENS."""
+    if not code_snippet or not code_snippet.strip():
+        return None
+
+    budget = SNIPPET_MAX_TOKENS * _CHARS_PER_TOKEN
+    with span("input_processing", input_chars=len(code_snippet)) as s:
+        code = normalize_whitespace(code_snippet)
+        method = "normalized"
+        if len(code) > budget:
+            # Parsing and selecting is the CPU-heavy part: off the request thread
+            code, method = run_cpu(_cut_to_budget, code, user_doubt, concept, budget)
+        s.set(output_chars=len(code), method=method)
+
+    if method != "normalized":
+        logger.info(
+            f"Code snippet cut from ~{estimate_tokens(code_snippet)} to ~{estimate_tokens(code)} tokens ({method})"
+        )
+    return code
+
+
+@cpu_task()
+def _cut_to_budget(code: str, user_doubt: str, concept: str, budget: int) -> tuple[str, str]:
+    """Steps 1-4 of the module docstring: (cut code, method that got it under budget)."""
+    code, method = _dedupe(code), "dedupe"
+    if len(code) > budget:
+        terms = _doubt_terms(user_doubt, concept)
+        selected, method = _select_python(code, terms, budget), "ast"
+        if selected is None:
+            selected, method = _select_lines(code.split("\n"), terms, budget), "lines"
+        if selected is None:
+            selected, method = _head(code.split("\n"), budget), "truncated"
+        code = selected if len(selected) <= budget else _head(selected.split("\n"), budget)
+    return code, method
+
+
+# ── Dedupe ─────────────────────────────────────────────────────
+
+def _dedupe(code: str) -> str:
+    # Whole blocks (blank-line separated) pasted more than once
+    blocks, seen = [], set()
+    for block in code.split("\n\n"):
+        if "\n" in block and block in seen:
+            continue
+        seen.add(block)
+        blocks.append(block)
+
+    # Runs of one repeated line (log output, copy-paste accidents)
+    out: list[str] = []
+    lines = "\n\n".join(blocks).split("\n")
+    i = 0
+    while i < len(lines):
+        j = i
+        while j + 1 < len(lines) and lines[j + 1] == lines[i]:
+            j += 1
+        run = j - i + 1
+        if lines[i].strip() and run >= SNIPPET_REPEAT_MIN:
+            indent = lines[i][: len(lines[i]) - len(lines[i].lstrip())]
+            out += [lines[i], f"{indent}# ... same line {run - 1} more times"]
+        else:
+            out += lines[i:j + 1]
+        i = j + 1
+    return "\n".join(out)
+
+
+# ── Selection ──────────────────────────────────────────────────
+
+def _doubt_terms(user_doubt: str, concept: str) -> set[str]:
+    """Identifiers and content words the doubt (and concept) mention, lowercased."""
+    return {
+        word.lower() for word in _IDENT_RE.findall(f"{user_doubt} {concept}")
+        if len(word) > 2 and word.lower() not in _STOPWORDS and not keyword.iskeyword(word)
+    }
+
+
+def _names_in(node: ast.AST) -> set[str]:
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.add(child.id.lower())
+        elif isinstance(child, ast.Attribute):
+            names.add(child.attr.lower())
+        elif isinstance(child, ast.arg):
+            names.add(child.arg.lower())
+    return names
+
+
+def _called_names(node: ast.AST) -> set[str]:
+    return {
+        child.func.id for child in ast.walk(node)
+        if isinstance(child, ast.Call) and isinstance(child.func, ast.Name)
+    }
+
+
+def _select_python(code: str, terms: set[str], budget: int) -> Optional[str]:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        # Not Python, or nested too deeply to parse: the line-based cut takes over
+        return None
+
+    # Candidate units: every def/class (methods keep their class line) and
+    # every top-level statement that isn't one
+    units: list[tuple[int, ast.AST, list[tuple[int, int]], str]] = []  # (score, node, ranges, name)
+
+    def visit(body: list[ast.stmt], header: Optional[tuple[int, int]]) -> None:
+        for node in body:
+            start = min([d.lineno for d in getattr(node, "decorator_list", [])] + [node.lineno])
+            ranges = [(start, node.end_lineno)] + ([header] if header else [])
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = node.name
+                score = (10 if name.lower() in terms else 0) + len(_names_in(node) & terms)
+                units.append((score, node, ranges, name))
+                if isinstance(node, ast.ClassDef):
+                    visit(node.body, (start, max(node.lineno, node.body[0].lineno - 1)))
+            elif header is None:
+                units.append((len(_names_in(node) & terms), node, ranges, ""))
+
+    visit(tree.body, None)
+    lines = code.split("\n")
+    defined = {name: (node, ranges) for _, node, ranges, name in units if name}
+
+    picked: list[tuple[int, int]] = []
+    size = 0
+
+    def take(ranges: list[tuple[int, int]]) -> bool:
+        nonlocal size
+        new = [r for r in ranges if r not in picked]
+        cost = sum(len("\n".join(lines[a - 1:b])) + 1 for a, b in new)
+        if size + cost > budget:
+            return False
+        picked.extend(new)
+        size += cost
+        return True
+
+    hits = sorted((u for u in units if u[0] > 0), key=lambda u: (-u[0], u[1].end_lineno - u[1].lineno))
+    chosen = [node for _, node, ranges, _ in hits if take(ranges)]
+    if not chosen:
+        return None
+    # One hop of callees: the helpers the relevant code relies on
+    for node in chosen:
+        for callee in sorted(_called_names(node)):
+            if callee in defined:
+                take(defined[callee][1])
+
+    return _render(lines, picked)
+
+
+def _select_lines(lines: list[str], terms: set[str], budget: int) -> Optional[str]:
+    hits = [
+        i for i, line in enumerate(lines, 1)
+        if terms & {word.lower() for word in _IDENT_RE.findall(line)}
+    ]
+    picked: list[tuple[int, int]] = []
+    size = 0
+    for i in hits:
+        a, b = max(1, i - SNIPPET_CONTEXT_LINES), min(len(lines), i + SNIPPET_CONTEXT_LINES)
+        cost = len("\n".join(lines[a - 1:b])) + 1
+        if size + cost > budget:
+            break
+        picked.append((a, b))
+        size += cost
+    return _render(lines, picked) if picked else None
+
+
+def _head(lines: list[str], budget: int) -> str:
+    kept, size = [], 0
+    for line in lines:
+        if size + len(line) + 1 > budget - 40:  # room for the marker
+            break
+        kept.append(line)
+        size += len(line) + 1
+    if not kept and lines:
+        # A first line longer than the budget (minified JS, a data literal): cut inside it
+        more = f", {len(lines) - 1} more lines" if len(lines) > 1 else ""
+        return f"{lines[0][:max(0, budget - 40)]}\n# ... (line cut{more})"
+    return "\n".join(kept + [f"# ... ({len(lines) - len(kept)} more lines)"])
+
+
+def _render(lines: list[str], ranges: list[tuple[int, int]]) -> str:
+    """The chosen 1-based inclusive line ranges, in source order, gaps marked."""
+    merged: list[list[int]] = []
+    for a, b in sorted(ranges):
+        if merged and a <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+
+    out: list[str] = []
+    previous_end = 0
+    for a, b in merged:
+        if a > previous_end + 1:
+            out.append(f"# ... ({a - previous_end - 1} lines omitted)")
+        out.extend(lines[a - 1:b])
+        previous_end = b
+    if previous_end < len(lines):
+        out.append(f"# ... ({len(lines) - previous_end} lines omitted)")
+    return "\n".join(out)
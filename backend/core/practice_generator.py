@@ -1,21 +1,34 @@
 """
 Practice Generator — generates targeted micro-practice questions
 based on the concept, confusion type, and explanation given.
+Question sets are cached (services.cache) as a shared practice bank.
 """
 
+import json
 import logging
-from pathlib import Path
+import os
+from typing import Iterator
+
+from pydantic import ValidationError
 
 from models.confusion_types import ConfusionType
 from models.schemas import PracticeResponse, PracticeQuestion
-from services.llm_client import call_llm_json_list, LLMError
+from core.input_processor import truncate_to_tokens
+from core.strategy_selector import load_prompt, prompt_version
+from services.cache import get_cache
+from services.json_stream import JsonArrayStream
+from services.llm_client import call_llm_json_list, stream_llm_json, LLMError
+from services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
-_PROMPT_PATH = Path(__file__).resolve().parent.parent / "prompts" / "practice_questions.txt"
-_PROMPT_TEMPLATE = _PROMPT_PATH.read_text(encoding="utf-8")
+_PROMPT_FILE = "practice_questions.txt"
+
+# The explanation is context for the questions, not something to repeat back
+PRACTICE_EXPLANATION_MAX_TOKENS = int(os.getenv("PRACTICE_EXPLANATION_MAX_TOKENS", "200"))
 
 
+@traced()
 def generate_practice_questions(
     concept: str,
     confusion_type: ConfusionType,
@@ -37,17 +50,32 @@ def generate_practice_questions(
         PracticeResponse with list of targeted questions
     """
     num_questions = max(1, min(num_questions, 5))  # clamp to 1-5
-
-    prompt = _PROMPT_TEMPLATE.format(
-        concept=concept,
-        confusion_type=confusion_type.value,
-        explanation_given=explanation_given[:800],  # Truncate to avoid token overflow
-        difficulty_level=difficulty_level,
-        num_questions=num_questions,
+    data = _practice_cache().get_or_compute(
+        _cache_key(concept, confusion_type, explanation_given, difficulty_level, num_questions),
+        lambda: _generate(
+            concept, confusion_type, explanation_given, difficulty_level, num_questions,
+        ).model_dump(mode="json"),
+        is_negative=lambda data: _is_fallback(data["questions"], concept),
     )
+    return PracticeResponse(**data)
+
+
+def _generate(
+    concept: str,
+    confusion_type: ConfusionType,
+    explanation_given: str,
+    difficulty_level: str,
+    num_questions: int,
+) -> PracticeResponse:
+    prompt = _build_prompt(concept, confusion_type, explanation_given, difficulty_level, num_questions)
 
     try:
-        raw_questions = call_llm_json_list(prompt)
+        raw_questions = call_llm_json_list(
+            prompt,
+            call_site="practice",
+            difficulty_level=difficulty_level,
+            num_questions=num_questions,
+        )
         questions = [_parse_question(q, idx) for idx, q in enumerate(raw_questions, 1)]
 
         return PracticeResponse(
@@ -65,6 +93,77 @@ def generate_practice_questions(
         )
 
 
+def stream_practice_questions(
+    concept: str,
+    confusion_type: ConfusionType,
+    explanation_given: str,
+    difficulty_level: str = "beginner",
+    num_questions: int = 2,
+) -> Iterator[PracticeQuestion]:
+    """
+    Same questions as generate_practice_questions, yielded one at a time as
+    soon as each one's JSON object is complete in the LLM stream.
+
+    Each item is validated through _parse_question as it arrives; an item
+    that doesn't parse is replaced by _fallback_question in its slot, the
+    others are delivered as generated. If the stream fails before any
+    question arrived, the single fallback question is yielded, as in
+    generate_practice_questions. A set already in the practice cache is
+    replayed at once, and a clean streamed set is added to it.
+    """
+    num_questions = max(1, min(num_questions, 5))  # clamp to 1-5
+    cache = _practice_cache()
+    key = _cache_key(concept, confusion_type, explanation_given, difficulty_level, num_questions)
+    cached = cache.get(key)
+    if cached is not None and not _is_fallback(cached["questions"], concept):
+        yield from (PracticeQuestion(**q) for q in cached["questions"])
+        return
+
+    prompt = _build_prompt(concept, confusion_type, explanation_given, difficulty_level, num_questions)
+    questions: list[PracticeQuestion] = []
+    failed = False
+
+    delivered = 0
+    parser = JsonArrayStream()
+    stream = stream_llm_json(
+        prompt,
+        call_site="practice",
+        difficulty_level=difficulty_level,
+        num_questions=num_questions,
+    )
+    try:
+        for delta in stream:
+            for element in parser.feed(delta):
+                delivered += 1
+                question, ok = _parse_streamed_question(element, delivered, concept)
+                questions.append(question)
+                failed |= not ok
+                yield question
+                if delivered >= num_questions:
+                    break
+            if parser.finished or delivered >= num_questions:
+                break
+        if parser.partial and delivered < num_questions:
+            # Cut off mid-object (token cap): that slot fails, the rest stand
+            logger.warning(f"Practice stream ended inside question {delivered + 1}")
+            delivered += 1
+            failed = True
+            yield _fallback_question(concept, delivered)
+    except LLMError as e:
+        logger.error(f"Practice stream failed after {delivered} question(s): {e}")
+        failed = True
+    finally:
+        stream.close()
+
+    if delivered == 0:
+        yield _fallback_question(concept)
+    elif not failed:
+        # A complete, clean set serves the next /practice or /practice/stream call
+        cache.set(key, PracticeResponse(
+            concept=concept, confusion_type=confusion_type, questions=questions,
+        ).model_dump(mode="json"))
+
+
 def evaluate_answer(
     question: str,
     correct_answer: str,
@@ -97,7 +196,7 @@ Respond ONLY with valid JSON:
 }}
 """
     try:
-        return call_llm_json(prompt)
+        return call_llm_json(prompt, call_site="feedback")
     except LLMError:
         return {
             "is_correct": learner_answer.strip().lower() == correct_answer.strip().lower(),
@@ -122,10 +221,60 @@ def _parse_question(data: dict, idx: int) -> PracticeQuestion:
     )
 
 
-def _fallback_question(concept: str) -> PracticeQuestion:
+def _build_prompt(
+    concept: str,
+    confusion_type: ConfusionType,
+    explanation_given: str,
+    difficulty_level: str,
+    num_questions: int,
+) -> str:
+    return load_prompt(_PROMPT_FILE).format(
+        concept=concept,
+        confusion_type=confusion_type.value,
+        explanation_given=truncate_to_tokens(explanation_given, PRACTICE_EXPLANATION_MAX_TOKENS),
+        difficulty_level=difficulty_level,
+        num_questions=num_questions,
+    )
+
+
+def _practice_cache():
+    return get_cache("practice", prompt_version(_PROMPT_FILE))
+
+
+def _cache_key(
+    concept: str,
+    confusion_type: ConfusionType,
+    explanation_given: str,
+    difficulty_level: str,
+    num_questions: int,
+) -> tuple:
+    return (
+        concept, confusion_type.value,
+        truncate_to_tokens(explanation_given, PRACTICE_EXPLANATION_MAX_TOKENS),
+        difficulty_level, num_questions,
+    )
+
+
+def _is_fallback(questions: list[dict], concept: str) -> bool:
+    return questions == [_fallback_question(concept).model_dump(mode="json")]
+
+
+def _parse_streamed_question(element: str, idx: int, concept: str) -> tuple[PracticeQuestion, bool]:
+    """One streamed array element → (PracticeQuestion, True), or (the fallback in its slot, False)."""
+    try:
+        data = json.loads(element)
+        if not isinstance(data, dict):
+            raise ValueError(f"expected an object, got {type(data).__name__}")
+        return _parse_question(data, idx), True
+    except (ValueError, ValidationError) as e:  # JSONDecodeError is a ValueError
+        logger.warning(f"Streamed practice question {idx} is invalid, using fallback: {e}")
+        return _fallback_question(concept, idx), False
+
+
+def _fallback_question(concept: str, idx: int = 1) -> PracticeQuestion:
     """Returns a generic fallback question when LLM fails."""
     return PracticeQuestion(
-        question_id=1,
+        question_id=idx,
         question=f"In your own words, explain what '{concept}' means and give one example.",
         question_type="short_answer",
         options=None,
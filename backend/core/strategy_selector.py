@@ -1,12 +1,16 @@
 """
 Strategy Selector — maps confusion type to the best explanation strategy.
-Also loads the corresponding prompt template.
+Also loads the corresponding prompt template (and every other prompt file:
+nothing reads prompts at import time; see preload_prompts for warm-up).
 """
 
+import hashlib
 import logging
+import os
 from pathlib import Path
 
 from models.confusion_types import ConfusionType, ExplanationStrategy, CONFUSION_STRATEGY_MAP
+from services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +26,11 @@ _STRATEGY_PROMPT_FILES: dict[ExplanationStrategy, str] = {
     ExplanationStrategy.SIMPLIFIED:    "simplified_rephrasing.txt",
 }
 
-# Cache loaded templates
-_template_cache: dict[ExplanationStrategy, str] = {}
+# Cache loaded templates, by filename
+_template_cache: dict[str, str] = {}
 
 
+@traced()
 def select_strategy(confusion_type: ConfusionType) -> ExplanationStrategy:
     """
     Return the best explanation strategy for a given confusion type.
@@ -41,6 +46,7 @@ def select_strategy(confusion_type: ConfusionType) -> ExplanationStrategy:
     return strategy
 
 
+@traced()
 def load_prompt_template(strategy: ExplanationStrategy) -> str:
     """
     Load and return the prompt template for the given strategy.
@@ -52,22 +58,48 @@ def load_prompt_template(strategy: ExplanationStrategy) -> str:
     Returns:
         Raw prompt template string (with {placeholders} for .format())
     """
-    if strategy in _template_cache:
-        return _template_cache[strategy]
+    return load_prompt(_STRATEGY_PROMPT_FILES.get(strategy, "step_by_step.txt"))
 
-    filename = _STRATEGY_PROMPT_FILES.get(strategy, "step_by_step.txt")
-    template_path = _PROMPTS_DIR / filename
 
+def load_prompt(filename: str) -> str:
+    """Load a prompt file from prompts/, cached after first load."""
+    template = _template_cache.get(filename)
+    if template is not None:
+        return template
+
+    template_path = _PROMPTS_DIR / filename
     if not template_path.exists():
         logger.error(f"Prompt file not found: {template_path}")
         raise FileNotFoundError(f"Prompt template missing: {filename}")
 
     template = template_path.read_text(encoding="utf-8")
-    _template_cache[strategy] = template
+    _template_cache[filename] = template
     logger.debug(f"Loaded prompt template: {filename}")
     return template
 
 
+def strategy_prompt_files() -> tuple[str, ...]:
+    return tuple(sorted(set(_STRATEGY_PROMPT_FILES.values())))
+
+
+def prompt_version(*filenames: str) -> str:
+    """
+    Short hash of the given prompt files and the model they are sent to —
+    the cache version (services.cache) of results generated from them.
+    """
+    digest = hashlib.sha256(os.getenv("BEDROCK_MODEL_ID", "google.gemma-3-12b-it").encode("utf-8"))
+    for filename in filenames:
+        digest.update(load_prompt(filename).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def preload_prompts() -> int:
+    """Read every prompt file into the cache (startup warm-up). Returns the count."""
+    for path in sorted(_PROMPTS_DIR.glob("*.txt")):
+        load_prompt(path.name)
+    return len(_template_cache)
+
+
 def get_strategy_description(strategy: ExplanationStrategy) -> str:
     """Human-readable description of what each strategy does."""
     descriptions = {
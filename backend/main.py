@@ -4,6 +4,16 @@ Confusion-Aware Adaptive Learning System (CAALS)
 Team: Data Dragons | AI for Bharat Hackathon
 """
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+# .env must be loaded before any module reads its env-driven settings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -14,21 +24,70 @@ from fastapi.responses import JSONResponse
 
 from api.routes.explain import router as explain_router
 from api.routes.practice import router as practice_router
+from api.routes.metrics import router as metrics_router
+from api.routes.review import router as review_router
+from api.routes.analytics import router as analytics_router
+from api.routes.learners import router as learners_router
+from api.routes.health import router as health_router
+from api.middleware.admission import AdmissionMiddleware
+from api.middleware.capture import CaptureMiddleware
+from api.middleware.compression import CompressionMiddleware
+from api.middleware.deadline import DeadlineMiddleware
+from api.middleware.request_id import REQUEST_ID_HEADER, RequestIdMiddleware
+from api.responses import JSON_RESPONSE_CLASS
 from models.schemas import HealthResponse
+from services.capture import CAPTURE_ENABLED, get_capture_recorder
+from services.cpu_pool import start_cpu_pool, stop_cpu_pool
+from services.token_budget import get_token_budgeter
+from services.tracing import RequestIdLogFilter
+from services.usage import QuotaExceeded, get_usage_meter
+from services.warmup import WARMUP_ON_STARTUP, warm_up
 
 # ── Logging ────────────────────────────────────────────────────
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    format="%(asctime)s | %(levelname)s | %(request_id)s | %(name)s | %(message)s",
 )
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(RequestIdLogFilter())
 logger = logging.getLogger(__name__)
 
+async def _warm_up_in_background():
+    """Warm up while already serving /health/live; /health/ready flips when done."""
+    report = await asyncio.to_thread(warm_up)
+    steps = ", ".join(
+        f"{name} {step['ms']}ms{'' if step['ok'] else ' (failed)'}"
+        for name, step in report["steps"].items()
+    )
+    logger.info(f"   Warm-up      : {report['duration_ms']}ms ({steps})")
+    logger.info(f"   Ready in     : {(time.perf_counter() - _IMPORT_STARTED) * 1000:.0f}ms since import")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("AI Tutor Backend starting up...")
     logger.info(f"   LLM Provider : {os.getenv('LLM_PROVIDER', 'openai')}")
     logger.info(f"   LLM Model    : {os.getenv('LLM_MODEL', 'gpt-4o-mini')}")
+    pool = start_cpu_pool()
+    logger.info(f"   CPU pool     : {pool.describe() if pool else 'inline'}")
+    warmup_task = asyncio.create_task(_warm_up_in_background()) if WARMUP_ON_STARTUP else None
+    if warmup_task is None:
+        logger.info(f"   Ready in     : {(time.perf_counter() - _IMPORT_STARTED) * 1000:.0f}ms since import (no warm-up)")
     yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    stop_cpu_pool()
+    logger.info(f"   Usage        : flushed {get_usage_meter().flush()} pending row(s)")
+    if CAPTURE_ENABLED:
+        recorder = get_capture_recorder()
+        recorder.flush()
+        logger.info(f"   Capture      : {recorder.requests} request(s), {recorder.llm_calls} LLM call(s) in {recorder.directory}")
+    report = get_token_budgeter().report()
+    logger.info(
+        f"   Token budget : {report['calls']} calls, "
+        f"{report['max_tokens_reserved_saved']} max_tokens saved, "
+        f"~{report['net_latency_saved_ms']}ms net latency saved"
+    )
     logger.info("AI Tutor Backend shutting down...")
 
 app = FastAPI(
@@ -40,10 +99,20 @@ app = FastAPI(
     ),
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=JSON_RESPONSE_CLASS,
     docs_url="/docs",
     redoc_url="/redoc",
 )
 
+# ── Deadlines (per-request budget; cancels work when the client leaves) ─
+app.add_middleware(DeadlineMiddleware)
+
+# ── Traffic capture (off unless CAPTURE_ENABLED; see benchmarks/replay.py) ─
+app.add_middleware(CaptureMiddleware)
+
+# ── Admission control (rate limits; inside CORS so 429s stay readable) ───
+app.add_middleware(AdmissionMiddleware)
+
 # ── CORS (cross origin resource sharing)──────────────────────────────────
 app.add_middleware(
     CORSMiddleware,
@@ -51,13 +120,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[REQUEST_ID_HEADER],
 )
 
+# ── Compression (gzip/brotli, negotiated; small bodies skipped) ───────────
+app.add_middleware(CompressionMiddleware)
+
+# ── Request ID + tracing (outermost, so spans cover the whole request) ────
+app.add_middleware(RequestIdMiddleware)
+
 # ── Routes ─────────────────────────────────────────────────────
 app.include_router(explain_router)
 app.include_router(practice_router)
+app.include_router(review_router)
+app.include_router(analytics_router)
+app.include_router(learners_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
 
-# ── Health Check ───────────────────────────────────────────────
+# ── Health Check (see /health/live and /health/ready for probes) ───────────
 @app.get("/", response_model=HealthResponse, tags=["health"])
 async def root():
     return HealthResponse(status="ok", version="1.0.0")
@@ -66,6 +147,16 @@ async def root():
 async def health():
     return HealthResponse(status="ok", version="1.0.0")
 
+# ── Quota Handler ──────────────────────────────────────────────
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded_handler(request, exc: QuotaExceeded):
+    logger.info(f"Quota exceeded: {exc}")
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "used": exc.used, "quota": exc.quota},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # ── Global Error Handler ───────────────────────────────────────
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
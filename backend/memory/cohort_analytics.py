@@ -0,0 +1,310 @@
+"""
+Cohort Analytics — pre-aggregated confusion and mastery rollups.
+
+Every record_session / record_practice_result bumps a handful of counters
+in SQLite summary tables, keyed by cohort. Instructor queries then read
+those small tables (one row per concept × confusion type, plus one per time
+bucket) instead of opening every learner file — cost depends on the number
+of concepts, not the number of learners.
+
+Every update is written twice: once under the learner's cohort (if any) and
+once under ALL_COHORTS, so the whole-platform view is always available.
+When a learner changes cohort their whole contribution (learner_contribution)
+moves to the new cohort; when their memory is cleared it is subtracted.
+"""
+
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from memory.sqlite_store import get_connection, register_schema
+
+logger = logging.getLogger(__name__)
+
+ALL_COHORTS = "*"
+
+# Width of a trend bucket (default: one day)
+ANALYTICS_BUCKET_SECONDS = int(os.getenv("ANALYTICS_BUCKET_SECONDS", "86400"))
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS cohort_concepts (
+    cohort_id  TEXT NOT NULL,
+    concept    TEXT NOT NULL,
+    sessions   INTEGER NOT NULL DEFAULT 0,
+    learners   INTEGER NOT NULL DEFAULT 0,
+    mastered   INTEGER NOT NULL DEFAULT 0,
+    struggling INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cohort_id, concept)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_cohort_concepts_sessions ON cohort_concepts (cohort_id, sessions DESC);
+
+CREATE TABLE IF NOT EXISTS cohort_concept_confusion (
+    cohort_id      TEXT NOT NULL,
+    concept        TEXT NOT NULL,
+    confusion_type TEXT NOT NULL,
+    sessions       INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cohort_id, concept, confusion_type)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS cohort_confusion_trend (
+    cohort_id      TEXT NOT NULL,
+    bucket_start   INTEGER NOT NULL,
+    concept        TEXT NOT NULL,
+    confusion_type TEXT NOT NULL,
+    sessions       INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cohort_id, bucket_start, concept, confusion_type)
+) WITHOUT ROWID;
+""")
+
+
+class CohortAnalytics:
+    """Incrementally maintained per-cohort rollups."""
+
+    # ── Updates (called from LearnerMemory) ────────────────────
+
+    def record_session(
+        self,
+        cohort_id: Optional[str],
+        concept: str,
+        confusion_type: str,
+        first_time_for_learner: bool,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        timestamp = timestamp if timestamp is not None else time.time()
+        bucket = int(timestamp // ANALYTICS_BUCKET_SECONDS) * ANALYTICS_BUCKET_SECONDS
+        new_learner = 1 if first_time_for_learner else 0
+
+        conn = get_connection()
+        conn.execute("BEGIN")
+        try:
+            for cohort in _cohorts(cohort_id):
+                conn.execute(
+                    "INSERT INTO cohort_concepts (cohort_id, concept, sessions, learners) "
+                    "VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (cohort_id, concept) DO UPDATE SET "
+                    "sessions = sessions + 1, learners = learners + excluded.learners",
+                    (cohort, concept, new_learner),
+                )
+                conn.execute(
+                    "INSERT INTO cohort_concept_confusion (cohort_id, concept, confusion_type, sessions) "
+                    "VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT (cohort_id, concept, confusion_type) DO UPDATE SET sessions = sessions + 1",
+                    (cohort, concept, confusion_type),
+                )
+                conn.execute(
+                    "INSERT INTO cohort_confusion_trend "
+                    "(cohort_id, bucket_start, concept, confusion_type, sessions) "
+                    "VALUES (?, ?, ?, ?, 1) "
+                    "ON CONFLICT (cohort_id, bucket_start, concept, confusion_type) "
+                    "DO UPDATE SET sessions = sessions + 1",
+                    (cohort, bucket, concept, confusion_type),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def record_mastery_change(
+        self,
+        cohort_id: Optional[str],
+        concept: str,
+        mastered_delta: int,
+        struggling_delta: int,
+    ) -> None:
+        if not mastered_delta and not struggling_delta:
+            return
+        conn = get_connection()
+        conn.execute("BEGIN")
+        try:
+            for cohort in _cohorts(cohort_id):
+                conn.execute(
+                    "INSERT INTO cohort_concepts (cohort_id, concept, mastered, struggling) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (cohort_id, concept) DO UPDATE SET "
+                    "mastered = mastered + excluded.mastered, "
+                    "struggling = struggling + excluded.struggling",
+                    (cohort, concept, mastered_delta, struggling_delta),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def move_learner(
+        self,
+        old_cohort_id: Optional[str],
+        new_cohort_id: Optional[str],
+        contribution: dict,
+    ) -> None:
+        """Move a learner's contribution between cohorts (ALL_COHORTS keeps it)."""
+        signs = [(c, -1) for c in _cohorts(old_cohort_id) if c != ALL_COHORTS]
+        signs += [(c, 1) for c in _cohorts(new_cohort_id) if c != ALL_COHORTS]
+        self._apply(contribution, signs)
+
+    def remove_learner(self, cohort_id: Optional[str], contribution: dict) -> None:
+        """Subtract a learner's contribution from their cohort and ALL_COHORTS."""
+        self._apply(contribution, [(c, -1) for c in _cohorts(cohort_id)])
+
+    def _apply(self, contribution: dict, signs: list[tuple[str, int]]) -> None:
+        if not signs or not contribution["concepts"]:
+            return
+        conn = get_connection()
+        conn.execute("BEGIN")
+        try:
+            for cohort, sign in signs:
+                for concept, counts in contribution["concepts"].items():
+                    _bump(conn, "cohort_concepts", {"cohort_id": cohort, "concept": concept}, counts, sign)
+                for (concept, ct), n in contribution["confusion"].items():
+                    _bump(
+                        conn, "cohort_concept_confusion",
+                        {"cohort_id": cohort, "concept": concept, "confusion_type": ct},
+                        {"sessions": n}, sign,
+                    )
+                for (bucket, concept, ct), n in contribution["trend"].items():
+                    _bump(
+                        conn, "cohort_confusion_trend",
+                        {"cohort_id": cohort, "bucket_start": bucket, "concept": concept, "confusion_type": ct},
+                        {"sessions": n}, sign,
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ── Queries ────────────────────────────────────────────────
+
+    def cohort_summary(
+        self,
+        cohort_id: str = ALL_COHORTS,
+        top: int = 10,
+        days: int = 14,
+        now: Optional[float] = None,
+    ) -> dict:
+        """
+        The cohort's most-confused concepts (with confusion breakdown and
+        mastery rates) plus a per-bucket trend of confusion types.
+        """
+        conn = get_connection()
+        concept_rows = conn.execute(
+            "SELECT concept, sessions, learners, mastered, struggling FROM cohort_concepts "
+            "WHERE cohort_id = ? ORDER BY sessions DESC LIMIT ?",
+            (cohort_id, top),
+        ).fetchall()
+
+        concepts = [c["concept"] for c in concept_rows]
+        breakdown: dict[str, dict[str, int]] = {c: {} for c in concepts}
+        if concepts:
+            placeholders = ",".join("?" * len(concepts))
+            for row in conn.execute(
+                "SELECT concept, confusion_type, sessions FROM cohort_concept_confusion "
+                f"WHERE cohort_id = ? AND concept IN ({placeholders})",
+                (cohort_id, *concepts),
+            ):
+                breakdown[row["concept"]][row["confusion_type"]] = row["sessions"]
+
+        now = now if now is not None else time.time()
+        since = int(now // ANALYTICS_BUCKET_SECONDS - days + 1) * ANALYTICS_BUCKET_SECONDS
+        trend: dict[int, dict[str, int]] = {}
+        for row in conn.execute(
+            "SELECT bucket_start, confusion_type, SUM(sessions) AS sessions "
+            "FROM cohort_confusion_trend WHERE cohort_id = ? AND bucket_start >= ? "
+            "GROUP BY bucket_start, confusion_type ORDER BY bucket_start",
+            (cohort_id, since),
+        ):
+            trend.setdefault(row["bucket_start"], {})[row["confusion_type"]] = row["sessions"]
+
+        return {
+            "cohort_id": cohort_id,
+            "concepts": [
+                {
+                    "concept": c["concept"],
+                    "sessions": c["sessions"],
+                    "learners": c["learners"],
+                    "mastery_rate": _rate(c["mastered"], c["learners"]),
+                    "struggling_rate": _rate(c["struggling"], c["learners"]),
+                    "confusion_breakdown": breakdown[c["concept"]],
+                    "dominant_confusion": (
+                        max(breakdown[c["concept"]], key=breakdown[c["concept"]].get)
+                        if breakdown[c["concept"]] else None
+                    ),
+                }
+                for c in concept_rows
+            ],
+            "trend": [
+                {"bucket_start": bucket, "confusion_counts": counts}
+                for bucket, counts in trend.items()
+            ],
+        }
+
+
+def learner_contribution(
+    sessions: Iterable[dict],
+    mastered: Iterable[str],
+    struggling: Iterable[str],
+) -> dict:
+    """
+    Everything one learner has added to the rollups, rebuilt from their full
+    session history and current mastered/struggling sets.
+    """
+    concepts: dict[str, dict[str, int]] = {}
+    confusion: dict[tuple[str, str], int] = {}
+    trend: dict[tuple[int, str, str], int] = {}
+
+    def counts(concept: str) -> dict[str, int]:
+        return concepts.setdefault(concept, {"sessions": 0, "learners": 0, "mastered": 0, "struggling": 0})
+
+    for s in sessions:
+        concept, ct = s["concept"], s["confusion_type"]
+        c = counts(concept)
+        c["sessions"] += 1
+        c["learners"] = 1
+        confusion[concept, ct] = confusion.get((concept, ct), 0) + 1
+        # Session timestamps are naive UTC ISO strings
+        timestamp = datetime.fromisoformat(s["timestamp"]).replace(tzinfo=timezone.utc).timestamp()
+        bucket = int(timestamp // ANALYTICS_BUCKET_SECONDS) * ANALYTICS_BUCKET_SECONDS
+        trend[bucket, concept, ct] = trend.get((bucket, concept, ct), 0) + 1
+    for concept in mastered:
+        counts(concept)["mastered"] = 1
+    for concept in struggling:
+        counts(concept)["struggling"] = 1
+    return {"concepts": concepts, "confusion": confusion, "trend": trend}
+
+
+def _bump(conn, table: str, keys: dict, counts: dict[str, int], sign: int) -> None:
+    """Add (sign 1) or subtract (sign -1, never below zero) counts on one rollup row."""
+    sets = ", ".join(f"{col} = MAX(0, {col} + ?)" for col in counts)
+    where = " AND ".join(f"{col} = ?" for col in keys)
+    cur = conn.execute(
+        f"UPDATE {table} SET {sets} WHERE {where}",
+        (*(sign * n for n in counts.values()), *keys.values()),
+    )
+    if sign < 0:
+        # Drop rows emptied by the subtraction, so queries don't list them
+        conn.execute(
+            f"DELETE FROM {table} WHERE {where} AND {' AND '.join(f'{col} = 0' for col in counts)}",
+            tuple(keys.values()),
+        )
+    elif not cur.rowcount:
+        cols = (*keys, *counts)
+        conn.execute(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+            (*keys.values(), *counts.values()),
+        )
+
+
+def _rate(count: int, learners: int) -> float:
+    # Practice can happen without an /explain session, so cap at 1.0
+    return min(1.0, count / learners) if learners else 0.0
+
+
+def _cohorts(cohort_id: Optional[str]) -> tuple[str, ...]:
+    return (ALL_COHORTS, cohort_id) if cohort_id and cohort_id != ALL_COHORTS else (ALL_COHORTS,)
+
+
+_analytics = CohortAnalytics()
+
+
+def get_cohort_analytics() -> CohortAnalytics:
+    return _analytics
@@ -0,0 +1,154 @@
+"""
+Concept Stats — compact, constant-size practice statistics per concept.
+
+Replaces the unbounded `practice_scores` list with:
+- a fixed-size ring buffer + running sum for the rolling window
+- a running EWMA (recency-weighted score)
+- Welford's online mean/variance over all attempts
+Every update is O(1) and the record never grows.
+"""
+
+import math
+import os
+from typing import Optional
+
+
+class MasteryPolicy:
+    """
+    How practice scores turn into mastered / struggling.
+
+    window:             rolling window size (attempts needed before classifying)
+    mastery_threshold:  score at/above which the concept is mastered
+    struggle_threshold: score below which the learner is struggling
+    decay:              EWMA smoothing factor (higher = recent attempts weigh more)
+    signal:             "window" (rolling average) or "ewma" (decayed average)
+    """
+
+    __slots__ = ("window", "mastery_threshold", "struggle_threshold", "decay", "signal")
+
+    def __init__(
+        self,
+        window: int = 3,
+        mastery_threshold: float = 0.8,
+        struggle_threshold: float = 0.5,
+        decay: float = 0.3,
+        signal: str = "window",
+    ):
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        if signal not in ("window", "ewma"):
+            raise ValueError(f"Unknown mastery signal: {signal}")
+        self.window = window
+        self.mastery_threshold = mastery_threshold
+        self.struggle_threshold = struggle_threshold
+        self.decay = decay
+        self.signal = signal
+
+    @classmethod
+    def from_env(cls) -> "MasteryPolicy":
+        return cls(
+            window=int(os.getenv("MASTERY_WINDOW", "3")),
+            mastery_threshold=float(os.getenv("MASTERY_THRESHOLD", "0.8")),
+            struggle_threshold=float(os.getenv("STRUGGLE_THRESHOLD", "0.5")),
+            decay=float(os.getenv("MASTERY_DECAY", "0.3")),
+            signal=os.getenv("MASTERY_SIGNAL", "window"),
+        )
+
+    def classify(self, stats: "ConceptStats") -> Optional[str]:
+        """Return "mastered", "struggling", or None if undecided."""
+        if stats.attempts < self.window:
+            return None
+        score = stats.ewma if self.signal == "ewma" else stats.rolling_average()
+        if score >= self.mastery_threshold:
+            return "mastered"
+        if score < self.struggle_threshold:
+            return "struggling"
+        return None
+
+
+class ConceptStats:
+    """Practice statistics for one (learner, concept) pair."""
+
+    __slots__ = ("_ring", "_head", "_filled", "_window_sum", "attempts", "ewma", "mean", "_m2")
+
+    def __init__(self, window: int):
+        self._ring = [0.0] * window
+        self._head = 0
+        self._filled = 0
+        self._window_sum = 0.0
+        self.attempts = 0
+        self.ewma = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, score: float, decay: float) -> None:
+        """Fold one practice score into every statistic in O(1)."""
+        # Ring buffer + running window sum
+        if self._filled == len(self._ring):
+            self._window_sum -= self._ring[self._head]
+        else:
+            self._filled += 1
+        self._ring[self._head] = score
+        self._window_sum += score
+        self._head = (self._head + 1) % len(self._ring)
+        if self._head == 0:
+            # Resync once per lap so float drift in the running sum stays bounded
+            self._window_sum = sum(self._ring)
+
+        # EWMA — the first score seeds it
+        self.ewma = score if self.attempts == 0 else decay * score + (1 - decay) * self.ewma
+
+        # Welford online mean / variance
+        self.attempts += 1
+        delta = score - self.mean
+        self.mean += delta / self.attempts
+        self._m2 += delta * (score - self.mean)
+
+    def rolling_average(self) -> float:
+        return self._window_sum / self._filled if self._filled else 0.0
+
+    def variance(self) -> float:
+        return self._m2 / (self.attempts - 1) if self.attempts > 1 else 0.0
+
+    def stddev(self) -> float:
+        return math.sqrt(self.variance())
+
+    def recent_scores(self) -> list[float]:
+        """Window contents, oldest first."""
+        if self._filled < len(self._ring):
+            return self._ring[:self._filled]
+        return self._ring[self._head:] + self._ring[:self._head]
+
+    # ── Serialization ──────────────────────────────────────────
+
+    def to_dict(self) -> dict:
+        return {
+            "recent": [round(s, 4) for s in self.recent_scores()],
+            "attempts": self.attempts,
+            "ewma": round(self.ewma, 6),
+            "mean": round(self.mean, 6),
+            "m2": round(self._m2, 6),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, window: int) -> "ConceptStats":
+        """Rehydrate; a changed window size keeps the most recent scores."""
+        stats = cls(window)
+        for score in data.get("recent", [])[-window:]:
+            stats._ring[stats._head] = score
+            stats._window_sum += score
+            stats._filled += 1
+            stats._head = (stats._head + 1) % window
+        stats.attempts = data.get("attempts", 0)
+        stats.ewma = data.get("ewma", 0.0)
+        stats.mean = data.get("mean", 0.0)
+        stats._m2 = data.get("m2", 0.0)
+        return stats
+
+    @classmethod
+    def from_scores(cls, scores: list[float], policy: MasteryPolicy) -> "ConceptStats":
+        """Replay a legacy `practice_scores` list."""
+        stats = cls(policy.window)
+        for score in scores:
+            stats.add(score, policy.decay)
+        return stats
@@ -0,0 +1,83 @@
+"""
+Convert learner files between on-disk formats (see memory/serializers.py).
+
+Each file is read (format auto-detected), rewritten atomically in the target
+format under the learner's lock, and the old file removed. Safe while
+serving; set MEMORY_FORMAT to the target format before or after running.
+
+Run from backend/: python -m memory.convert --to binary [--dry-run]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from memory.file_store import atomic_write, learner_lock
+from memory.layout import LOCK_DIR, MEMORY_DIR
+from memory.serializers import SERIALIZERS, detect_serializer
+
+logger = logging.getLogger(__name__)
+
+
+def convert(target: str, dry_run: bool = False) -> dict:
+    """Rewrite every sharded learner file in the `target` format. Returns counters."""
+    serializer = SERIALIZERS[target]
+    sources = {s.suffix for s in SERIALIZERS.values() if s is not serializer}
+    counts = {"converted": 0, "already": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0}
+
+    for root, dirs, files in os.walk(MEMORY_DIR):
+        # Only descend into shard directories (skip .locks, archives, ...)
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        if Path(root) == MEMORY_DIR:
+            continue
+        for name in files:
+            path = Path(root) / name
+            if path.suffix == serializer.suffix:
+                counts["already"] += 1
+                continue
+            if path.suffix not in sources or name.startswith("."):
+                continue
+
+            target_path = path.with_suffix(serializer.suffix)
+            try:
+                with learner_lock(path.with_suffix(""), LOCK_DIR):
+                    raw = path.read_bytes()
+                    data = detect_serializer(raw).loads(raw)
+                    out = serializer.dumps(data)
+                    counts["bytes_before"] += len(raw)
+                    counts["bytes_after"] += len(out)
+                    if not dry_run:
+                        atomic_write(target_path, out)
+                        path.unlink()
+                counts["converted"] += 1
+            except FileNotFoundError:
+                continue  # converted by a live request meanwhile
+            except Exception as e:
+                counts["failed"] += 1
+                logger.warning(f"Could not convert {path}: {e}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert learner memory files between formats")
+    parser.add_argument("--to", required=True, choices=sorted(SERIALIZERS), help="target format")
+    parser.add_argument("--dry-run", action="store_true", help="measure without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    started = time.perf_counter()
+    counts = convert(args.to, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"{'Would convert' if args.dry_run else 'Converted'} {counts['converted']} file(s) to {args.to} "
+        f"({counts['bytes_before']:,} -> {counts['bytes_after']:,} bytes), "
+        f"{counts['already']} already {args.to}, {counts['failed']} failed, in {elapsed:.2f}s"
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
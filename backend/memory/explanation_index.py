@@ -0,0 +1,304 @@
+"""
+Explanation Index — nearest-neighbour lookup over previously generated
+explanations, so doubts that differ only in wording can reuse (or cheaply
+adapt) an explanation we already paid for.
+
+- Vectors: hashed TF-IDF over the content words of the doubt and code
+  (no model to load, deterministic across workers). Rows store log-TF;
+  IDF is applied at query time from document frequencies kept in memory.
+- Index: brute-force cosine over the rows that share the query's concept and
+  confusion type — a handful to a few thousand rows, one matrix product,
+  run on the CPU pool's thread tier (services.cpu_pool).
+- Persistence: append-only files under EXPLANATION_INDEX_DIR, shared by all
+  workers on the host:
+      vectors.f32  — float32 rows, memory-mapped read-only
+      meta.jsonl   — one line per row (concept, confusion type, response)
+  Only row offsets are kept in RAM; a response is read from disk on a hit.
+
+numpy is optional: without it the index is disabled and every explanation
+goes to the LLM as before. It is imported on first use, not at import time
+(it is the single largest import in the app).
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Optional
+
+np = None  # numpy, once _load_numpy has run
+_numpy_missing = False
+
+from memory.file_store import learner_lock
+from memory.layout import LOCK_DIR, MEMORY_DIR
+from services.cpu_pool import cpu_task, run_cpu
+
+logger = logging.getLogger(__name__)
+
+EXPLANATION_INDEX_ENABLED   = os.getenv("EXPLANATION_INDEX_ENABLED", "true").lower() == "true"
+EXPLANATION_INDEX_DIR       = Path(os.getenv("EXPLANATION_INDEX_DIR", str(MEMORY_DIR / "explanation_index")))
+EXPLANATION_INDEX_DIM       = int(os.getenv("EXPLANATION_INDEX_DIM", "1024"))
+# Return the stored explanation as-is at or above this cosine similarity
+EXPLANATION_REUSE_THRESHOLD = float(os.getenv("EXPLANATION_REUSE_THRESHOLD", "0.92"))
+# Hand the stored explanation to the LLM to adapt at or above this one
+EXPLANATION_ADAPT_THRESHOLD = float(os.getenv("EXPLANATION_ADAPT_THRESHOLD", "0.6"))
+# Newest rows scanned per (concept, confusion type) — bounds query latency
+EXPLANATION_INDEX_MAX_CANDIDATES = int(os.getenv("EXPLANATION_INDEX_MAX_CANDIDATES", "4096"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+# Function words carry no topic signal but dominate short doubts
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by can could did do does for from has have how i if in "
+    "is it its me my not of on once or so still that the then this to was what when where "
+    "which who why will with would you your".split()
+)
+
+
+class Match:
+    __slots__ = ("score", "difficulty_level", "response")
+
+    def __init__(self, score: float, difficulty_level: str, response: dict):
+        self.score = score
+        self.difficulty_level = difficulty_level
+        self.response = response
+
+
+class ExplanationIndex:
+    """Thread-safe; several processes may share the same directory."""
+
+    def __init__(self, directory: Path = EXPLANATION_INDEX_DIR, dim: int = EXPLANATION_INDEX_DIM):
+        if not _load_numpy():
+            raise RuntimeError("The explanation index needs numpy (pip install numpy)")
+        self.dim = dim
+        self._dir = directory
+        self._vectors_path = directory / "vectors.f32"
+        self._meta_path = directory / "meta.jsonl"
+        self._row_bytes = dim * 4
+        self._lock = threading.Lock()
+
+        self._count = 0
+        self._meta_offset = 0
+        self._vectors = None
+        self._df = np.zeros(dim, dtype=np.int64)
+        # (concept, confusion_type) -> row ids; per row: (meta offset, difficulty)
+        self._by_key: dict[tuple[str, str], list[int]] = {}
+        self._rows: list[tuple[int, str]] = []
+
+    # ── Public Methods ─────────────────────────────────────────
+
+    def search(
+        self,
+        concept: str,
+        confusion_type: str,
+        text: str,
+        difficulty_level: str,
+    ) -> Optional[Match]:
+        """
+        Most similar stored explanation for the same concept and confusion
+        type. A same-difficulty row wins if it clears the reuse threshold.
+        """
+        with self._lock:
+            self._refresh()
+            ids = self._by_key.get(_key(concept, confusion_type))
+            if not ids:
+                return None
+            ids = ids[-EXPLANATION_INDEX_MAX_CANDIDATES:]
+            vectors, df, n_docs = self._vectors, self._df.copy(), self._count
+            rows = [self._rows[i] for i in ids]
+
+        scores = self._scores(vectors, df, n_docs, ids, text)
+        if scores is None:
+            return None
+
+        best = int(np.argmax(scores))
+        same_level = [i for i, (_, level) in enumerate(rows) if level == difficulty_level]
+        if same_level:
+            best_same = same_level[int(np.argmax(scores[same_level]))]
+            if scores[best_same] >= EXPLANATION_REUSE_THRESHOLD:
+                best = best_same
+
+        offset, level = rows[best]
+        return Match(float(scores[best]), level, self._read_response(offset))
+
+    def nearest(
+        self,
+        concept: str,
+        text: str,
+        min_score_elsewhere: float = EXPLANATION_ADAPT_THRESHOLD,
+    ) -> Optional[Match]:
+        """
+        Fallback lookup for when the LLM is unavailable: the most similar
+        stored explanation of this concept under any confusion type, else of
+        any concept, as long as it scores >= min_score_elsewhere.
+        """
+        concept_key = concept.strip().lower()
+        with self._lock:
+            self._refresh()
+            same = sorted(i for (c, _), ids in self._by_key.items() if c == concept_key for i in ids)
+            same = same[-EXPLANATION_INDEX_MAX_CANDIDATES:]
+            anywhere = list(range(max(0, self._count - EXPLANATION_INDEX_MAX_CANDIDATES), self._count))
+            vectors, df, n_docs = self._vectors, self._df.copy(), self._count
+            rows = list(self._rows)
+
+        for ids, min_score in ((same, -1.0), (anywhere, min_score_elsewhere)):
+            if not ids:
+                continue
+            scores = self._scores(vectors, df, n_docs, ids, text)
+            if scores is None:
+                return None
+            best = int(np.argmax(scores))
+            if scores[best] >= min_score:
+                offset, level = rows[ids[best]]
+                return Match(float(scores[best]), level, self._read_response(offset))
+        return None
+
+    def add(
+        self,
+        concept: str,
+        confusion_type: str,
+        text: str,
+        difficulty_level: str,
+        response: dict,
+    ) -> None:
+        vector = _hashed_tf(text, self.dim)
+        line = json.dumps({
+            "concept": concept,
+            "confusion_type": confusion_type,
+            "difficulty_level": difficulty_level,
+            "response": response,
+        }, separators=(",", ":")).encode("utf-8") + b"\n"
+
+        with self._lock, learner_lock(self._dir / "index", LOCK_DIR):
+            self._dir.mkdir(parents=True, exist_ok=True)
+            self._refresh()
+            # Drop a half-appended row left by a crashed writer so rows and meta lines stay aligned
+            for path, size in ((self._vectors_path, self._count * self._row_bytes),
+                               (self._meta_path, self._meta_offset)):
+                if path.exists() and path.stat().st_size != size:
+                    os.truncate(path, size)
+            # Vector first: a meta line only ever refers to a complete row
+            with open(self._vectors_path, "ab") as f:
+                f.write(vector.tobytes())
+            with open(self._meta_path, "ab") as f:
+                f.write(line)
+            self._refresh()
+
+    # ── Internals ──────────────────────────────────────────────
+
+    def _refresh(self) -> None:
+        """Pick up rows appended since the last look, by this or another worker."""
+        try:
+            rows_on_disk = self._vectors_path.stat().st_size // self._row_bytes
+        except FileNotFoundError:
+            return
+        if rows_on_disk <= self._count:
+            return
+
+        new_lines = []
+        try:
+            with open(self._meta_path, "rb") as f:
+                f.seek(self._meta_offset)
+                for raw in f:
+                    if not raw.endswith(b"\n") or self._count + len(new_lines) >= rows_on_disk:
+                        break
+                    new_lines.append(raw)
+        except FileNotFoundError:
+            pass  # first writer crashed between its two appends
+        if not new_lines:
+            return
+
+        total = self._count + len(new_lines)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(total, self.dim))
+        self._df += np.count_nonzero(self._vectors[self._count:total], axis=0)
+        for raw in new_lines:
+            meta = json.loads(raw)
+            self._by_key.setdefault(_key(meta["concept"], meta["confusion_type"]), []).append(len(self._rows))
+            self._rows.append((self._meta_offset, meta["difficulty_level"]))
+            self._meta_offset += len(raw)
+        self._count = total
+
+    def _scores(self, vectors, df, n_docs: int, ids: list[int], text: str):
+        """Cosine similarity of `text` to each row in ids (TF-IDF), or None for an empty query."""
+        return run_cpu(_cosine_scores, vectors, df, n_docs, ids, _hashed_tf(text, self.dim))
+
+    def _read_response(self, offset: int) -> dict:
+        with open(self._meta_path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())["response"]
+
+
+# ── Helpers ────────────────────────────────────────────────────
+
+def index_text(user_doubt: str, code_snippet: Optional[str]) -> str:
+    """What gets embedded: the doubt plus any code it is about."""
+    return f"{user_doubt}\n{code_snippet}" if code_snippet else user_doubt
+
+
+def _key(concept: str, confusion_type: str) -> tuple[str, str]:
+    return concept.strip().lower(), confusion_type
+
+
+def _hashed_tf(text: str, dim: int):
+    """Signed feature hashing of content words, sublinear (1 + log tf) weights."""
+    counts: dict[int, int] = {}
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]  # cheap plural folding: loops ~ loop
+        h = zlib.crc32(token.encode("utf-8"))
+        idx = h % dim
+        counts[idx] = counts.get(idx, 0) + (1 if h & 0x80000000 else -1)
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for idx, tf in counts.items():
+        if tf:
+            vector[idx] = math.copysign(1.0 + math.log(abs(tf)), tf)
+    return vector
+
+
+@cpu_task(tier="thread")
+def _cosine_scores(vectors, df, n_docs: int, ids: list[int], query_tf):
+    # NumPy releases the GIL here: a thread, not a process, so the rows aren't copied
+    idf = (np.log((1 + n_docs) / (1 + df)) + 1.0).astype(np.float32)
+    query = query_tf * idf
+    query_norm = float(np.linalg.norm(query))
+    if query_norm == 0.0:
+        return None
+    weighted = np.asarray(vectors[ids]) * idf
+    norms = np.linalg.norm(weighted, axis=1) * query_norm
+    return (weighted @ query) / np.maximum(norms, 1e-12)
+
+
+def _load_numpy() -> bool:
+    global np, _numpy_missing
+    if np is None and not _numpy_missing:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:  # optional dependency — see requirements.txt
+            _numpy_missing = True
+            logger.info("numpy not installed — explanation index disabled")
+    return np is not None
+
+
+# ── Singleton ──────────────────────────────────────────────────
+
+_index: Optional[ExplanationIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_explanation_index() -> Optional[ExplanationIndex]:
+    """The shared index, or None when disabled or numpy is not installed."""
+    global _index
+    if not EXPLANATION_INDEX_ENABLED or not _load_numpy():
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ExplanationIndex()
+    return _index
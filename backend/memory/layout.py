@@ -0,0 +1,58 @@
+"""
+Memory Layout — where learner files live on disk.
+
+Learners are spread over a two-level hashed fan-out (256 x 256 directories)
+so no single directory grows past a few dozen entries even at millions of
+learners:
+
+    {MEMORY_DIR}/3f/a2/{encoded learner_id}.json
+
+Learner IDs are percent-encoded before becoming filenames, so IDs with
+slashes, dots or other unsafe characters cannot escape MEMORY_DIR.
+Nothing is created at import time; directories are made on first write.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from urllib.parse import quote
+
+MEMORY_DIR = Path(os.getenv("MEMORY_DIR", "/tmp/learner_memory"))
+LOCK_DIR = MEMORY_DIR / ".locks"
+
+# Longest encoded ID kept verbatim in a filename; longer ones get a hash suffix
+_MAX_NAME_LEN = 120
+
+_created_dirs: set[Path] = set()
+
+
+def shard_key(learner_id: str) -> str:
+    return hashlib.sha1(learner_id.encode("utf-8")).hexdigest()
+
+
+def encode_learner_id(learner_id: str) -> str:
+    """Filesystem-safe, reversible (for normal lengths) filename stem."""
+    encoded = quote(learner_id, safe="-_")
+    if len(encoded) > _MAX_NAME_LEN:
+        encoded = f"{encoded[:_MAX_NAME_LEN - 17]}~{shard_key(learner_id)[:16]}"
+    return encoded
+
+
+def learner_path(learner_id: str, suffix: str = ".json") -> Path:
+    key = shard_key(learner_id)
+    return MEMORY_DIR / key[:2] / key[2:4] / f"{encode_learner_id(learner_id)}{suffix}"
+
+
+def legacy_learner_path(learner_id: str) -> Path | None:
+    """Pre-sharding flat location ({MEMORY_DIR}/{learner_id}.json), if the ID could have used it."""
+    if not learner_id or "/" in learner_id or "\\" in learner_id or learner_id in (".", ".."):
+        return None
+    return MEMORY_DIR / f"{learner_id}.json"
+
+
+def ensure_parent(path: Path) -> None:
+    """mkdir -p the file's directory, once per process."""
+    parent = path.parent
+    if parent not in _created_dirs:
+        parent.mkdir(parents=True, exist_ok=True)
+        _created_dirs.add(parent)
@@ -2,21 +2,57 @@
 Learner Memory — persists learner context, confusion history, and progress.
 Uses a simple JSON file store by default.
 Can be swapped for DynamoDB, Redis, or a vector DB in production.
+
+Writes are atomic (temp file + rename) and every read-modify-write runs
+under a cross-process learner lock with a version check, so concurrent
+uvicorn workers never lose each other's updates.
+
+Only a recent window of sessions is kept in the learner file; older ones
+are rolled up and archived (see memory/retention.py).
 """
 
-import json
 import logging
 import os
+import sqlite3
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, NamedTuple, Optional, TypeVar
 
 from models.confusion_types import ConfusionType
+from memory.concept_stats import ConceptStats, MasteryPolicy
+from memory.review_scheduler import get_review_scheduler
+from memory.cohort_analytics import get_cohort_analytics, learner_contribution
+from memory.file_store import atomic_write, change_token, learner_lock
+from memory.layout import LOCK_DIR, ensure_parent, learner_path, legacy_learner_path
+from memory.retention import archive_overflow, delete_segments, iter_archived_sessions, needs_archival
+from memory.serializers import SERIALIZERS, detect_serializer, get_serializer
+from services.tracing import span
 
 logger = logging.getLogger(__name__)
 
-_MEMORY_DIR = Path(os.getenv("MEMORY_DIR", "/tmp/learner_memory"))
-_MEMORY_DIR.mkdir(parents=True, exist_ok=True)
+# How many mastered/struggling concepts to name in the prompt summary
+_PROFILE_CONCEPT_LIMIT = 5
+
+# Follow-ups: a new doubt on a concept explained this recently gets a delta answer
+MEMORY_FOLLOW_UP_WINDOW_SECONDS = int(os.getenv("MEMORY_FOLLOW_UP_WINDOW_SECONDS", "1800"))
+# Full explanations kept for follow-ups (most recently explained concepts)
+MEMORY_LAST_EXPLANATIONS = int(os.getenv("MEMORY_LAST_EXPLANATIONS", "20"))
+_LAST_EXPLANATION_CHARS = 4000
+
+_mastery_policy = MasteryPolicy.from_env()
+_serializer = get_serializer()
+
+T = TypeVar("T")
+
+
+class Interaction(NamedTuple):
+    concept: str
+    confusion_type: ConfusionType
+    strategy_used: str
+    explanation: str
+    # True when `explanation` only refines the previous one (delta answer)
+    follow_up: bool = False
 
 
 class LearnerMemory:
@@ -25,23 +61,115 @@ class LearnerMemory:
     - Topics studied
     - Confusion types encountered
     - Concepts mastered vs struggling
-    - Session history
+    - Session history (recent window; older sessions rolled up and archived)
+
+    Per-concept practice stats are fixed-size ConceptStats records and
+    mastered/struggling are kept as insertion-ordered sets, so a practice
+    update is O(1) and per-concept memory is bounded.
     """
 
-    def __init__(self, learner_id: str):
+    def __init__(
+        self,
+        learner_id: str,
+        policy: Optional[MasteryPolicy] = None,
+        cohort_id: Optional[str] = None,
+    ):
         self.learner_id = learner_id
-        self._path = _MEMORY_DIR / f"{learner_id}.json"
-        self._data = self._load()
+        self.policy = policy or _mastery_policy
+        self._serializer = _serializer
+        self._path = learner_path(learner_id, self._serializer.suffix)
+        # One lock (and one set of archive segments) per learner whatever the file format
+        self._base_path = learner_path(learner_id, "")
+        self._legacy_path: Optional[Path] = None
+        self._cohort_override = cohort_id
+        self._reload()
+
+    @property
+    def cohort_id(self) -> Optional[str]:
+        return self._data.get("cohort_id")
 
     # ── Core CRUD ──────────────────────────────────────────────
 
     def _load(self) -> dict:
-        if self._path.exists():
+        with span("memory.load", learner_id=self.learner_id):
+            return self._load_data()
+
+    def _load_data(self) -> dict:
+        # Token first: if a write lands between stat and read we merely
+        # see a stale token and reload once more at commit time.
+        self._token = change_token(self._path)
+        self._legacy_path = None
+        if self._token is not None:
+            try:
+                return self._parse(self._path.read_bytes())
+            except FileNotFoundError:
+                self._token = None
+            except Exception as e:
+                self._quarantine(e)
+                return self._empty()
+
+        # Online migration: fall back to a file in the other format, then to
+        # the pre-sharding flat file; the next save writes the current
+        # format/location and removes the old one.
+        for legacy in self._fallback_paths():
+            try:
+                data = self._parse(legacy.read_bytes())
+                self._legacy_path = legacy
+                return data
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable legacy memory file {legacy.name}: {e}")
+        return self._empty()
+
+    def _fallback_paths(self) -> list[Path]:
+        paths = [
+            learner_path(self.learner_id, s.suffix)
+            for s in SERIALIZERS.values()
+            if s is not self._serializer
+        ]
+        flat = legacy_learner_path(self.learner_id)
+        if flat is not None:
+            paths.append(flat)
+        return paths
+
+    def _parse(self, raw: bytes) -> dict:
+        data = detect_serializer(raw).loads(raw)
+        _migrate_legacy(data, self.policy)
+        data.setdefault("version", 0)
+        return data
+
+    def _quarantine(self, error: Exception) -> None:
+        """
+        Move an unreadable file aside instead of silently overwriting it.
+        Atomic writes make this a should-never-happen path (disk/FS damage).
+        """
+        with learner_lock(self._base_path, LOCK_DIR):
             try:
-                return json.loads(self._path.read_text())
+                self._parse(self._path.read_bytes())
+                return  # rewritten by someone else meanwhile — it's fine now
+            except FileNotFoundError:
+                return
             except Exception:
-                logger.warning(f"Corrupt memory file for {self.learner_id}, resetting")
-        return {
+                pass
+            target = self._path.with_name(f"{self._path.name}.corrupt-{int(time.time())}")
+            os.replace(self._path, target)
+        self._token = None
+        logger.error(
+            f"Corrupt memory file for {self.learner_id} ({error}); moved to {target.name}, starting fresh"
+        )
+
+    def _reload(self) -> None:
+        self._data = self._load()
+        # The cohort the rollups currently count this learner under
+        self._stored_cohort = self._data.get("cohort_id")
+        if self._cohort_override:
+            # Latest cohort wins; persisted with the next write
+            self._data["cohort_id"] = self._cohort_override
+        self._hydrate()
+
+    def _empty(self) -> dict:
+        data = {
             "learner_id": self.learner_id,
             "created_at": datetime.utcnow().isoformat(),
             "sessions": [],
@@ -49,10 +177,85 @@ class LearnerMemory:
             "confusion_counts": {},
             "mastered_concepts": [],
             "struggling_concepts": [],
+            "version": 0,
         }
+        data["profile"] = _build_profile(data)
+        return data
+
+    def _hydrate(self) -> None:
+        """Build the in-memory working structures from the persisted dict."""
+        # dicts used as insertion-ordered sets: O(1) membership and removal
+        self._mastered: dict[str, None] = dict.fromkeys(self._data["mastered_concepts"])
+        self._struggling: dict[str, None] = dict.fromkeys(self._data["struggling_concepts"])
+        self._stats: dict[str, ConceptStats] = {}
+        self._dirty_stats: set[str] = set()
+
+    def _flush_state(self) -> None:
+        """Write working structures back into the persisted dict."""
+        self._data["mastered_concepts"] = list(self._mastered)
+        self._data["struggling_concepts"] = list(self._struggling)
+        for concept in self._dirty_stats:
+            self._data["concepts_seen"][concept]["stats"] = self._stats[concept].to_dict()
+        self._dirty_stats.clear()
 
     def _save(self) -> None:
-        self._path.write_text(json.dumps(self._data, indent=2))
+        self._flush_state()
+        ensure_parent(self._path)
+        with span("memory.save", learner_id=self.learner_id) as s:
+            payload = self._serializer.dumps(self._data)
+            s.set(bytes=len(payload), version=self._data["version"])
+            atomic_write(self._path, payload)
+        self._token = change_token(self._path)
+        if self._legacy_path is not None:
+            self._legacy_path.unlink(missing_ok=True)
+            self._legacy_path = None
+
+    def _commit(self, mutate: Callable[[], T]) -> T:
+        """
+        Apply `mutate` to the learner's data and persist it without losing
+        concurrent updates from other workers.
+
+        The learner lock is held from the change check to the write: if the
+        file changed since we loaded it, reload and run the mutation on the
+        fresh data.
+        """
+        with learner_lock(self._base_path, LOCK_DIR):
+            if change_token(self._path) != self._token:
+                self._reload()
+            # A cohort change is persisted by this write: take the
+            # learner's rollups along, as they were before `mutate`
+            moved = None
+            if self._stored_cohort != self.cohort_id:
+                moved = (self._stored_cohort, self.cohort_id, self._cohort_contribution())
+            result = mutate()
+            self._data["version"] += 1
+            self._save()
+            self._stored_cohort = self.cohort_id
+        if moved is not None:
+            try:
+                get_cohort_analytics().move_learner(*moved)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not move cohort rollups for {self.learner_id}: {e}")
+        return result
+
+    def _concept_entry(self, concept: str) -> dict:
+        entry = self._data["concepts_seen"].get(concept)
+        if entry is None:
+            entry = {"count": 0, "confusion_counts": {}}
+            self._data["concepts_seen"][concept] = entry
+        return entry
+
+    def _concept_stats(self, concept: str) -> ConceptStats:
+        stats = self._stats.get(concept)
+        if stats is None:
+            persisted = self._concept_entry(concept).get("stats")
+            stats = (
+                ConceptStats.from_dict(persisted, self.policy.window)
+                if persisted
+                else ConceptStats(self.policy.window)
+            )
+            self._stats[concept] = stats
+        return stats
 
     # ── Public Methods ─────────────────────────────────────────
 
@@ -62,29 +265,78 @@ class LearnerMemory:
         confusion_type: ConfusionType,
         strategy_used: str,
         explanation: str,
+        follow_up: bool = False,
     ) -> None:
         """Log a learning interaction."""
-        session = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "concept": concept,
-            "confusion_type": confusion_type.value,
-            "strategy_used": strategy_used,
-            "explanation_preview": explanation[:200],
-        }
-        self._data["sessions"].append(session)
+        self.record_sessions([Interaction(concept, confusion_type, strategy_used, explanation, follow_up)])
 
-        # Update concept tracking
-        if concept not in self._data["concepts_seen"]:
-            self._data["concepts_seen"][concept] = {"count": 0, "confusion_types": []}
-        self._data["concepts_seen"][concept]["count"] += 1
-        self._data["concepts_seen"][concept]["confusion_types"].append(confusion_type.value)
+    def record_sessions(self, interactions: list[Interaction]) -> None:
+        """
+        Log several interactions (Interaction or plain (concept,
+        confusion_type, strategy_used, explanation) tuples) in a single
+        commit: one lock, one file write.
+        """
+        if not interactions:
+            return
+        now = datetime.utcnow().isoformat()
+        interactions = [Interaction(*i) for i in interactions]
+        sessions = [
+            {
+                "timestamp": now,
+                "concept": i.concept,
+                "confusion_type": i.confusion_type.value,
+                "strategy_used": i.strategy_used,
+                "explanation_preview": i.explanation[:200],
+            }
+            for i in interactions
+        ]
+
+        def apply() -> list[bool]:
+            first_times = []
+            counts = self._data["confusion_counts"]
+            profile = self._data["profile"]
+            for session, interaction in zip(sessions, interactions):
+                concept, ct = session["concept"], session["confusion_type"]
+                self._data["sessions"].append(session)
+                self._remember_explanation(interaction, session["timestamp"])
+
+                # Update concept tracking
+                entry = self._concept_entry(concept)
+                entry["count"] += 1
+                entry["confusion_counts"][ct] = entry["confusion_counts"].get(ct, 0) + 1
+                first_times.append(entry["count"] == 1)
+
+                # Update confusion frequency
+                counts[ct] = counts.get(ct, 0) + 1
+
+                # Update the precomputed profile in place — no rescans of sessions
+                profile["total_sessions"] += 1
+                profile["recent_concept"] = concept
+                top = profile["most_common_confusion"]
+                if top is None or counts[ct] > counts.get(top, 0):
+                    profile["most_common_confusion"] = ct
 
-        # Update confusion frequency
-        ct = confusion_type.value
-        self._data["confusion_counts"][ct] = self._data["confusion_counts"].get(ct, 0) + 1
+            if needs_archival(self._data):
+                ensure_parent(self._path)
+                archive_overflow(self._data, self._base_path)
+            profile["summary"] = self._summarize()
+            return first_times
 
-        self._save()
-        logger.debug(f"Session recorded for learner {self.learner_id}: {concept}")
+        first_times = self._commit(apply)
+        logger.debug(
+            f"{len(sessions)} session(s) recorded for learner {self.learner_id}: "
+            f"{', '.join(s['concept'] for s in sessions)}"
+        )
+
+        try:
+            analytics = get_cohort_analytics()
+            for session, first_time in zip(sessions, first_times):
+                analytics.record_session(
+                    self.cohort_id, session["concept"], session["confusion_type"],
+                    first_time_for_learner=first_time,
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update cohort rollups for {self.learner_id}: {e}")
 
     def record_practice_result(
         self,
@@ -93,73 +345,223 @@ class LearnerMemory:
         score: float,
     ) -> None:
         """Track how the learner performed on practice questions."""
-        concept_data = self._data["concepts_seen"].get(concept, {})
-        if "practice_scores" not in concept_data:
-            concept_data["practice_scores"] = []
-        concept_data["practice_scores"].append(score)
-
-        # Auto-classify as mastered or struggling
-        scores = concept_data.get("practice_scores", [])
-        if len(scores) >= 3:
-            avg = sum(scores[-3:]) / 3  # rolling average of last 3
-            if avg >= 0.8 and concept not in self._data["mastered_concepts"]:
-                self._data["mastered_concepts"].append(concept)
-                if concept in self._data["struggling_concepts"]:
-                    self._data["struggling_concepts"].remove(concept)
-                logger.info(f"Learner {self.learner_id} mastered: {concept}")
-            elif avg < 0.5 and concept not in self._data["struggling_concepts"]:
-                self._data["struggling_concepts"].append(concept)
-
-        self._data["concepts_seen"][concept] = concept_data
-        self._save()
+
+        def apply() -> tuple[int, int]:
+            stats = self._concept_stats(concept)
+            stats.add(score, self.policy.decay)
+            self._dirty_stats.add(concept)
+
+            # Auto-classify as mastered or struggling
+            verdict = self.policy.classify(stats)
+            mastered_delta = struggling_delta = 0
+            if verdict == "mastered" and concept not in self._mastered:
+                self._mastered[concept] = None
+                mastered_delta = 1
+                if self._struggling.pop(concept, False) is None:
+                    struggling_delta = -1
+            elif verdict == "struggling" and concept not in self._struggling:
+                self._struggling[concept] = None
+                struggling_delta = 1
+
+            self._data["profile"]["summary"] = self._summarize()
+            return mastered_delta, struggling_delta
+
+        mastered_delta, struggling_delta = self._commit(apply)
+        if mastered_delta > 0:
+            logger.info(f"Learner {self.learner_id} mastered: {concept}")
+
+        # Reschedule the review and update rollups — never fail the feedback for them
+        try:
+            get_review_scheduler().record_review(self.learner_id, concept, score)
+            get_cohort_analytics().record_mastery_change(
+                self.cohort_id, concept, mastered_delta, struggling_delta,
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update review/rollups for {self.learner_id}/{concept}: {e}")
 
     def get_learner_context(self) -> dict:
         """Return a summary of the learner's history (for adaptive prompting)."""
+        profile = self._data["profile"]
         return {
-            "total_sessions": len(self._data["sessions"]),
+            "total_sessions": profile["total_sessions"],
             "concepts_seen": list(self._data["concepts_seen"].keys()),
-            "mastered": self._data["mastered_concepts"],
-            "struggling": self._data["struggling_concepts"],
-            "most_common_confusion": self._get_most_common_confusion(),
-            "recent_concept": self._get_recent_concept(),
+            "mastered": list(self._mastered),
+            "struggling": list(self._struggling),
+            "most_common_confusion": profile["most_common_confusion"],
+            "recent_concept": profile["recent_concept"],
+        }
+
+    def get_prompt_context(self) -> str:
+        """
+        Compact one-line learner summary for diagnosis/explanation prompts.
+        Precomputed on every write, so reading it costs nothing extra.
+        Empty string for learners with no history.
+        """
+        return self._data["profile"]["summary"]
+
+    def get_concept_stats(self, concept: str) -> Optional[dict]:
+        """Practice statistics for one concept, or None if never practiced."""
+        if concept not in self._data["concepts_seen"]:
+            return None
+        stats = self._concept_stats(concept)
+        if not stats.attempts:
+            return None
+        return {
+            "attempts": stats.attempts,
+            "rolling_average": stats.rolling_average(),
+            "ewma": stats.ewma,
+            "mean": stats.mean,
+            "stddev": stats.stddev(),
+            "recent_scores": stats.recent_scores(),
         }
 
+    def get_follow_up_context(self, concept: str) -> Optional[dict]:
+        """
+        The last full explanation of `concept` if it was given within
+        MEMORY_FOLLOW_UP_WINDOW_SECONDS (the learner is mid-conversation),
+        else None. Keys: explanation, strategy_used, confusion_type, timestamp.
+        """
+        last = self._data.get("last_explanations", {}).get(_concept_key(concept))
+        if last is None:
+            return None
+        age = (datetime.utcnow() - datetime.fromisoformat(last["timestamp"])).total_seconds()
+        return last if age <= MEMORY_FOLLOW_UP_WINDOW_SECONDS else None
+
     def get_recent_sessions(self, n: int = 3) -> list:
-        """Get the n most recent sessions."""
+        """Get the n most recent sessions (always within the hot window)."""
         return self._data["sessions"][-n:]
 
+    def get_full_history(self) -> Iterator[dict]:
+        """
+        Every session ever recorded, oldest first. Archived segments are
+        only read here, one at a time, as the iterator is consumed.
+        """
+        yield from iter_archived_sessions(self._data, self._base_path)
+        yield from list(self._data["sessions"])
+
+    @property
+    def archived_session_count(self) -> int:
+        return self._data.get("archive", {}).get("archived_sessions", 0)
+
+    def get_rollups(self) -> dict:
+        """Per-concept, per-ISO-week aggregates of archived sessions."""
+        return self._data.get("rollups", {})
+
     def clear(self) -> None:
         """Reset learner memory."""
-        self._data = {
-            "learner_id": self.learner_id,
-            "created_at": datetime.utcnow().isoformat(),
-            "sessions": [],
-            "concepts_seen": {},
-            "confusion_counts": {},
-            "mastered_concepts": [],
-            "struggling_concepts": [],
-        }
-        self._save()
 
-    # ── Private Helpers ────────────────────────────────────────
+        def apply() -> dict:
+            contribution = self._cohort_contribution()
+            version, cohort_id = self._data["version"], self.cohort_id
+            delete_segments(self._data, self._base_path)
+            self._data = self._empty()
+            self._data["version"] = version
+            if cohort_id:
+                # Cohort membership is not learning history; keep it
+                self._data["cohort_id"] = cohort_id
+            self._hydrate()
+            return contribution
 
-    def _get_most_common_confusion(self) -> Optional[str]:
-        counts = self._data["confusion_counts"]
-        if not counts:
-            return None
-        return max(counts, key=counts.get)
+        contribution = self._commit(apply)
+        try:
+            get_review_scheduler().forget_learner(self.learner_id)
+            get_cohort_analytics().remove_learner(self.cohort_id, contribution)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not clear reviews/rollups for {self.learner_id}: {e}")
 
-    def _get_recent_concept(self) -> Optional[str]:
-        sessions = self._data["sessions"]
-        if not sessions:
-            return None
-        return sessions[-1].get("concept")
+    def _cohort_contribution(self) -> dict:
+        """What this learner's history currently adds to the cohort rollups."""
+        return learner_contribution(self.get_full_history(), self._mastered, self._struggling)
+
+    def _remember_explanation(self, interaction: Interaction, timestamp: str) -> None:
+        """Keep the latest full explanation per concept, for the most recent concepts only."""
+        last = self._data.setdefault("last_explanations", {})
+        key = _concept_key(interaction.concept)
+        entry = last.pop(key, None)
+        if interaction.follow_up and entry is not None:
+            # A refinement keeps the conversation open but doesn't replace the explanation
+            entry["timestamp"] = timestamp
+        else:
+            entry = {
+                "timestamp": timestamp,
+                "strategy_used": interaction.strategy_used,
+                "confusion_type": interaction.confusion_type.value,
+                "explanation": interaction.explanation[:_LAST_EXPLANATION_CHARS],
+            }
+        last[key] = entry  # re-inserted: dict order doubles as recency order
+        while len(last) > MEMORY_LAST_EXPLANATIONS:
+            del last[next(iter(last))]
+
+    def _summarize(self) -> str:
+        return _summarize_profile(self._data["profile"], list(self._mastered), list(self._struggling))
+
+
+# ── Profile Helpers ───────────────────────────────────────────
+
+def _build_profile(data: dict) -> dict:
+    """Full profile rebuild — only used for new learners and legacy files."""
+    counts = data["confusion_counts"]
+    sessions = data["sessions"]
+    profile = {
+        "total_sessions": len(sessions),
+        "recent_concept": sessions[-1].get("concept") if sessions else None,
+        "most_common_confusion": max(counts, key=counts.get) if counts else None,
+    }
+    profile["summary"] = _summarize_profile(
+        profile, data["mastered_concepts"], data["struggling_concepts"]
+    )
+    return profile
+
+
+def _summarize_profile(profile: dict, mastered: list, struggling: list) -> str:
+    """Render the profile as a short sentence for prompts."""
+    # Coarse on purpose: the summary is part of the diagnosis/explanation
+    # cache keys, so it must not change on every session (hence no "last
+    # studied" concept — it changes whenever the learner switches topic)
+    if not profile["total_sessions"]:
+        return ""
+    parts = ["returning learner"]
+    mastered = mastered[-_PROFILE_CONCEPT_LIMIT:]
+    struggling = struggling[-_PROFILE_CONCEPT_LIMIT:]
+    if mastered:
+        parts.append(f"has mastered: {', '.join(mastered)}")
+    if struggling:
+        parts.append(f"is struggling with: {', '.join(struggling)}")
+    if profile["most_common_confusion"]:
+        parts.append(f"most common confusion type: {profile['most_common_confusion']}")
+    return "; ".join(parts)
+
+
+def _concept_key(concept: str) -> str:
+    return concept.strip().lower()
+
+
+def _migrate_legacy(data: dict, policy: MasteryPolicy) -> None:
+    """
+    Upgrade files written by older versions in place:
+    - `confusion_types` lists become `confusion_counts` maps
+    - `practice_scores` lists are replayed into a bounded stats record
+    - a missing profile is built once
+    """
+    for entry in data["concepts_seen"].values():
+        entry.setdefault("count", 0)
+        if "confusion_types" in entry:
+            counts: dict[str, int] = {}
+            for ct in entry.pop("confusion_types"):
+                counts[ct] = counts.get(ct, 0) + 1
+            entry["confusion_counts"] = counts
+        entry.setdefault("confusion_counts", {})
+        if "practice_scores" in entry:
+            entry["stats"] = ConceptStats.from_scores(entry.pop("practice_scores"), policy).to_dict()
+
+    if "profile" not in data:
+        data["profile"] = _build_profile(data)
 
 
 # ── Module-level convenience functions ────────────────────────
 
-def get_memory(learner_id: str) -> Optional[LearnerMemory]:
+def get_memory(learner_id: str, cohort_id: Optional[str] = None) -> Optional[LearnerMemory]:
     """Get learner memory if learner_id provided, else None."""
     if not learner_id:
         return None
-    return LearnerMemory(learner_id)
\ No newline at end of file
+    return LearnerMemory(learner_id, cohort_id=cohort_id)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Online migration from the flat layout ({MEMORY_DIR}/{learner_id}.json)
+to the sharded layout (see memory/layout.py).
+
+Safe to run while the API is serving traffic: each file is moved with an
+atomic rename under the learner's lock, and LearnerMemory falls back to the
+flat file for anything not yet migrated.
+
+Run from backend/: python -m memory.migrate_layout [--dry-run] [--limit N]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+from memory.file_store import learner_lock
+from memory.layout import LOCK_DIR, MEMORY_DIR, ensure_parent, learner_path
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(dry_run: bool = False, limit: int | None = None) -> dict:
+    """Move every flat learner file into its shard. Returns counters."""
+    counts = {"moved": 0, "stale_removed": 0, "skipped": 0}
+    if not MEMORY_DIR.exists():
+        return counts
+
+    # os.scandir streams entries — no giant list of a huge flat directory
+    with os.scandir(MEMORY_DIR) as entries:
+        for entry in entries:
+            if limit is not None and counts["moved"] + counts["stale_removed"] >= limit:
+                break
+            if not entry.is_file() or not entry.name.endswith(".json") or entry.name.startswith("."):
+                continue
+
+            learner_id = entry.name[: -len(".json")]
+            legacy = MEMORY_DIR / entry.name
+            target = learner_path(learner_id)
+            if dry_run:
+                counts["moved"] += 1
+                continue
+
+            with learner_lock(learner_path(learner_id, ""), LOCK_DIR):
+                if not legacy.exists():
+                    counts["skipped"] += 1  # a live request migrated it first
+                elif target.exists():
+                    # The sharded copy was written from this file and is newer
+                    legacy.unlink()
+                    counts["stale_removed"] += 1
+                else:
+                    ensure_parent(target)
+                    os.replace(legacy, target)
+                    counts["moved"] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate learner memory to the sharded layout")
+    parser.add_argument("--dry-run", action="store_true", help="count files without moving them")
+    parser.add_argument("--limit", type=int, default=None, help="stop after N files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    started = time.perf_counter()
+    counts = migrate(dry_run=args.dry_run, limit=args.limit)
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"{'Would move' if args.dry_run else 'Moved'} {counts['moved']} file(s), "
+        f"removed {counts['stale_removed']} stale, skipped {counts['skipped']} "
+        f"in {elapsed:.2f}s ({MEMORY_DIR})"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
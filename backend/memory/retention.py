@@ -0,0 +1,99 @@
+"""
+Retention — keeps a learner record bounded however long they use the tutor.
+
+- Hot window: only the most recent MEMORY_HOT_SESSIONS sessions stay in the
+  learner file (that's all get_recent_sessions ever needs).
+- Rollups: sessions leaving the window are folded into per-concept,
+  per-ISO-week aggregates stored in the record ("rollups").
+- Archive: the raw sessions themselves go to immutable gzip'd JSONL segment
+  files next to the learner file, read only for a full-history export.
+
+Archival runs in batches (MEMORY_ARCHIVE_BATCH) so a segment is written once
+per batch, not on every session.
+"""
+
+import gzip
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from memory.file_store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MEMORY_HOT_SESSIONS  = int(os.getenv("MEMORY_HOT_SESSIONS", "50"))
+MEMORY_ARCHIVE_BATCH = int(os.getenv("MEMORY_ARCHIVE_BATCH", "50"))
+
+
+def needs_archival(data: dict) -> bool:
+    return len(data["sessions"]) > MEMORY_HOT_SESSIONS + MEMORY_ARCHIVE_BATCH
+
+
+def archive_overflow(data: dict, base_path: Path) -> int:
+    """
+    Move everything older than the hot window into a new segment and the
+    rollups. Returns the number of sessions archived.
+    """
+    sessions = data["sessions"]
+    keep = max(MEMORY_HOT_SESSIONS, 0)
+    overflow = sessions[:len(sessions) - keep]
+    if not overflow:
+        return 0
+
+    archive = data.setdefault("archive", {"segments": 0, "archived_sessions": 0})
+    segment_no = archive["segments"] + 1
+    payload = "".join(json.dumps(s, separators=(",", ":")) + "\n" for s in overflow)
+    # Segment first: a crash before the learner file is saved just means the
+    # same segment number is rewritten next time — sessions are never lost.
+    atomic_write(segment_path(base_path, segment_no), gzip.compress(payload.encode("utf-8")))
+
+    rollup_sessions(data, overflow)
+    data["sessions"] = sessions[len(overflow):]
+    archive["segments"] = segment_no
+    archive["archived_sessions"] += len(overflow)
+    logger.debug(f"Archived {len(overflow)} session(s) to segment {segment_no} for {data['learner_id']}")
+    return len(overflow)
+
+
+def rollup_sessions(data: dict, sessions: list[dict]) -> None:
+    """Fold sessions into rollups[concept][iso_week] = {sessions, confusion_counts}."""
+    rollups = data.setdefault("rollups", {})
+    for s in sessions:
+        week = _iso_week(s["timestamp"])
+        bucket = rollups.setdefault(s["concept"], {}).setdefault(
+            week, {"sessions": 0, "confusion_counts": {}}
+        )
+        bucket["sessions"] += 1
+        ct = s["confusion_type"]
+        bucket["confusion_counts"][ct] = bucket["confusion_counts"].get(ct, 0) + 1
+
+
+def iter_archived_sessions(data: dict, base_path: Path) -> Iterator[dict]:
+    """Stream archived sessions oldest first, one segment at a time."""
+    for segment_no in range(1, data.get("archive", {}).get("segments", 0) + 1):
+        path = segment_path(base_path, segment_no)
+        try:
+            raw = gzip.decompress(path.read_bytes())
+        except FileNotFoundError:
+            logger.warning(f"Missing archive segment {path.name} for {data['learner_id']}")
+            continue
+        for line in raw.decode("utf-8").splitlines():
+            if line:
+                yield json.loads(line)
+
+
+def delete_segments(data: dict, base_path: Path) -> None:
+    for segment_no in range(1, data.get("archive", {}).get("segments", 0) + 1):
+        segment_path(base_path, segment_no).unlink(missing_ok=True)
+
+
+def segment_path(base_path: Path, segment_no: int) -> Path:
+    return base_path.with_name(f"{base_path.name}.seg-{segment_no:05d}.jsonl.gz")
+
+
+def _iso_week(timestamp: str) -> str:
+    year, week, _ = datetime.fromisoformat(timestamp).isocalendar()
+    return f"{year}-W{week:02d}"
@@ -0,0 +1,172 @@
+"""
+Review Scheduler — spaced-repetition reviews driven by practice scores.
+
+Each (learner, concept) pair carries SM-2 state (easiness, interval,
+repetitions). Every practice result reschedules the pair, and all pairs sit
+in one SQLite table indexed by due time, so "what is due" is an index range
+scan — O(log n + k) — instead of a walk over every learner file.
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+from memory.sqlite_store import get_connection, register_schema
+
+logger = logging.getLogger(__name__)
+
+# One SM-2 "day"; shrink it to minutes for demos
+REVIEW_INTERVAL_SECONDS = float(os.getenv("REVIEW_INTERVAL_SECONDS", "86400"))
+
+_MIN_EASINESS = 1.3
+_DEFAULT_EASINESS = 2.5
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS review_items (
+    learner_id    TEXT NOT NULL,
+    concept       TEXT NOT NULL,
+    due_at        REAL NOT NULL,
+    easiness      REAL NOT NULL,
+    interval_days REAL NOT NULL,
+    repetitions   INTEGER NOT NULL,
+    last_score    REAL NOT NULL,
+    updated_at    REAL NOT NULL,
+    PRIMARY KEY (learner_id, concept)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_review_due ON review_items (due_at);
+CREATE INDEX IF NOT EXISTS idx_review_learner_due ON review_items (learner_id, due_at);
+""")
+
+
+class ReviewScheduler:
+    """SM-2 scheduling over a time-ordered index of (due_at, learner_id, concept)."""
+
+    def record_review(
+        self,
+        learner_id: str,
+        concept: str,
+        score: float,
+        now: Optional[float] = None,
+    ) -> dict:
+        """Fold a practice score (0.0-1.0) into the pair's schedule and return it."""
+        now = now if now is not None else time.time()
+        conn = get_connection()
+        # Read and write in one transaction, so two concurrent reviews of the
+        # same pair cannot both start from the old schedule
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT easiness, interval_days, repetitions FROM review_items "
+                "WHERE learner_id = ? AND concept = ?",
+                (learner_id, concept),
+            ).fetchone()
+
+            easiness, interval, repetitions = (
+                (row["easiness"], row["interval_days"], row["repetitions"])
+                if row
+                else (_DEFAULT_EASINESS, 0.0, 0)
+            )
+            easiness, interval, repetitions = _sm2(score, easiness, interval, repetitions)
+            due_at = now + interval * REVIEW_INTERVAL_SECONDS
+
+            conn.execute(
+                "INSERT INTO review_items "
+                "(learner_id, concept, due_at, easiness, interval_days, repetitions, last_score, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (learner_id, concept) DO UPDATE SET "
+                "due_at = excluded.due_at, easiness = excluded.easiness, "
+                "interval_days = excluded.interval_days, repetitions = excluded.repetitions, "
+                "last_score = excluded.last_score, updated_at = excluded.updated_at",
+                (learner_id, concept, due_at, easiness, interval, repetitions, score, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.debug(f"Review scheduled: {learner_id}/{concept} in {interval:.1f} day(s)")
+        return {
+            "learner_id": learner_id,
+            "concept": concept,
+            "due_at": due_at,
+            "easiness": easiness,
+            "interval_days": interval,
+            "repetitions": repetitions,
+            "last_score": score,
+        }
+
+    def due_for_learner(
+        self,
+        learner_id: str,
+        limit: int = 20,
+        now: Optional[float] = None,
+    ) -> list[dict]:
+        """Items due for one learner, most overdue first."""
+        now = now if now is not None else time.time()
+        rows = get_connection().execute(
+            "SELECT * FROM review_items WHERE learner_id = ? AND due_at <= ? "
+            "ORDER BY due_at LIMIT ?",
+            (learner_id, now, limit),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def next_due(
+        self,
+        limit: int = 20,
+        now: Optional[float] = None,
+        due_only: bool = True,
+    ) -> list[dict]:
+        """The next N items system-wide by due time (optionally only those already due)."""
+        conn = get_connection()
+        if due_only:
+            now = now if now is not None else time.time()
+            rows = conn.execute(
+                "SELECT * FROM review_items WHERE due_at <= ? ORDER BY due_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT * FROM review_items ORDER BY due_at LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def forget_learner(self, learner_id: str) -> None:
+        """Drop every scheduled review for a learner."""
+        get_connection().execute("DELETE FROM review_items WHERE learner_id = ?", (learner_id,))
+
+
+# ── SM-2 ───────────────────────────────────────────────────────
+
+def _sm2(
+    score: float,
+    easiness: float,
+    interval: float,
+    repetitions: int,
+) -> tuple[float, float, int]:
+    """
+    Classic SM-2 step. The 0.0-1.0 practice score maps to SM-2 quality 0-5;
+    quality < 3 counts as a lapse and restarts the interval ladder.
+    """
+    quality = round(min(max(score, 0.0), 1.0) * 5)
+
+    if quality < 3:
+        repetitions = 0
+        interval = 1.0
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1.0
+        elif repetitions == 2:
+            interval = 6.0
+        else:
+            interval = round(interval * easiness, 2)
+
+    easiness += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    return max(easiness, _MIN_EASINESS), interval, repetitions
+
+
+_scheduler = ReviewScheduler()
+
+
+def get_review_scheduler() -> ReviewScheduler:
+    return _scheduler
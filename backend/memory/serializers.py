@@ -0,0 +1,175 @@
+"""
+Serializers — on-disk formats for learner records.
+
+- json:   the original pretty-printed JSON (human-readable, default)
+- binary: compact struct-packed format. Sessions, which dominate file size,
+          become fixed-width rows with interned string IDs and epoch-µs
+          timestamps, followed by one blob holding every preview; the rest
+          of the record is stored as compact JSON.
+
+Files are self-describing: binary files start with a magic header, so
+reads never need to know which format wrote them.
+
+Binary layout (little-endian):
+    b"BBLM" | u8 version
+    u32 n_strings | n x (u16 len | utf-8 bytes)             — intern table
+    u32 n_sessions | n x (i64 ts_us | u32 concept | u16 confusion
+                          | u16 strategy | u16 preview chars)
+    u32 len | utf-8 blob of all previews, concatenated
+    u32 len | compact JSON of the record without "sessions"
+
+Sessions that don't fit the fixed-width fields (a string over 64 KB) stay
+in the JSON section instead, with n_strings and n_sessions of 0.
+"""
+
+import json
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+_SESSION_KEYS = {"timestamp", "concept", "confusion_type", "strategy_used", "explanation_preview"}
+
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_SESSION_ROW = struct.Struct("<qIHHH")
+
+
+class JsonSerializer:
+    name = "json"
+    suffix = ".json"
+
+    def dumps(self, data: dict) -> bytes:
+        return json.dumps(data, indent=2).encode("utf-8")
+
+    def loads(self, raw: bytes) -> dict:
+        return json.loads(raw)
+
+
+class BinarySerializer:
+    name = "binary"
+    suffix = ".bin"
+    MAGIC = b"BBLM\x01"
+
+    def dumps(self, data: dict) -> bytes:
+        sessions = data.get("sessions", [])
+        packed = None
+        if all(s.keys() == _SESSION_KEYS for s in sessions):
+            packed = _pack_sessions(sessions)
+        if packed is None:
+            # Unknown session shape, or strings the u16 fields can't hold —
+            # keep it lossless in the JSON section
+            strings, rows, blob, n_rows, rest = {}, b"", b"", 0, data
+        else:
+            strings, rows, blob = packed
+            n_rows, rest = len(sessions), {k: v for k, v in data.items() if k != "sessions"}
+
+        out = bytearray(self.MAGIC)
+        out += _U32.pack(len(strings))
+        for value in strings:
+            encoded = value.encode("utf-8")
+            out += _U16.pack(len(encoded)) + encoded
+        out += _U32.pack(n_rows) + rows
+        out += _U32.pack(len(blob)) + blob
+        tail = json.dumps(rest, separators=(",", ":")).encode("utf-8")
+        out += _U32.pack(len(tail)) + tail
+        return bytes(out)
+
+    def loads(self, raw: bytes) -> dict:
+        view = memoryview(raw)
+        pos = len(self.MAGIC)
+
+        (n_strings,) = _U32.unpack_from(view, pos)
+        pos += 4
+        strings = []
+        for _ in range(n_strings):
+            (length,) = _U16.unpack_from(view, pos)
+            pos += 2
+            strings.append(str(view[pos:pos + length], "utf-8"))
+            pos += length
+
+        (n_sessions,) = _U32.unpack_from(view, pos)
+        pos += 4
+        rows_end = pos + n_sessions * _SESSION_ROW.size
+        rows = view[pos:rows_end]
+        (blob_len,) = _U32.unpack_from(view, rows_end)
+        pos = rows_end + 4
+        blob = str(view[pos:pos + blob_len], "utf-8")
+        pos += blob_len
+
+        sessions = []
+        offset = 0
+        for ts_us, concept, confusion, strategy, length in _SESSION_ROW.iter_unpack(rows):
+            sessions.append({
+                "timestamp": _from_epoch_us(ts_us),
+                "concept": strings[concept],
+                "confusion_type": strings[confusion],
+                "strategy_used": strings[strategy],
+                "explanation_preview": blob[offset:offset + length],
+            })
+            offset += length
+
+        (tail_len,) = _U32.unpack_from(view, pos)
+        pos += 4
+        data = json.loads(bytes(view[pos:pos + tail_len]))
+        if "sessions" not in data:
+            data["sessions"] = sessions
+        return data
+
+
+SERIALIZERS = {s.name: s for s in (JsonSerializer(), BinarySerializer())}
+
+
+def get_serializer(name: str | None = None):
+    """Serializer for writing (MEMORY_FORMAT env var, default json)."""
+    name = (name or os.getenv("MEMORY_FORMAT", "json")).lower()
+    if name not in SERIALIZERS:
+        raise ValueError(f"MEMORY_FORMAT must be one of {sorted(SERIALIZERS)}, got '{name}'")
+    return SERIALIZERS[name]
+
+
+def detect_serializer(raw: bytes):
+    """Serializer that can read `raw`, based on its header."""
+    if raw.startswith(BinarySerializer.MAGIC):
+        return SERIALIZERS["binary"]
+    return SERIALIZERS["json"]
+
+
+# ── Helpers ────────────────────────────────────────────────────
+
+def _pack_sessions(sessions: list[dict]) -> tuple[dict[str, int], bytes, bytes] | None:
+    """Intern table, session rows and preview blob; None if a field would overflow u16."""
+    strings: dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        idx = strings.get(value)
+        if idx is None:
+            idx = strings[value] = len(strings)
+        return idx
+
+    rows = bytearray()
+    previews = []
+    for s in sessions:
+        preview = s["explanation_preview"][:0xFFFF]
+        previews.append(preview)
+        confusion, strategy = intern(s["confusion_type"]), intern(s["strategy_used"])
+        if confusion > 0xFFFF or strategy > 0xFFFF:
+            return None
+        rows += _SESSION_ROW.pack(
+            _to_epoch_us(s["timestamp"]), intern(s["concept"]), confusion, strategy, len(preview),
+        )
+    if any(len(value.encode("utf-8")) > 0xFFFF for value in strings):
+        return None
+    return strings, bytes(rows), "".join(previews).encode("utf-8")
+
+
+def _to_epoch_us(timestamp: str) -> int:
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // _ONE_US
+
+
+def _from_epoch_us(value: int) -> str:
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
@@ -0,0 +1,47 @@
+"""
+SQLite Store — shared connection helper for the small indexed tables that
+live next to the per-learner JSON files (review schedule, rollups, ...).
+
+Per-learner JSON stays the source of truth for a learner's own history;
+anything that has to be queried across learners goes here instead of
+scanning every file in MEMORY_DIR.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from memory.layout import MEMORY_DIR
+
+logger = logging.getLogger(__name__)
+
+_DB_PATH = Path(os.getenv("MEMORY_DB_PATH", str(MEMORY_DIR / "learner_index.sqlite3")))
+
+_schemas: list[str] = []
+_local = threading.local()
+
+
+def register_schema(ddl: str) -> None:
+    """Register CREATE ... IF NOT EXISTS statements to run on every new connection."""
+    _schemas.append(ddl)
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Per-thread connection (sqlite3 connections must not be shared across threads).
+    WAL mode lets several uvicorn workers read while one writes.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        _DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(_DB_PATH, timeout=5.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for ddl in _schemas:
+            conn.executescript(ddl)
+        _local.conn = conn
+        logger.debug(f"Opened learner index database: {_DB_PATH}")
+    return conn
@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Union
 from models.confusion_types import ConfusionType, ExplanationStrategy
 
 
@@ -11,6 +12,12 @@ class ExplainRequest(BaseModel):
     code_snippet: Optional[str] = Field(None, description="Optional code the learner is confused about")
     difficulty_level: Optional[str] = Field("beginner", description="beginner | intermediate | advanced")
     learner_id: Optional[str] = Field(None, description="Optional ID to track learner session")
+    cohort_id: Optional[str] = Field(None, description="Optional class/group ID for cohort analytics")
+    follow_up: Optional[bool] = Field(
+        None,
+        description="Answer as a short delta on the previous explanation of this concept. "
+                    "Default: automatic when the learner was explained it recently; false forces a full explanation",
+    )
 
     class Config:
         json_schema_extra = {
@@ -24,12 +31,17 @@ class ExplainRequest(BaseModel):
         }
 
 
+class ExplainBatchRequest(BaseModel):
+    items: List[ExplainRequest] = Field(..., min_length=1, max_length=50, description="Doubts to explain, e.g. one per exercise or per student")
+
+
 class PracticeRequest(BaseModel):
     concept: str
     confusion_type: ConfusionType
     explanation_given: str = Field(..., description="The explanation that was already shown to the learner")
     difficulty_level: Optional[str] = Field("beginner")
     num_questions: Optional[int] = Field(2, ge=1, le=5)
+    learner_id: Optional[str] = Field(None, description="Attributes LLM usage and applies the learner's quota")
 
     class Config:
         json_schema_extra = {
@@ -45,6 +57,7 @@ class PracticeRequest(BaseModel):
 
 class FeedbackRequest(BaseModel):
     learner_id: str
+    cohort_id: Optional[str] = None
     concept: str
     question: str
     learner_answer: str
@@ -69,6 +82,21 @@ class ExplainResponse(BaseModel):
     key_insight: Optional[str] = None
     common_mistake: Optional[str] = None
     follow_up_hint: Optional[str] = None
+    degraded: bool = Field(False, description="Served without a fresh LLM answer because the LLM was unavailable")
+    fallback: Optional[str] = Field(None, description="Where a degraded answer came from: cached | nearest | template")
+
+
+class ExplainBatchItem(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    response: Optional[ExplainResponse] = None
+    error: Optional[str] = Field(None, description="Why this item failed; the other items are unaffected")
+
+
+class ExplainBatchResponse(BaseModel):
+    results: List[ExplainBatchItem]
+    succeeded: int
+    failed: int
+    deduplicated: int = Field(..., description="Items answered from an identical item in the same batch")
 
 
 class PracticeQuestion(BaseModel):
@@ -94,6 +122,178 @@ class FeedbackResponse(BaseModel):
     encouragement: str
 
 
+class ReviewItem(BaseModel):
+    learner_id: str
+    concept: str
+    due_at: datetime
+    interval_days: float = Field(..., description="Current SM-2 interval")
+    repetitions: int = Field(..., description="Successful reviews in a row")
+    easiness: float = Field(..., description="SM-2 easiness factor (>= 1.3)")
+    last_score: float
+
+
+class ReviewDueResponse(BaseModel):
+    learner_id: Optional[str] = None
+    items: List[ReviewItem]
+
+
+class CohortConceptStats(BaseModel):
+    concept: str
+    sessions: int = Field(..., description="Explanation sessions on this concept")
+    learners: int = Field(..., description="Distinct learners who asked about this concept")
+    mastery_rate: float
+    struggling_rate: float
+    confusion_breakdown: Dict[str, int]
+    dominant_confusion: Optional[ConfusionType] = None
+
+
+class CohortTrendPoint(BaseModel):
+    bucket_start: datetime
+    confusion_counts: Dict[str, int]
+
+
+class CohortAnalyticsResponse(BaseModel):
+    cohort_id: str
+    concepts: List[CohortConceptStats]
+    trend: List[CohortTrendPoint]
+
+
+class SessionRecord(BaseModel):
+    timestamp: datetime
+    concept: str
+    confusion_type: str
+    strategy_used: str
+    explanation_preview: str
+
+
+class SessionRollup(BaseModel):
+    sessions: int
+    confusion_counts: Dict[str, int]
+
+
+class LearnerHistoryResponse(BaseModel):
+    learner_id: str
+    total_sessions: int
+    archived_sessions: int = Field(..., description="Sessions older than the hot window, read from archive segments")
+    rollups: Dict[str, Dict[str, SessionRollup]] = Field(
+        ..., description="concept -> ISO week (e.g. 2025-W07) -> aggregate of archived sessions"
+    )
+    sessions: List[SessionRecord] = Field(..., description="Full session history, oldest first")
+
+
 class HealthResponse(BaseModel):
     status: str
-    version: str
\ No newline at end of file
+    version: str
+
+
+class WarmupStep(BaseModel):
+    ok: bool
+    ms: float
+    detail: str
+
+
+class WarmupReport(BaseModel):
+    state: str = Field(..., description="pending | running | done")
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_ms: Optional[float] = None
+    steps: Dict[str, WarmupStep]
+
+
+class DependencyStatus(BaseModel):
+    ok: bool
+    latency_ms: float
+    detail: str
+    checked_at: datetime = Field(..., description="When this check last ran (LLM probes are cached)")
+
+
+class ReadinessResponse(BaseModel):
+    status: str = Field(..., description="warming_up | ready | degraded | unavailable")
+    ready: bool
+    version: str
+    warmup: WarmupReport
+    dependencies: Dict[str, DependencyStatus]
+
+# ── Metrics Models ──────────────────────────────────────────────
+
+class TokenBudgetBucket(BaseModel):
+    calls: int
+    truncations: int
+    retries: int
+    last_budget: int
+    samples: int
+    p95_completion_tokens: Optional[int] = None
+
+
+class TokenBudgetReport(BaseModel):
+    reference_max_tokens: int = Field(..., description="The old global LLM_MAX_TOKENS, used as the baseline")
+    calls: int
+    retries: int
+    truncations: int
+    max_tokens_reserved_saved: int = Field(..., description="Sum of (baseline - budget) over all calls")
+    ms_per_completion_token: float
+    estimated_latency_saved_ms: float
+    retry_latency_ms: float = Field(..., description="Latency spent on completions that had to be regenerated")
+    net_latency_saved_ms: float
+    buckets: Dict[str, TokenBudgetBucket]
+
+
+class UsageRow(BaseModel):
+    dimensions: Dict[str, Optional[Union[str, int]]] = Field(default_factory=dict)
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cost_usd: float
+
+
+class CacheNamespaceStats(BaseModel):
+    namespace: str
+    version: str = Field(..., description="CACHE_VERSION plus the prompt/model hash keys are scoped to")
+    shared_tier: Optional[str] = Field(None, description="sqlite | redis, or null when local only")
+    local_items: int
+    hit_rate: float
+    local_hits: int
+    shared_hits: int
+    misses: int
+    negative_stores: int = Field(..., description="Fallback results kept only for CACHE_NEGATIVE_TTL_SECONDS")
+    coalesced: int = Field(..., description="Misses that waited for a computation already running in this worker")
+    lease_waits: int = Field(..., description="Misses that waited for another worker's computation")
+    shared_errors: int
+
+
+class CacheReport(BaseModel):
+    namespaces: List[CacheNamespaceStats]
+
+
+class CpuTaskStats(BaseModel):
+    name: str
+    tier: str = Field(..., description="process | thread")
+    calls: int
+    pooled: int = Field(..., description="Calls that ran on the pool")
+    inline: int = Field(..., description="Calls that ran in the caller's thread (no pool: inline mode, tests, scripts)")
+    overflow: int = Field(..., description="Calls run inline because the tier stayed full for CPU_POOL_QUEUE_TIMEOUT_SECONDS")
+    errors: int
+    queue_ms_avg: float
+    queue_ms_max: float
+    run_ms_avg: float
+    run_ms_max: float
+
+
+class CpuPoolReport(BaseModel):
+    mode: str = Field(..., description="process | thread | inline")
+    workers: int = Field(..., description="Worker processes (process mode)")
+    threads: int
+    max_pending: Dict[str, int] = Field(..., description="Backpressure limit per tier")
+    pending: Dict[str, int]
+    restarts: int = Field(..., description="Times the process pool was recreated after a child died")
+    tasks: List[CpuTaskStats]
+
+
+class UsageReport(BaseModel):
+    group_by: List[str]
+    bucket_seconds: int
+    rows: List[UsageRow]
+    totals: UsageRow
+    price_per_1k_input: float
+    price_per_1k_output: float
@@ -0,0 +1,330 @@
+"""
+Admission — rate limits and fair sharing of LLM capacity.
+
+Two layers, so one learner scripting /explain in a loop can't starve
+everyone else:
+
+1. Token buckets (api/middleware/admission.py checks them per request):
+   one per learner_id and one per tenant. A tenant is the name mapped to
+   the caller's X-API-Key in ADMISSION_API_KEYS. Callers without a known
+   key share the "anonymous" tenant, which has no bucket (only their
+   learner buckets apply) unless ADMISSION_IP_TENANTS makes each client IP
+   its own tenant. Behind a proxy, list it in ADMISSION_TRUSTED_PROXIES so
+   the client IP is taken from X-Forwarded-For — the header is ignored
+   from anyone else. Over the limit = immediate 429 with Retry-After.
+   Buckets live in-process (ADMISSION_STORE=memory), or in the shared
+   SQLite file (ADMISSION_STORE=sqlite) so several uvicorn workers on one
+   host enforce a single limit.
+2. Weighted fair queueing of LLM calls: at most ADMISSION_LLM_SLOTS Bedrock
+   calls run at once per worker; when they're all busy, waiting calls are
+   served by virtual finish time (start-time fair queueing), so each tenant
+   gets slots in proportion to its ADMISSION_TENANT_WEIGHTS weight no matter
+   how many calls it has queued.
+"""
+
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+from memory.sqlite_store import get_connection, register_schema
+from services.deadline import remaining
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED        = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_STORE          = os.getenv("ADMISSION_STORE", "memory").lower()
+# Sustained requests/second and burst size; rate 0 disables that bucket
+ADMISSION_LEARNER_RATE   = float(os.getenv("ADMISSION_LEARNER_RATE", "0.5"))
+ADMISSION_LEARNER_BURST  = float(os.getenv("ADMISSION_LEARNER_BURST", "10"))
+ADMISSION_TENANT_RATE    = float(os.getenv("ADMISSION_TENANT_RATE", "5"))
+ADMISSION_TENANT_BURST   = float(os.getenv("ADMISSION_TENANT_BURST", "50"))
+# "key1=tenant-a,key2=tenant-b" / "tenant-a=3,tenant-b=1" (unlisted tenants weigh 1)
+ADMISSION_API_KEYS       = os.getenv("ADMISSION_API_KEYS", "")
+ADMISSION_TENANT_WEIGHTS = os.getenv("ADMISSION_TENANT_WEIGHTS", "")
+# Keyless callers: one tenant bucket per client IP instead of none
+ADMISSION_IP_TENANTS     = os.getenv("ADMISSION_IP_TENANTS", "false").lower() == "true"
+# Proxy addresses whose X-Forwarded-For is believed, comma-separated
+ADMISSION_TRUSTED_PROXIES = frozenset(
+    p.strip() for p in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",") if p.strip()
+)
+# Concurrent Bedrock calls per worker; 0 = no scheduling
+ADMISSION_LLM_SLOTS      = int(os.getenv("ADMISSION_LLM_SLOTS", "16"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "30"))
+# In-process buckets kept; the least recently used are evicted (they'd be full by then anyway)
+ADMISSION_MAX_KEYS       = int(os.getenv("ADMISSION_MAX_KEYS", "100000"))
+
+if ADMISSION_STORE not in ("memory", "sqlite"):
+    raise ValueError(f"ADMISSION_STORE must be memory|sqlite, got '{ADMISSION_STORE}'")
+
+
+def _parse_mapping(raw: str) -> dict[str, str]:
+    pairs = (item.split("=", 1) for item in raw.split(",") if "=" in item)
+    return {k.strip(): v.strip() for k, v in pairs if k.strip() and v.strip()}
+
+
+_TENANTS_BY_KEY = _parse_mapping(ADMISSION_API_KEYS)
+_TENANT_WEIGHTS = {tenant: float(w) for tenant, w in _parse_mapping(ADMISSION_TENANT_WEIGHTS).items()}
+
+# Keyless callers when ADMISSION_IP_TENANTS is off; no tenant bucket
+ANONYMOUS_TENANT = "anonymous"
+
+_current_tenant: contextvars.ContextVar[str] = contextvars.ContextVar("tenant", default="default")
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def resolve_tenant(
+    api_key: Optional[str],
+    client_host: Optional[str],
+    forwarded_for: Optional[str] = None,
+) -> str:
+    if api_key and api_key in _TENANTS_BY_KEY:
+        return _TENANTS_BY_KEY[api_key]
+    if not ADMISSION_IP_TENANTS:
+        return ANONYMOUS_TENANT
+    return f"ip:{client_ip(client_host, forwarded_for) or 'unknown'}"
+
+
+def client_ip(peer: Optional[str], forwarded_for: Optional[str]) -> Optional[str]:
+    """
+    The peer address, or — when the peer is a trusted proxy — the rightmost
+    X-Forwarded-For entry that isn't one (entries left of it are client-supplied).
+    """
+    if peer not in ADMISSION_TRUSTED_PROXIES or not forwarded_for:
+        return peer
+    for hop in reversed([h.strip() for h in forwarded_for.split(",")]):
+        if hop and hop not in ADMISSION_TRUSTED_PROXIES:
+            return hop
+    return peer
+
+
+def tenant_weight(tenant: str) -> float:
+    return _TENANT_WEIGHTS.get(tenant, 1.0)
+
+
+@contextmanager
+def tenant_scope(tenant: str):
+    """LLM calls made inside this block queue as `tenant` (see FairScheduler)."""
+    token = _current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+# ── Token buckets ──────────────────────────────────────────────
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class MemoryBucketStore:
+    """Per-worker buckets: key -> [tokens, last update]."""
+
+    def __init__(self, max_keys: int = ADMISSION_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Spend `cost` tokens. Returns 0 if admitted, else seconds until it would be."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = _refill(bucket[0], bucket[1], now, rate, burst)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / rate
+
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS admission_buckets (
+    key     TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+""")
+
+
+class SqliteBucketStore:
+    """
+    Buckets shared by every worker using the same MEMORY_DB_PATH. Each take
+    is one short write transaction (BEGIN IMMEDIATE serializes workers).
+    """
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        now = time.time()  # wall clock: comparable across processes
+        conn = get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM admission_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else _refill(row["tokens"], row["updated"], now, rate, burst)
+            wait = 0.0 if tokens >= cost else (cost - tokens) / rate
+            if not wait:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO admission_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, store):
+        self.store = store
+
+    def admit(self, tenant: str, learner_costs: dict[str, float], cost: float = 1.0) -> None:
+        """
+        Charge the tenant `cost` (not the anonymous tenant) and each learner
+        their own cost; raise AdmissionRejected with the longest wait if any
+        bucket is empty. Fails open on store errors.
+        """
+        waits = []
+        try:
+            if ADMISSION_TENANT_RATE > 0 and tenant != ANONYMOUS_TENANT:
+                waits.append(("tenant", tenant, self.store.take(
+                    f"t:{tenant}", ADMISSION_TENANT_RATE * tenant_weight(tenant),
+                    max(ADMISSION_TENANT_BURST * tenant_weight(tenant), cost), cost,
+                )))
+            if ADMISSION_LEARNER_RATE > 0:
+                for learner_id, learner_cost in learner_costs.items():
+                    waits.append(("learner", learner_id, self.store.take(
+                        f"l:{learner_id}", ADMISSION_LEARNER_RATE,
+                        max(ADMISSION_LEARNER_BURST, learner_cost), learner_cost,
+                    )))
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Rate limit store unavailable, admitting request: {e}")
+            return
+
+        kind, key, wait = max(waits, key=lambda w: w[2], default=("", "", 0.0))
+        if wait > 0:
+            raise AdmissionRejected(f"Rate limit exceeded for {kind} '{key}'", retry_after=wait)
+
+
+# ── Fair queueing of LLM calls ─────────────────────────────────
+
+class FairScheduler:
+    """
+    Start-time fair queueing over a fixed number of slots. Each queued call
+    gets a virtual start tag max(virtual clock, tenant's last tag) and its
+    tenant's next tag advances by 1/weight; free slots go to the smallest
+    tag. A tenant with 100 queued calls therefore waits behind its own
+    backlog, not in front of a tenant that just arrived.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._free = slots
+        self._cond = threading.Condition()
+        self._queue: list[tuple[float, int]] = []
+        self._seq = itertools.count()
+        self._next_tag: dict[str, float] = {}
+        self._virtual = 0.0
+        self.stats = {"admitted": 0, "queued": 0, "timed_out": 0, "max_queue": 0}
+
+    @contextmanager
+    def slot(self, tenant: str, weight: float = 1.0, timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        with self._cond:
+            if self._free > 0 and not self._queue:
+                self._free -= 1
+                self._virtual = self._advance(tenant, weight)
+            else:
+                self._wait_for_turn(tenant, weight, timeout)
+            self.stats["admitted"] += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._free += 1
+                self._cond.notify_all()
+
+    def _advance(self, tenant: str, weight: float) -> float:
+        tag = max(self._virtual, self._next_tag.get(tenant, 0.0))
+        self._next_tag[tenant] = tag + 1.0 / weight
+        if len(self._next_tag) > 10_000:
+            # Tags behind the virtual clock carry no information any more
+            self._next_tag = {t: v for t, v in self._next_tag.items() if v > self._virtual}
+        return tag
+
+    def _wait_for_turn(self, tenant: str, weight: float, timeout: float) -> None:
+        entry = (self._advance(tenant, weight), next(self._seq))
+        heapq.heappush(self._queue, entry)
+        self.stats["queued"] += 1
+        self.stats["max_queue"] = max(self.stats["max_queue"], len(self._queue))
+        deadline = time.monotonic() + timeout
+        while not (self._free > 0 and self._queue[0] == entry):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self.stats["timed_out"] += 1
+                self._cond.notify_all()
+                raise AdmissionRejected(f"No LLM slot free within {timeout:.1f}s", retry_after=timeout)
+            self._cond.wait(remaining)
+        heapq.heappop(self._queue)
+        self._free -= 1
+        self._virtual = entry[0]
+        self._cond.notify_all()  # the next in line may fit another free slot
+
+    def report(self) -> dict:
+        with self._cond:
+            return {**self.stats, "slots": self.slots, "busy": self.slots - self._free, "queue": len(self._queue)}
+
+
+@contextmanager
+def llm_slot():
+    """Hold one of this worker's LLM slots for the current tenant (no-op when unlimited)."""
+    scheduler = get_llm_scheduler()
+    if scheduler is None:
+        yield
+        return
+    tenant = _current_tenant.get()
+    # No point queueing past the request deadline
+    timeout = ADMISSION_QUEUE_TIMEOUT_SECONDS
+    budget = remaining()
+    if budget is not None:
+        timeout = max(0.0, min(timeout, budget))
+    with scheduler.slot(tenant, tenant_weight(tenant), timeout):
+        yield
+
+
+_rate_limiter = RateLimiter(SqliteBucketStore() if ADMISSION_STORE == "sqlite" else MemoryBucketStore())
+_scheduler = FairScheduler(ADMISSION_LLM_SLOTS) if ADMISSION_LLM_SLOTS > 0 else None
+
+
+def get_rate_limiter() -> RateLimiter:
+    return _rate_limiter
+
+
+def get_llm_scheduler() -> Optional[FairScheduler]:
+    return _scheduler
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,434 @@
+"""
+Cache — a two-tier cache for LLM-derived results, shared across workers.
+
+- Tier 1: in-process LRU (CACHE_LOCAL_MAX_ITEMS per namespace), checked first.
+- Tier 2: shared by every worker pointed at the same store (CACHE_BACKEND):
+    sqlite (default): two tables in MEMORY_DB_PATH — every uvicorn worker on
+                      the host, or every pod mounting the same volume
+    redis:            a Redis-compatible server at CACHE_REDIS_URL (needs the
+                      optional `redis` package; imported on first use)
+    none:             local tier only
+  A shared hit is copied into the local tier. After a shared-tier error the
+  tier is skipped for CACHE_SHARED_RETRY_SECONDS: the cache degrades to
+  local-only and never fails a request.
+- Keys: "bb:<namespace>:<version>:<sha256 of the key parts>". Callers pass
+  a version derived from the prompts the result came from (see
+  core.strategy_selector.prompt_version); CACHE_VERSION is prepended, so
+  editing a prompt, switching models or bumping CACHE_VERSION starts a
+  fresh namespace instead of serving answers to the old prompt.
+- Stampede protection: one computation per key at a time. In a worker,
+  concurrent misses wait for the first caller's result. Across workers,
+  the first one takes a lease in the shared tier; the others poll for its
+  result (up to CACHE_LOCK_WAIT_SECONDS, never past the request deadline)
+  and only compute themselves if it doesn't show up.
+- Negative caching: results the caller marks negative (a fallback, a
+  lookup that found nothing) are kept only CACHE_NEGATIVE_TTL_SECONDS, so
+  a burst of identical requests during an outage doesn't recompute each
+  time, and recovery shows up quickly.
+
+Values must be JSON-serializable (callers cache model_dump output).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from memory.sqlite_store import get_connection, register_schema
+from services.deadline import remaining
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED               = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_BACKEND               = os.getenv("CACHE_BACKEND", "sqlite")  # sqlite | redis | none
+CACHE_REDIS_URL             = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_REDIS_TIMEOUT_SECONDS = float(os.getenv("CACHE_REDIS_TIMEOUT_SECONDS", "0.25"))
+CACHE_VERSION               = os.getenv("CACHE_VERSION", "1")
+CACHE_TTL_SECONDS           = float(os.getenv("CACHE_TTL_SECONDS", "86400"))
+CACHE_NEGATIVE_TTL_SECONDS  = float(os.getenv("CACHE_NEGATIVE_TTL_SECONDS", "60"))
+CACHE_LOCAL_MAX_ITEMS       = int(os.getenv("CACHE_LOCAL_MAX_ITEMS", "2048"))
+# How long one worker's computation holds the key before others give up waiting
+CACHE_LOCK_TTL_SECONDS      = float(os.getenv("CACHE_LOCK_TTL_SECONDS", "30"))
+CACHE_LOCK_WAIT_SECONDS     = float(os.getenv("CACHE_LOCK_WAIT_SECONDS", "20"))
+CACHE_POLL_SECONDS          = float(os.getenv("CACHE_POLL_SECONDS", "0.05"))
+CACHE_SHARED_RETRY_SECONDS  = float(os.getenv("CACHE_SHARED_RETRY_SECONDS", "5"))
+
+_KEY_PREFIX = "bb"
+_PURGE_EVERY = 500  # sqlite tier: drop expired rows every N writes
+
+_MISS = object()
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key     TEXT PRIMARY KEY,
+    value   TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cache_leases (
+    key     TEXT PRIMARY KEY,
+    expires REAL NOT NULL
+);
+""")
+
+
+# ── Shared tiers ───────────────────────────────────────────────
+
+class SqliteTier:
+    """cache_entries/cache_leases in the shared learner index database."""
+
+    name = "sqlite"
+    errors = (sqlite3.Error, OSError)
+
+    def __init__(self):
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        row = get_connection().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row["value"] if row else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        conn = get_connection()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            (key, value, now + ttl),
+        )
+        self._writes += 1
+        if self._writes % _PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache_entries WHERE expires <= ?", (now,))
+            conn.execute("DELETE FROM cache_leases WHERE expires <= ?", (now,))
+
+    def delete(self, key: str) -> None:
+        get_connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        # Inserts, or takes over an expired lease; a live one is left alone (rowcount 0)
+        cursor = get_connection().execute(
+            "INSERT INTO cache_leases (key, expires) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET expires = excluded.expires WHERE cache_leases.expires <= ?",
+            (key, now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, key: str) -> None:
+        get_connection().execute("DELETE FROM cache_leases WHERE key = ?", (key,))
+
+
+class RedisTier:
+    """Any Redis-compatible server (Redis, Valkey, KeyDB, ...)."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis
+
+        self.errors = (redis.RedisError, OSError)
+        self._client = redis.Redis.from_url(
+            url,
+            socket_timeout=CACHE_REDIS_TIMEOUT_SECONDS,
+            socket_connect_timeout=CACHE_REDIS_TIMEOUT_SECONDS,
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def acquire_lease(self, key: str, ttl: float) -> bool:
+        return bool(self._client.set(f"{key}:lease", b"1", nx=True, px=max(1, int(ttl * 1000))))
+
+    def release_lease(self, key: str) -> None:
+        self._client.delete(f"{key}:lease")
+
+
+_shared_tier = None
+_shared_tier_ready = False
+_shared_tier_lock = threading.Lock()
+
+
+def get_shared_tier():
+    """The configured shared tier (created on first use), or None."""
+    global _shared_tier, _shared_tier_ready
+    if not _shared_tier_ready:
+        with _shared_tier_lock:
+            if not _shared_tier_ready:
+                if CACHE_BACKEND == "sqlite":
+                    _shared_tier = SqliteTier()
+                elif CACHE_BACKEND == "redis":
+                    try:
+                        _shared_tier = RedisTier(CACHE_REDIS_URL)
+                    except ImportError:
+                        logger.warning("CACHE_BACKEND=redis but the redis package is not installed; local cache only")
+                elif CACHE_BACKEND != "none":
+                    logger.warning(f"Unknown CACHE_BACKEND '{CACHE_BACKEND}'; local cache only")
+                _shared_tier_ready = True
+    return _shared_tier
+
+
+# ── Two-tier cache ─────────────────────────────────────────────
+
+class _Flight:
+    """One in-progress computation that concurrent misses in this worker wait on."""
+
+    __slots__ = ("done", "value", "failed")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+class TwoTierCache:
+    def __init__(
+        self,
+        namespace: str,
+        version: str,
+        shared=None,
+        ttl: float = CACHE_TTL_SECONDS,
+        negative_ttl: float = CACHE_NEGATIVE_TTL_SECONDS,
+        local_max_items: int = CACHE_LOCAL_MAX_ITEMS,
+    ):
+        self.namespace = namespace
+        self.version = version
+        self.shared = shared
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local_max_items = local_max_items
+        self._prefix = f"{_KEY_PREFIX}:{namespace}:{CACHE_VERSION}.{version}:"
+        self._local: OrderedDict[str, tuple[float, Any]] = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+        self._shared_down_until = 0.0
+        self.stats = {
+            "local_hits": 0, "shared_hits": 0, "misses": 0, "negative_stores": 0,
+            "coalesced": 0, "lease_waits": 0, "shared_errors": 0,
+        }
+
+    def key(self, parts: tuple) -> str:
+        digest = hashlib.sha256(
+            json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+        ).hexdigest()
+        return self._prefix + digest[:32]
+
+    # ── Public API ─────────────────────────────────────────────
+
+    def get(self, parts: tuple) -> Any:
+        """The cached value, or None on a miss (use get_or_compute to tell them apart)."""
+        value = self._lookup(self.key(parts))
+        return None if value is _MISS else value
+
+    def set(self, parts: tuple, value: Any, negative: bool = False) -> None:
+        self._store(self.key(parts), value, negative)
+
+    def invalidate(self, parts: tuple) -> None:
+        key = self.key(parts)
+        with self._lock:
+            self._local.pop(key, None)
+        self._shared_call("delete", key)
+
+    def get_or_compute(
+        self,
+        parts: tuple,
+        compute: Callable[[], Any],
+        is_negative: Callable[[Any], bool] = lambda value: value is None,
+    ) -> Any:
+        """
+        The cached value for `parts`, else compute() — run once per key even
+        under concurrent misses — stored for `ttl`, or `negative_ttl` when
+        is_negative(value). Exceptions from compute() are not cached.
+        """
+        if not CACHE_ENABLED:
+            return compute()
+
+        key = self.key(parts)
+        with span("cache", namespace=self.namespace) as s:
+            value = self._lookup(key, s)
+            if value is not _MISS:
+                return value
+
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                else:
+                    self.stats["coalesced"] += 1
+            if not leader:
+                s.set(tier="coalesced")
+                if flight.done.wait(self._wait_budget()) and not flight.failed:
+                    return flight.value
+                return self._compute_and_store(key, compute, is_negative)
+
+            try:
+                flight.value = self._lead(key, compute, is_negative, s)
+                return flight.value
+            except BaseException:
+                flight.failed = True
+                raise
+            finally:
+                flight.done.set()
+                with self._lock:
+                    self._flights.pop(key, None)
+
+    def report(self) -> dict:
+        with self._lock:
+            lookups = self.stats["local_hits"] + self.stats["shared_hits"] + self.stats["misses"]
+            hits = self.stats["local_hits"] + self.stats["shared_hits"]
+            return {
+                "namespace": self.namespace,
+                "version": f"{CACHE_VERSION}.{self.version}",
+                "shared_tier": self.shared.name if self.shared else None,
+                "local_items": len(self._local),
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                **self.stats,
+            }
+
+    # ── Internals ──────────────────────────────────────────────
+
+    def _lookup(self, key: str, s=None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._local.move_to_end(key)
+                    self.stats["local_hits"] += 1
+                    if s:
+                        s.set(tier="local")
+                    return entry[1]
+                del self._local[key]
+
+        raw = self._shared_call("get", key)
+        if raw is not None:
+            try:
+                envelope = json.loads(raw)
+            except ValueError:
+                envelope = None
+            if envelope is not None:
+                ttl = self.negative_ttl if envelope.get("n") else self.ttl
+                self._store_local(key, envelope["v"], min(ttl, max(0.0, envelope.get("e", now + ttl) - now)))
+                with self._lock:
+                    self.stats["shared_hits"] += 1
+                if s:
+                    s.set(tier="shared")
+                return envelope["v"]
+
+        with self._lock:
+            self.stats["misses"] += 1
+        if s:
+            s.set(tier="miss")
+        return _MISS
+
+    def _lead(self, key: str, compute: Callable[[], Any], is_negative: Callable[[Any], bool], s) -> Any:
+        """This worker's first miss: coordinate with other workers, then compute."""
+        leased = self._shared_call("acquire_lease", key, CACHE_LOCK_TTL_SECONDS)
+        if leased is False:
+            # Another worker is computing it: wait for its result
+            with self._lock:
+                self.stats["lease_waits"] += 1
+            s.set(lease="waited")
+            give_up = time.monotonic() + self._wait_budget()
+            while time.monotonic() < give_up and not self._shared_down():
+                time.sleep(CACHE_POLL_SECONDS)
+                if self._shared_call("get", key) is not None:
+                    value = self._lookup(key, s)
+                    if value is not _MISS:
+                        return value
+            s.set(lease="timed_out")
+        elif leased and self._shared_call("get", key) is not None:
+            # Stored by a worker that finished between our lookup and the lease
+            value = self._lookup(key, s)
+            if value is not _MISS:
+                self._shared_call("release_lease", key)
+                return value
+        try:
+            return self._compute_and_store(key, compute, is_negative)
+        finally:
+            if leased:
+                self._shared_call("release_lease", key)
+
+    def _compute_and_store(self, key: str, compute: Callable[[], Any], is_negative: Callable[[Any], bool]) -> Any:
+        value = compute()
+        self._store(key, value, is_negative(value))
+        return value
+
+    def _store(self, key: str, value: Any, negative: bool) -> None:
+        ttl = self.negative_ttl if negative else self.ttl
+        if ttl <= 0:
+            return
+        if negative:
+            with self._lock:
+                self.stats["negative_stores"] += 1
+        self._store_local(key, value, ttl)
+        envelope = {"v": value, "e": time.time() + ttl}
+        if negative:
+            envelope["n"] = 1
+        self._shared_call("set", key, json.dumps(envelope, separators=(",", ":")), ttl)
+
+    def _store_local(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._local[key] = (time.time() + ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_items:
+                self._local.popitem(last=False)
+
+    def _wait_budget(self) -> float:
+        left = remaining()
+        return CACHE_LOCK_WAIT_SECONDS if left is None else min(CACHE_LOCK_WAIT_SECONDS, left)
+
+    def _shared_down(self) -> bool:
+        return time.monotonic() < self._shared_down_until
+
+    def _shared_call(self, method: str, *args):
+        """A shared-tier call; None when there is no (working) shared tier."""
+        if self.shared is None or self._shared_down():
+            return None
+        try:
+            return getattr(self.shared, method)(*args)
+        except self.shared.errors as e:
+            self._shared_down_until = time.monotonic() + CACHE_SHARED_RETRY_SECONDS
+            with self._lock:
+                self.stats["shared_errors"] += 1
+            logger.warning(
+                f"Shared cache ({self.shared.name}) {method} failed, local only for "
+                f"{CACHE_SHARED_RETRY_SECONDS:.0f}s: {e}"
+            )
+            return None
+
+
+_caches: dict[str, TwoTierCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str, version: str, **options) -> TwoTierCache:
+    """The process-wide cache for `namespace` at `version` (created on first use)."""
+    cache = _caches.get(f"{namespace}:{version}")
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(f"{namespace}:{version}")
+            if cache is None:
+                cache = _caches[f"{namespace}:{version}"] = TwoTierCache(
+                    namespace, version, shared=get_shared_tier(), **options
+                )
+    return cache
+
+
+def cache_report() -> list[dict]:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.report() for cache in caches]
@@ -0,0 +1,246 @@
+"""
+Capture — records real traffic, anonymized, so it can be replayed against
+another build (benchmarks/replay.py).
+
+With CAPTURE_ENABLED, a sample (CAPTURE_SAMPLE_RATE) of the requests to
+CAPTURE_PATHS is written as compact JSONL, one file per worker process
+under CAPTURE_DIR, two kinds of line:
+
+    {"kind":"request","rid":"…","ts":1760000000.123,"path":"/explain",
+     "body":{…},"status":200,"ms":812.4}
+    {"kind":"llm","rid":"…","ts":…,"call_site":"explanation","key":"…",
+     "max_tokens":900,"prompt":"…","response":"…","finish_reason":"stop",
+     "ms":640.2,"stream":false}
+
+- Request bodies come from api.middleware.capture; LLM request/response
+  pairs from llm_client, for sampled requests only, tagged with the
+  request's ID so a replay can answer each call with what the model said
+  the first time. `ts` is the arrival (request) or start (llm) time.
+- Anonymized before anything is written: learner and cohort IDs become
+  salted hashes (stable across the workers sharing CAPTURE_DIR, so learner
+  memory still builds up on replay); e-mail addresses, URLs, IP addresses
+  and long digit runs in any text — doubts, code, answers, prompts,
+  responses — become placeholders. Request headers, client addresses and
+  API keys are never recorded.
+- `key` is a hash of the anonymized prompt: what a replay matches on first.
+  CAPTURE_PROMPTS=false keeps only the key, not the prompt text.
+- Lines are buffered and appended every CAPTURE_FLUSH_SECONDS (and at
+  shutdown); a file rolls over after CAPTURE_MAX_FILE_MB.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional
+
+from memory.layout import MEMORY_DIR
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:  # optional — stdlib json is fine, just slower
+    def _dumps(record: dict) -> bytes:
+        return json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_ENABLED        = os.getenv("CAPTURE_ENABLED", "false").lower() == "true"
+CAPTURE_DIR            = Path(os.getenv("CAPTURE_DIR", str(MEMORY_DIR / "capture")))
+CAPTURE_PATHS          = os.getenv("CAPTURE_PATHS", "/explain,/practice,/practice/feedback")
+CAPTURE_SAMPLE_RATE    = float(os.getenv("CAPTURE_SAMPLE_RATE", "1.0"))
+CAPTURE_PROMPTS        = os.getenv("CAPTURE_PROMPTS", "true").lower() == "true"
+# Bigger request bodies are passed through but not recorded
+CAPTURE_MAX_BODY_BYTES = int(os.getenv("CAPTURE_MAX_BODY_BYTES", "262144"))
+CAPTURE_FLUSH_SECONDS  = float(os.getenv("CAPTURE_FLUSH_SECONDS", "5"))
+CAPTURE_MAX_FILE_MB    = float(os.getenv("CAPTURE_MAX_FILE_MB", "64"))
+
+_ID_FIELDS = ("learner_id", "cohort_id")
+_SCRUBBERS = (
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "<email>"),
+    (re.compile(r"\bhttps?://[^\s\"'<>)]+"), "<url>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}\b"), "<ip>"),
+    # Phone, card and account numbers (ten or more digits, maybe spaced)
+    (re.compile(r"(?<![\w.])\+?\d(?:[ -]?\d){9,}(?![\w.])"), "<number>"),
+)
+
+# The request ID of the sampled request being served, else None
+_capturing: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("capture_request", default=None)
+
+
+def capture_paths() -> frozenset[str]:
+    return frozenset(p.strip().rstrip("/") for p in CAPTURE_PATHS.split(",") if p.strip())
+
+
+# ── Anonymization ──────────────────────────────────────────────
+
+_salt: Optional[bytes] = None
+_salt_lock = threading.Lock()
+
+
+def _capture_salt() -> bytes:
+    """
+    CAPTURE_SALT, else a random salt kept in CAPTURE_DIR/.salt — shared by
+    every worker writing there, and never part of a capture file.
+    """
+    global _salt
+    if _salt is None:
+        with _salt_lock:
+            if _salt is None:
+                configured = os.getenv("CAPTURE_SALT")
+                if configured:
+                    _salt = configured.encode("utf-8")
+                else:
+                    path = CAPTURE_DIR / ".salt"
+                    CAPTURE_DIR.mkdir(parents=True, exist_ok=True)
+                    try:
+                        with open(path, "x") as f:
+                            f.write(secrets.token_hex(16))
+                    except FileExistsError:
+                        pass
+                    _salt = path.read_text().strip().encode("utf-8")
+    return _salt
+
+
+def pseudonym(value: str) -> str:
+    return "anon_" + hashlib.sha256(_capture_salt() + value.encode("utf-8")).hexdigest()[:12]
+
+
+def scrub_text(text: str) -> str:
+    for pattern, placeholder in _SCRUBBERS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+def anonymize(value: Any, field: Optional[str] = None) -> Any:
+    """A copy of a JSON body with IDs pseudonymized and free text scrubbed."""
+    if isinstance(value, dict):
+        return {k: anonymize(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [anonymize(v, field) for v in value]
+    if isinstance(value, str):
+        return pseudonym(value) if field in _ID_FIELDS else scrub_text(value)
+    return value
+
+
+def prompt_key(prompt: str) -> str:
+    """Replay's lookup key for a prompt that has already been scrubbed."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+# ── Recorder ───────────────────────────────────────────────────
+
+class CaptureRecorder:
+    def __init__(self, directory: Path = CAPTURE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pending: list[bytes] = []
+        self._path: Optional[Path] = None
+        self._file_bytes = 0
+        self._last_flush = time.monotonic()
+        self.requests = 0
+        self.llm_calls = 0
+
+    def sampled(self, request_id: str) -> bool:
+        """Same answer for the same ID, so a retried request is in or out consistently."""
+        if CAPTURE_SAMPLE_RATE >= 1:
+            return True
+        return zlib.crc32(request_id.encode("utf-8")) / 0xFFFFFFFF < CAPTURE_SAMPLE_RATE
+
+    def record_request(self, request_id: str, path: str, started: float, body: dict, status: int, ms: float) -> None:
+        self.requests += 1
+        self._append({
+            "kind": "request", "rid": request_id, "ts": round(started, 3), "path": path,
+            "body": anonymize(body), "status": status, "ms": round(ms, 1),
+        })
+
+    def record_llm(
+        self, request_id: str, call_site: str, started: float, prompt: str, max_tokens: int,
+        response: str, finish_reason: Optional[str], ms: float, stream: bool,
+    ) -> None:
+        self.llm_calls += 1
+        prompt = scrub_text(prompt)
+        record = {
+            "kind": "llm", "rid": request_id, "ts": round(started, 3), "call_site": call_site,
+            "key": prompt_key(prompt), "max_tokens": max_tokens,
+            "response": scrub_text(response), "finish_reason": finish_reason,
+            "ms": round(ms, 1), "stream": stream,
+        }
+        if CAPTURE_PROMPTS:
+            record["prompt"] = prompt
+        self._append(record)
+
+    def _append(self, record: dict) -> None:
+        line = _dumps(record) + b"\n"
+        with self._lock:
+            self._pending.append(line)
+            due = time.monotonic() - self._last_flush >= CAPTURE_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Append pending lines to the current file; returns how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+            try:
+                if self._path is None or self._file_bytes >= CAPTURE_MAX_FILE_MB * 1024 * 1024:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    stamp = time.strftime("%Y%m%d-%H%M%S")
+                    self._path = self.directory / f"capture-{stamp}-{os.getpid()}.jsonl"
+                    self._file_bytes = 0
+                data = b"".join(pending)
+                with open(self._path, "ab") as f:
+                    f.write(data)
+                self._file_bytes += len(data)
+            except OSError as e:
+                # Capture is best effort: never fail (or slow down) a request over it
+                logger.warning(f"Capture write failed, dropped {len(pending)} line(s): {e}")
+                return 0
+        return len(pending)
+
+
+_recorder: Optional[CaptureRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_capture_recorder() -> CaptureRecorder:
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = CaptureRecorder()
+    return _recorder
+
+
+@contextmanager
+def capture_scope(request_id: str):
+    """Marks the current request as captured, so its LLM calls are recorded too."""
+    token = _capturing.set(request_id)
+    try:
+        yield
+    finally:
+        _capturing.reset(token)
+
+
+def capture_llm(
+    call_site: str, started: float, prompt: str, max_tokens: int,
+    response: str, finish_reason: Optional[str], ms: float, stream: bool = False,
+) -> None:
+    """Called by llm_client after every call; records it if the request is being captured."""
+    request_id = _capturing.get()
+    if request_id is None:
+        return
+    get_capture_recorder().record_llm(
+        request_id, call_site, started, prompt, max_tokens, response, finish_reason, ms, stream,
+    )
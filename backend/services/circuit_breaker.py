@@ -0,0 +1,154 @@
+"""
+Circuit Breaker — stops sending calls to a failing or crawling LLM provider.
+
+- closed:    calls go through; outcomes land in a rolling window of the last
+             BREAKER_WINDOW_SECONDS. With at least BREAKER_MIN_CALLS in it,
+             an error rate >= BREAKER_ERROR_RATE or a slow-call rate (calls
+             over BREAKER_SLOW_CALL_MS) >= BREAKER_SLOW_RATE trips it open.
+- open:      calls fail immediately (no network, no slot, no timeout) for
+             BREAKER_OPEN_SECONDS, so callers fall back in microseconds and
+             p99 stays bounded for the length of the incident.
+- half_open: up to BREAKER_HALF_OPEN_PROBES calls at a time are let through
+             as probes; BREAKER_HALF_OPEN_SUCCESSES good ones in a row close
+             it, any failed or slow one re-opens it (for twice as long, up to
+             BREAKER_MAX_OPEN_SECONDS).
+
+State is per worker: each process learns about the incident on its own.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+BREAKER_ENABLED             = os.getenv("BREAKER_ENABLED", "true").lower() == "true"
+BREAKER_WINDOW_SECONDS      = float(os.getenv("BREAKER_WINDOW_SECONDS", "30"))
+BREAKER_MIN_CALLS           = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE          = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_CALL_MS        = float(os.getenv("BREAKER_SLOW_CALL_MS", "15000"))
+BREAKER_SLOW_RATE           = float(os.getenv("BREAKER_SLOW_RATE", "0.5"))
+BREAKER_OPEN_SECONDS        = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+BREAKER_MAX_OPEN_SECONDS    = float(os.getenv("BREAKER_MAX_OPEN_SECONDS", "120"))
+BREAKER_HALF_OPEN_PROBES    = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+BREAKER_HALF_OPEN_SUCCESSES = int(os.getenv("BREAKER_HALF_OPEN_SUCCESSES", "2"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit '{name}' is open (next probe in {retry_in:.1f}s)")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._window: deque[tuple[float, bool, bool]] = deque()  # (at, failed, slow)
+        self._opened_at = 0.0
+        self._open_for = BREAKER_OPEN_SECONDS
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.stats = {"trips": 0, "rejected": 0, "last_trip_reason": None}
+
+    # ── Call protocol ──────────────────────────────────────────
+
+    def before_call(self) -> None:
+        """Raise CircuitOpen if the call must not go out now."""
+        if not BREAKER_ENABLED:
+            return
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = time.monotonic()
+            if self._state == OPEN:
+                remaining = self._opened_at + self._open_for - now
+                if remaining > 0:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpen(self.name, remaining)
+                self._state = HALF_OPEN
+                self._probe_successes = 0
+                logger.info(f"Circuit '{self.name}' half-open: probing")
+            if self._probes_in_flight >= BREAKER_HALF_OPEN_PROBES:
+                self.stats["rejected"] += 1
+                raise CircuitOpen(self.name, 0.0)
+            self._probes_in_flight += 1
+
+    def record(self, failed: bool, latency_ms: float) -> None:
+        if not BREAKER_ENABLED:
+            return
+        slow = latency_ms >= BREAKER_SLOW_CALL_MS
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or slow:
+                    self._trip(now, "probe failed" if failed else f"probe took {latency_ms:.0f}ms",
+                               self._open_for * 2)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= BREAKER_HALF_OPEN_SUCCESSES:
+                    self._state = CLOSED
+                    self._window.clear()
+                    self._open_for = BREAKER_OPEN_SECONDS
+                    logger.info(f"Circuit '{self.name}' closed: provider recovered")
+                return
+            if self._state == OPEN:
+                return  # a call that started before the trip
+
+            self._window.append((now, failed, slow))
+            while self._window and self._window[0][0] < now - BREAKER_WINDOW_SECONDS:
+                self._window.popleft()
+            calls = len(self._window)
+            if calls < BREAKER_MIN_CALLS:
+                return
+            error_rate = sum(1 for _, f, _ in self._window if f) / calls
+            slow_rate = sum(1 for _, _, s in self._window if s) / calls
+            if error_rate >= BREAKER_ERROR_RATE:
+                self._trip(now, f"error rate {error_rate:.0%} over {calls} calls", BREAKER_OPEN_SECONDS)
+            elif slow_rate >= BREAKER_SLOW_RATE:
+                self._trip(now, f"slow-call rate {slow_rate:.0%} over {calls} calls", BREAKER_OPEN_SECONDS)
+
+    def release(self) -> None:
+        """End a call that says nothing about the provider (the request ran out of time)."""
+        if not BREAKER_ENABLED:
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _trip(self, now: float, reason: str, open_for: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._open_for = min(open_for, BREAKER_MAX_OPEN_SECONDS)
+        self._window.clear()
+        self._probes_in_flight = 0
+        self.stats["trips"] += 1
+        self.stats["last_trip_reason"] = reason
+        logger.warning(f"Circuit '{self.name}' opened for {self._open_for:.0f}s: {reason}")
+
+    # ── Introspection ──────────────────────────────────────────
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._opened_at + self._open_for:
+                return HALF_OPEN  # the next call will probe
+            return self._state
+
+    def report(self) -> dict:
+        state = self.state
+        with self._lock:
+            return {"name": self.name, "state": state, "window_calls": len(self._window), **self.stats}
+
+
+_llm_breaker = CircuitBreaker("llm")
+
+
+def get_llm_breaker() -> CircuitBreaker:
+    return _llm_breaker
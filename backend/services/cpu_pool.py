@@ -0,0 +1,315 @@
+"""
+CPU Pool — runs the CPU-heavy steps of a request off the request threads.
+
+Pipelines run in asyncio.to_thread workers, so CPU work does not block the
+event loop outright, but pure-Python CPU work holds the GIL: a few big
+snippets being cut at once slow down every other request in the worker —
+the event loop included. Registered tasks
+run on a pool started in main.py's lifespan instead:
+
+- process tier: a ProcessPoolExecutor (CPU_POOL_WORKERS, default cores - 1)
+  for pure-Python work, which then really runs in parallel. Arguments and
+  results are pickled; the function is sent by module and name and
+  imported in the child.
+- thread tier: a ThreadPoolExecutor (CPU_POOL_THREADS) for work that
+  releases the GIL (NumPy), where copying arrays to another process would
+  cost more than it saves. It bounds how much of it runs at once.
+
+CPU_POOL_MODE: process (both tiers), thread (both tiers on threads),
+inline (the caller's thread, as before — for tests and debugging), or auto
+(process on a multi-core host, else inline). Tasks also run inline before
+startup and after shutdown, so scripts and benchmarks need no pool.
+
+Backpressure: at most CPU_POOL_MAX_PENDING tasks per tier are queued or
+running. Past that, callers wait for room — up to
+CPU_POOL_QUEUE_TIMEOUT_SECONDS, or less when the request deadline is
+closer — and then run the task themselves (counted as overflow) rather
+than fail the request. If a child process dies, the process pool is
+recreated (a few times, then process tasks move to the thread tier) and
+the task runs inline.
+
+Per task: calls, where they ran, queue and run time (GET /metrics/cpu-pool).
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Any, Callable, Optional
+
+from services.deadline import remaining
+
+logger = logging.getLogger(__name__)
+
+CPU_POOL_MODE                  = os.getenv("CPU_POOL_MODE", "auto").lower()
+# 0 = number of cores - 1 (at least 1)
+CPU_POOL_WORKERS               = int(os.getenv("CPU_POOL_WORKERS", "0"))
+# 0 = number of cores
+CPU_POOL_THREADS               = int(os.getenv("CPU_POOL_THREADS", "0"))
+# Per tier; 0 = 4 x the tier's workers
+CPU_POOL_MAX_PENDING           = int(os.getenv("CPU_POOL_MAX_PENDING", "0"))
+CPU_POOL_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CPU_POOL_QUEUE_TIMEOUT_SECONDS", "2"))
+CPU_POOL_START_METHOD          = os.getenv("CPU_POOL_START_METHOD", "spawn")
+
+TIERS = ("process", "thread")
+# Child crashes survived before process tasks fall back to the thread tier
+_MAX_RESTARTS = 3
+
+# name -> (tier, module, qualname)
+_registry: dict[str, tuple[str, str, str]] = {}
+
+
+def cpu_task(tier: str = "process", name: Optional[str] = None):
+    """
+    Register a module-level function as a CPU task; call it with run_cpu.
+    The function itself is returned unchanged (so it still pickles by
+    reference and can be called directly).
+    """
+    if tier not in TIERS:
+        raise ValueError(f"Unknown CPU task tier '{tier}' (expected one of {TIERS})")
+
+    def register(fn: Callable) -> Callable:
+        task_name = name or fn.__name__
+        _registry[task_name] = (tier, fn.__module__, fn.__qualname__)
+        fn.cpu_task_name = task_name
+        return fn
+
+    return register
+
+
+def run_cpu(fn: Callable, *args: Any) -> Any:
+    """Run a registered task on its tier of the pool (inline when there is no pool)."""
+    pool = _pool
+    if pool is None:
+        return _run_inline(fn, args, "inline")
+    return pool.run(fn, args)
+
+
+# ── Task stats ─────────────────────────────────────────────────
+
+_stats: dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(name: str, where: str, queue_seconds: float, run_seconds: float, failed: bool = False) -> None:
+    with _stats_lock:
+        s = _stats.get(name)
+        if s is None:
+            s = _stats[name] = {
+                "calls": 0, "pooled": 0, "inline": 0, "overflow": 0, "errors": 0,
+                "queue_ms_total": 0.0, "queue_ms_max": 0.0, "run_ms_total": 0.0, "run_ms_max": 0.0,
+            }
+        s["calls"] += 1
+        s[where] += 1
+        s["errors"] += failed
+        s["queue_ms_total"] += queue_seconds * 1000
+        s["queue_ms_max"] = max(s["queue_ms_max"], queue_seconds * 1000)
+        s["run_ms_total"] += run_seconds * 1000
+        s["run_ms_max"] = max(s["run_ms_max"], run_seconds * 1000)
+
+
+def _run_inline(fn: Callable, args: tuple, where: str, queue_seconds: float = 0.0) -> Any:
+    started = time.perf_counter()
+    try:
+        result = fn(*args)
+    except Exception:
+        _record(fn.cpu_task_name, where, queue_seconds, time.perf_counter() - started, failed=True)
+        raise
+    _record(fn.cpu_task_name, where, queue_seconds, time.perf_counter() - started)
+    return result
+
+
+def _timed_call(fn: Callable, args: tuple) -> tuple[Any, float]:
+    """Runs on a pool worker: the result plus how long the task itself took."""
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+def _call_by_name(module: str, qualname: str, args: tuple) -> tuple[Any, float]:
+    """Runs in a child process, which imports the task's module on first use."""
+    fn: Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        fn = getattr(fn, part)
+    return _timed_call(fn, args)
+
+
+def _init_child(modules: list[str]) -> None:
+    # Import the task modules up front, so no request pays for it
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ── Pool ───────────────────────────────────────────────────────
+
+class CpuPool:
+    def __init__(
+        self,
+        mode: str,
+        workers: int,
+        threads: int,
+        max_pending: int = CPU_POOL_MAX_PENDING,
+        queue_timeout: float = CPU_POOL_QUEUE_TIMEOUT_SECONDS,
+        start_method: str = CPU_POOL_START_METHOD,
+    ):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"CpuPool mode must be 'process' or 'thread', not '{mode}'")
+        self.mode = mode
+        self.workers = workers
+        self.threads = threads
+        self.queue_timeout = queue_timeout
+        self.start_method = start_method
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._threads = ThreadPoolExecutor(threads, thread_name_prefix="cpu-pool")
+        self._processes = self._new_process_pool() if mode == "process" else None
+
+        sizes = {"process": workers if mode == "process" else threads, "thread": threads}
+        self.max_pending = {tier: max_pending or 4 * sizes[tier] for tier in TIERS}
+        self._slots = {tier: threading.BoundedSemaphore(self.max_pending[tier]) for tier in TIERS}
+        self._pending = dict.fromkeys(TIERS, 0)
+
+    def _new_process_pool(self) -> ProcessPoolExecutor:
+        modules = sorted({module for tier, module, _ in _registry.values() if tier == "process"})
+        return ProcessPoolExecutor(
+            self.workers, mp_context=get_context(self.start_method),
+            initializer=_init_child, initargs=(modules,),
+        )
+
+    def warm_up(self) -> int:
+        """Start every child process now (they are otherwise started on first use). Blocking."""
+        if self._processes is None:
+            return 0
+        return len({f.result() for f in [self._processes.submit(_ping) for _ in range(self.workers)]})
+
+    def run(self, fn: Callable, args: tuple) -> Any:
+        name = fn.cpu_task_name
+        tier = _registry[name][0]
+        queued = time.perf_counter()
+
+        wait = self.queue_timeout
+        budget = remaining()
+        if budget is not None:
+            wait = max(0.0, min(wait, budget))
+        if not self._slots[tier].acquire(timeout=wait):
+            logger.warning(f"CPU pool {tier} tier full ({self.max_pending[tier]} pending); running '{name}' inline")
+            return _run_inline(fn, args, "overflow", time.perf_counter() - queued)
+
+        with self._lock:
+            self._pending[tier] += 1
+        try:
+            processes = self._processes
+            try:
+                if tier == "process" and processes is not None:
+                    _, module, qualname = _registry[name]
+                    future = processes.submit(_call_by_name, module, qualname, args)
+                else:
+                    future = self._threads.submit(_timed_call, fn, args)
+                result, run_seconds = future.result()
+            except BrokenProcessPool:
+                self._restart_processes(processes)
+                return _run_inline(fn, args, "overflow", time.perf_counter() - queued)
+            except Exception:
+                _record(name, "pooled", 0.0, time.perf_counter() - queued, failed=True)
+                raise
+        finally:
+            with self._lock:
+                self._pending[tier] -= 1
+            self._slots[tier].release()
+
+        _record(name, "pooled", max(0.0, time.perf_counter() - queued - run_seconds), run_seconds)
+        return result
+
+    def _restart_processes(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._processes is not broken:
+                return  # another thread already replaced it
+            if self.restarts >= _MAX_RESTARTS:
+                logger.error(f"CPU pool children keep dying ({self.restarts} restarts); process tasks now run on threads")
+                self._processes = None
+            else:
+                logger.error("CPU pool child process died; restarting the process pool")
+                self._processes = self._new_process_pool()
+                self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=True, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=True, cancel_futures=True)
+
+    def describe(self) -> str:
+        if self.mode == "process":
+            return f"process, {self.workers} worker(s) + {self.threads} thread(s)"
+        return f"thread, {self.threads} thread(s)"
+
+    def pending(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._pending)
+
+
+# ── Lifecycle ──────────────────────────────────────────────────
+
+_pool: Optional[CpuPool] = None
+
+
+def start_cpu_pool() -> Optional[CpuPool]:
+    """Create the pool for CPU_POOL_MODE (None for inline). Called once, from lifespan."""
+    global _pool
+    cores = os.cpu_count() or 1
+    mode = CPU_POOL_MODE
+    if mode == "auto":
+        mode = "process" if cores > 1 else "inline"
+    if mode == "inline":
+        return None
+    _pool = CpuPool(
+        mode,
+        workers=CPU_POOL_WORKERS or max(1, cores - 1),
+        threads=CPU_POOL_THREADS or cores,
+    )
+    return _pool
+
+
+def stop_cpu_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def get_cpu_pool() -> Optional[CpuPool]:
+    return _pool
+
+
+def cpu_pool_report() -> dict:
+    pool = _pool
+    with _stats_lock:
+        tasks = [
+            {
+                "name": name,
+                "tier": _registry[name][0],
+                **{k: v for k, v in s.items() if not k.endswith("_total")},
+                "queue_ms_avg": round(s["queue_ms_total"] / s["calls"], 3) if s["calls"] else 0.0,
+                "run_ms_avg": round(s["run_ms_total"] / s["calls"], 3) if s["calls"] else 0.0,
+            }
+            for name, s in sorted(_stats.items())
+        ]
+    for task in tasks:
+        task["queue_ms_max"] = round(task["queue_ms_max"], 3)
+        task["run_ms_max"] = round(task["run_ms_max"], 3)
+    return {
+        "mode": pool.mode if pool else "inline",
+        "workers": pool.workers if pool and pool.mode == "process" else 0,
+        "threads": pool.threads if pool else 0,
+        "max_pending": pool.max_pending if pool else {},
+        "pending": pool.pending() if pool else {},
+        "restarts": pool.restarts if pool else 0,
+        "tasks": tasks,
+    }
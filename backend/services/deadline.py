@@ -0,0 +1,116 @@
+"""
+Deadline — a per-request latency budget that every stage can see.
+
+The deadline middleware (api/middleware/deadline.py) sets an absolute
+deadline for each request: the caller's X-Request-Timeout-Ms, else the
+endpoint's DEADLINE_ENDPOINT_SECONDS entry, else DEADLINE_DEFAULT_SECONDS.
+It lives in a contextvar, so it follows the request into asyncio.to_thread
+workers without any signature carrying it.
+
+- stage(share): a nested, tighter deadline for one stage (e.g. diagnosis
+  may use at most 40% of what's left, so explanation still gets a turn).
+- remaining(): seconds left; call_llm turns it into the Bedrock read timeout.
+- has_budget(seconds): optional work (memory write, index add, truncation
+  retry) runs only when at least that much is left.
+- The request's cancel flag is set when the HTTP client disconnects;
+  remaining() then reports 0 so no further LLM work starts.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+DEADLINE_DEFAULT_SECONDS  = float(os.getenv("DEADLINE_DEFAULT_SECONDS", "30"))
+DEADLINE_MAX_SECONDS      = float(os.getenv("DEADLINE_MAX_SECONDS", "120"))
+# "/explain=25,/explain/batch=90" — longest matching path prefix wins
+DEADLINE_ENDPOINT_SECONDS = os.getenv(
+    "DEADLINE_ENDPOINT_SECONDS", "/explain=25,/explain/batch=90,/practice=20"
+)
+# Skip optional stages when less than this is left
+DEADLINE_OPTIONAL_MIN_SECONDS = float(os.getenv("DEADLINE_OPTIONAL_MIN_SECONDS", "1.0"))
+
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+_ENDPOINT_BUDGETS = sorted(
+    (
+        (path.strip(), float(seconds))
+        for path, _, seconds in (item.partition("=") for item in DEADLINE_ENDPOINT_SECONDS.split(","))
+        if path.strip() and seconds.strip()
+    ),
+    key=lambda item: -len(item[0]),
+)
+
+
+class Deadline:
+    __slots__ = ("at", "cancelled")
+
+    def __init__(self, at: float, cancelled: threading.Event):
+        self.at = at  # time.monotonic()
+        self.cancelled = cancelled
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+
+def budget_for(path: str, header_value: Optional[str]) -> float:
+    """Seconds this request may take: header (capped) > endpoint default > global default."""
+    if header_value:
+        try:
+            requested = float(header_value) / 1000
+            if requested > 0:
+                return min(requested, DEADLINE_MAX_SECONDS)
+        except ValueError:
+            pass
+    for prefix, seconds in _ENDPOINT_BUDGETS:
+        if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+            return seconds
+    return DEADLINE_DEFAULT_SECONDS
+
+
+@contextmanager
+def deadline_scope(seconds: float, cancelled: Optional[threading.Event] = None):
+    """Start a request deadline `seconds` from now."""
+    token = _current.set(Deadline(time.monotonic() + seconds, cancelled or threading.Event()))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(share: float):
+    """Narrow the deadline to `share` of the remaining budget for one stage."""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    now = time.monotonic()
+    token = _current.set(Deadline(now + max(0.0, current.at - now) * share, current.cancelled))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left (0 once cancelled), or None outside a request."""
+    current = _current.get()
+    if current is None:
+        return None
+    if current.cancelled.is_set():
+        return 0.0
+    return max(0.0, current.at - time.monotonic())
+
+
+def cancelled() -> bool:
+    current = _current.get()
+    return current is not None and current.cancelled.is_set()
+
+
+def has_budget(seconds: float = DEADLINE_OPTIONAL_MIN_SECONDS) -> bool:
+    """Whether an optional stage needing ~`seconds` should still run."""
+    left = remaining()
+    return left is None or left >= seconds
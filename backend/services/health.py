@@ -0,0 +1,128 @@
+"""
+Health — dependency checks behind /health/ready.
+
+Readiness = warm-up finished (services.warmup) + live dependency checks,
+each reported with its latency:
+- sqlite:     SELECT 1 on the learner index
+- memory_dir: MEMORY_DIR exists and is writable
+- llm:        a 1-token call to the configured model (HEALTH_PROBE_LLM=true).
+              Cached for HEALTH_PROBE_TTL_SECONDS so frequent load-balancer
+              polls don't turn into a stream of Bedrock calls.
+
+- llm_circuit: the LLM circuit breaker's state (services.circuit_breaker);
+              anything but closed means answers are being degraded
+
+A failing llm probe or an open circuit marks the pod "degraded" but keeps it ready: a slow or
+erroring Bedrock region affects every pod alike, and pulling them all out
+of rotation would only turn degraded into down.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+from services.circuit_breaker import CLOSED, get_llm_breaker
+from services.warmup import WARMUP_ON_STARTUP, get_warmup_report, is_warmed_up, probe_llm
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_LLM         = os.getenv("HEALTH_PROBE_LLM", "false").lower() == "true"
+HEALTH_PROBE_TTL_SECONDS = float(os.getenv("HEALTH_PROBE_TTL_SECONDS", "30"))
+
+_probe_cache: dict = {}
+_probe_lock = threading.Lock()
+
+
+def _check_sqlite() -> str:
+    from memory.sqlite_store import get_connection
+
+    get_connection().execute("SELECT 1").fetchone()
+    return "ok"
+
+
+def _check_memory_dir() -> str:
+    from memory.layout import MEMORY_DIR
+
+    if not MEMORY_DIR.is_dir():
+        raise RuntimeError(f"{MEMORY_DIR} does not exist")
+    if not os.access(MEMORY_DIR, os.W_OK):
+        raise RuntimeError(f"{MEMORY_DIR} is not writable")
+    return "writable"
+
+
+# name -> (check, required for readiness)
+_CHECKS: dict[str, tuple[Callable[[], str], bool]] = {
+    "sqlite":     (_check_sqlite, True),
+    "memory_dir": (_check_memory_dir, True),
+}
+
+
+def _timed(check: Callable[[], str]) -> dict:
+    started = time.perf_counter()
+    try:
+        detail, ok = check(), True
+    except Exception as e:
+        detail, ok = f"{type(e).__name__}: {e}", False
+    return {
+        "ok": ok,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "detail": detail,
+        "checked_at": time.time(),
+    }
+
+
+def _cached_llm_probe() -> dict:
+    with _probe_lock:
+        cached = _probe_cache.get("llm")
+        if cached and time.time() - cached["checked_at"] < HEALTH_PROBE_TTL_SECONDS:
+            return cached
+        result = _timed(probe_llm)
+        if not result["ok"]:
+            logger.warning(f"LLM health probe failed: {result['detail']}")
+        _probe_cache["llm"] = result
+        return result
+
+
+def readiness_report() -> dict:
+    """
+    status: warming_up | ready | degraded | unavailable
+    ready:  whether the load balancer should send traffic here
+    """
+    warmup = get_warmup_report()
+    warmed = is_warmed_up() if WARMUP_ON_STARTUP else True
+
+    dependencies = {}
+    required_ok = True
+    for name, (check, required) in _CHECKS.items():
+        dependencies[name] = _timed(check)
+        required_ok &= dependencies[name]["ok"] or not required
+
+    optional_ok = True
+    if HEALTH_PROBE_LLM:
+        dependencies["llm"] = _cached_llm_probe()
+        optional_ok = dependencies["llm"]["ok"]
+
+    breaker = get_llm_breaker().report()
+    dependencies["llm_circuit"] = {
+        "ok": breaker["state"] == CLOSED,
+        "latency_ms": 0.0,
+        "detail": f"{breaker['state']} ({breaker['trips']} trips, last: {breaker['last_trip_reason'] or 'none'})",
+        "checked_at": time.time(),
+    }
+    optional_ok &= dependencies["llm_circuit"]["ok"]
+
+    if not warmed:
+        status = "warming_up" if warmup["state"] != "done" else "unavailable"
+    elif not required_ok:
+        status = "unavailable"
+    else:
+        status = "ready" if optional_ok else "degraded"
+
+    return {
+        "status": status,
+        "ready": status in ("ready", "degraded"),
+        "warmup": warmup,
+        "dependencies": dependencies,
+    }
@@ -0,0 +1,76 @@
+"""
+JSON Stream — incremental parser for a JSON array arriving in pieces.
+
+Feed it LLM output deltas as they stream in; it hands back the source text
+of each element of the first top-level array as soon as that element's
+closing brace arrives, so callers can act on item 1 while item 2 is still
+being generated. Anything before the array (a code fence, a wrapping
+`{"questions": `) and after it is ignored, like _extract_json does for
+complete responses.
+
+Only the structure is tracked (strings, escapes, nesting depth); elements
+are not decoded here — json.loads on an emitted element is the caller's
+validation step.
+"""
+
+
+class JsonArrayStream:
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0            # next character to scan
+        self._depth = 0          # nesting inside the array; 0 = between elements
+        self._in_string = False
+        self._escaped = False
+        self._element_start: int | None = None
+        self.started = False     # the array's '[' has been seen
+        self.finished = False    # ...and its closing ']'
+
+    @property
+    def partial(self) -> bool:
+        """An element was opened but never closed (e.g. the output was cut off)."""
+        return self._element_start is not None
+
+    def feed(self, chunk: str) -> list[str]:
+        """Scan `chunk`; return the text of every element completed by it."""
+        if self.finished:
+            return []
+        self._buffer += chunk
+        completed: list[str] = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif not self.started:
+                if ch == "[":
+                    self.started = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._element_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:  # the array's own ']'
+                    self.finished = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._element_start is not None:
+                    completed.append(buffer[self._element_start:i + 1])
+                    self._element_start = None
+            i += 1
+
+        # Drop what no future element can need
+        keep_from = self._element_start if self._element_start is not None else i
+        self._buffer = buffer[keep_from:]
+        if self._element_start is not None:
+            self._element_start = 0
+        self._pos = i - keep_from
+        return completed
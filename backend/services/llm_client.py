@@ -5,53 +5,311 @@ LLM Client — Google Gemma via AWS Bedrock
 import os
 import re
 import json
+import time
 import logging
-from dotenv import load_dotenv
+import threading
+from typing import Iterator, Optional
 
-load_dotenv()
+from services.admission import llm_slot
+from services.capture import capture_llm
+from services.circuit_breaker import CircuitOpen, get_llm_breaker
+from services.deadline import cancelled, has_budget, remaining
+from services.token_budget import LLM_MAX_TOKENS, get_token_budgeter, looks_truncated
+from services.tracing import span, traced
+from services.usage import get_usage_meter
 
 logger = logging.getLogger(__name__)
 
-LLM_MAX_TOKENS  = int(os.getenv("LLM_MAX_TOKENS", "1024"))
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.4"))
+# Don't start a call with less than this left on the request deadline
+LLM_MIN_CALL_SECONDS = float(os.getenv("LLM_MIN_CALL_SECONDS", "0.5"))
+# Read timeouts are rounded down to one of these (so a call never outlives
+# the deadline by much), keeping a handful of clients/connection pools per worker
+_READ_TIMEOUT_BUCKETS = (1, 2, 3, 5, 8, 13, 20, 30, 45, 60, 90, 120)
+# botocore's default read timeout: a shorter one was cut to fit the deadline
+_BOTOCORE_READ_TIMEOUT = 60
+
+_DEFAULT_SYSTEM_PROMPT = "You are a helpful AI tutor that diagnoses learner confusion and explains technical concepts."
+
+_client = None
+_timed_clients: dict[int, object] = {}
+_client_lock = threading.Lock()
+
+
+def _new_client(config=None):
+    import boto3
+
+    return boto3.client(
+        service_name="bedrock-runtime",
+        region_name=os.getenv("AWS_REGION", "ap-south-1"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        config=config,
+    )
+
+
+def get_bedrock_client(read_timeout: Optional[float] = None):
+    """
+    Shared bedrock-runtime client (boto3 clients are thread-safe).
+    Created on first use — or at startup by services.warmup — so importing
+    this module never pays for boto3.
+
+    With read_timeout (the request's remaining budget), returns a client
+    whose socket read timeout is that budget rounded down to a bucket, with
+    botocore's own retries off — a retry would only blow the deadline.
+    """
+    global _client
+    if read_timeout is None:
+        if _client is None:
+            with _client_lock:
+                if _client is None:
+                    _client = _new_client()
+        return _client
+
+    bucket = _read_timeout_bucket(read_timeout)
+    client = _timed_clients.get(bucket)
+    if client is None:
+        with _client_lock:
+            client = _timed_clients.get(bucket)
+            if client is None:
+                from botocore.config import Config
+
+                client = _timed_clients[bucket] = _new_client(Config(
+                    read_timeout=bucket,
+                    connect_timeout=min(bucket, 5),
+                    retries={"mode": "standard", "total_max_attempts": 1},
+                ))
+    return client
+
+
+def _read_timeout_bucket(read_timeout: float) -> int:
+    return max((b for b in _READ_TIMEOUT_BUCKETS if b <= read_timeout), default=_READ_TIMEOUT_BUCKETS[0])
+
+
+def _deadline_timeout(error: Exception, budget: Optional[float]) -> bool:
+    """
+    A read timeout the request's deadline imposed (shorter than botocore's
+    default): the request ran out of time, which says nothing about Bedrock.
+    """
+    if budget is None or _read_timeout_bucket(budget) >= _BOTOCORE_READ_TIMEOUT:
+        return False
+    from urllib3.exceptions import ReadTimeoutError  # botocore's subclasses it
+
+    return isinstance(error, (ReadTimeoutError, TimeoutError))
 
 
 def call_llm(
     prompt: str,
-    system_prompt: str = "You are a helpful AI tutor that diagnoses learner confusion and explains technical concepts.",
+    system_prompt: str = _DEFAULT_SYSTEM_PROMPT,
     json_mode: bool = True,
+    max_tokens: Optional[int] = None,
 ) -> str:
-    import boto3
+    return _invoke_llm(prompt, system_prompt, json_mode, max_tokens)["content"]
 
+
+def _request_body(prompt: str, system_prompt: str, json_mode: bool, max_tokens: Optional[int]) -> tuple[str, str]:
+    """(full prompt, Bedrock request body)."""
     if json_mode:
         prompt += "\n\nCRITICAL: Your response must start with '{' and end with '}'. Output ONLY the JSON object. No explanation, no markdown, no code fences."
 
     full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
 
-    bedrock = boto3.client(
-        service_name="bedrock-runtime",
-        region_name=os.getenv("AWS_REGION", "ap-south-1"),
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    )
-
     body = json.dumps({
         "messages": [{"role": "user", "content": full_prompt}],
-        "max_tokens": LLM_MAX_TOKENS,
+        "max_tokens": max_tokens or LLM_MAX_TOKENS,
         "temperature": LLM_TEMPERATURE,
     })
+    return full_prompt, body
+
 
+def _admit_call(s, breaker) -> Optional[float]:
+    """
+    Last checks before a call goes out (holding an LLM slot). Returns the
+    read timeout (remaining deadline; None outside a request) or raises
+    LLMUnavailable.
+    """
+    # Checked after the slot wait, which may have eaten the budget
+    budget = remaining()
+    if budget is not None and budget < LLM_MIN_CALL_SECONDS:
+        s.set(deadline="cancelled" if cancelled() else "exhausted")
+        raise LLMUnavailable(
+            "Client disconnected" if cancelled() else f"Request deadline exhausted ({budget:.2f}s left)"
+        )
     try:
-        response = bedrock.invoke_model(
-            body=body,
-            modelId=os.getenv("BEDROCK_MODEL_ID", "google.gemma-3-12b-it"),
+        breaker.before_call()
+    except CircuitOpen as e:
+        s.set(circuit="open")
+        raise LLMUnavailable(str(e)) from e
+    return budget
+
+
+def _record_failure(s, breaker, error: Exception, budget: Optional[float], started: float) -> None:
+    if _deadline_timeout(error, budget):
+        # Like a caller hanging up: not the provider's fault
+        s.set(deadline="expired")
+        breaker.release()
+    else:
+        breaker.record(failed=True, latency_ms=(time.perf_counter() - started) * 1000)
+
+
+def _invoke_llm(
+    prompt: str,
+    system_prompt: str,
+    json_mode: bool,
+    max_tokens: Optional[int],
+    call_site: str = "direct",
+) -> dict:
+    """
+    Single Bedrock round-trip.
+    Returns content plus the metadata token budgeting needs:
+    finish_reason, completion_tokens and latency_ms. Token usage (Bedrock's
+    usage block, estimated from lengths when absent) goes to services.usage.
+    Inside a request, the read timeout comes from the remaining deadline, and
+    no call starts once that is (nearly) spent or the client has gone.
+    The pair is recorded for replay when the request is being captured.
+    """
+    full_prompt, body = _request_body(prompt, system_prompt, json_mode, max_tokens)
+
+    with span(
+        "call_llm", call_site=call_site,
+        prompt_chars=len(full_prompt), max_tokens=max_tokens or LLM_MAX_TOKENS,
+    ) as s:
+        breaker = get_llm_breaker()
+        try:
+            # Waits for a free slot (fair across tenants) when Bedrock calls are saturated
+            with llm_slot():
+                budget = _admit_call(s, breaker)
+                started, started_wall = time.perf_counter(), time.time()
+                try:
+                    response = get_bedrock_client(budget).invoke_model(
+                        body=body,
+                        modelId=os.getenv("BEDROCK_MODEL_ID", "google.gemma-3-12b-it"),
+                    )
+                    result = json.loads(response["body"].read())
+                    choice = result["choices"][0]
+                    content = choice["message"]["content"]
+                except Exception as e:
+                    _record_failure(s, breaker, e, budget, started)
+                    raise
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(f"Bedrock call failed: {str(e)}") from e
+        breaker.record(failed=False, latency_ms=(time.perf_counter() - started) * 1000)
+
+        usage = result.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens") or max(1, len(full_prompt) // 4)
+        completion = {
+            "content": content,
+            "finish_reason": choice.get("finish_reason"),
+            "completion_tokens": usage.get("completion_tokens") or max(1, len(content) // 4),
+            "latency_ms": (time.perf_counter() - started) * 1000,
+        }
+        s.set(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion["completion_tokens"],
+            completion_chars=len(content),
+            finish_reason=completion["finish_reason"],
         )
-        result = json.loads(response["body"].read())
-        return result["choices"][0]["message"]["content"]
-    except Exception as e:
-        raise LLMError(f"Bedrock call failed: {str(e)}") from e
+    get_usage_meter().record(call_site, prompt_tokens, completion["completion_tokens"])
+    capture_llm(
+        call_site, started_wall, full_prompt, max_tokens or LLM_MAX_TOKENS,
+        content, completion["finish_reason"], completion["latency_ms"],
+    )
+    return completion
+
+
+def _stream_llm(
+    prompt: str,
+    system_prompt: str,
+    json_mode: bool,
+    max_tokens: Optional[int],
+    call_site: str,
+    completion: dict,
+) -> Iterator[str]:
+    """
+    Streaming Bedrock call (invoke_model_with_response_stream): yields
+    content deltas as they arrive. Same slot, breaker, deadline and usage
+    handling as _invoke_llm; the LLM slot is held until the stream ends or
+    the caller closes the generator. Fills `completion` with finish_reason,
+    completion_tokens and latency_ms once the stream is done.
+    """
+    full_prompt, body = _request_body(prompt, system_prompt, json_mode, max_tokens)
 
+    with span(
+        "call_llm", call_site=call_site, stream=True,
+        prompt_chars=len(full_prompt), max_tokens=max_tokens or LLM_MAX_TOKENS,
+    ) as s:
+        breaker = get_llm_breaker()
+        parts: list[str] = []
+        usage: dict = {}
+        finish_reason = None
+        try:
+            with llm_slot():
+                budget = _admit_call(s, breaker)
+                started, started_wall = time.perf_counter(), time.time()
+                try:
+                    response = get_bedrock_client(budget).invoke_model_with_response_stream(
+                        body=body,
+                        modelId=os.getenv("BEDROCK_MODEL_ID", "google.gemma-3-12b-it"),
+                    )
+                    for event in response["body"]:
+                        if "chunk" not in event:
+                            raise LLMError(f"Bedrock stream error: {next(iter(event), 'unknown event')}")
+                        payload = json.loads(event["chunk"]["bytes"])
+                        if payload.get("usage"):
+                            usage = payload["usage"]
+                        elif payload.get("amazon-bedrock-invocationMetrics"):
+                            metrics = payload["amazon-bedrock-invocationMetrics"]
+                            usage = {
+                                "prompt_tokens": metrics.get("inputTokenCount"),
+                                "completion_tokens": metrics.get("outputTokenCount"),
+                            }
+                        for choice in payload.get("choices") or []:
+                            finish_reason = choice.get("finish_reason") or finish_reason
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                parts.append(delta)
+                                yield delta
+                        if cancelled():
+                            s.set(deadline="cancelled")
+                            break  # nobody is reading; stop paying for tokens
+                except GeneratorExit:
+                    # The caller stopped reading — not the provider's fault
+                    breaker.record(failed=False, latency_ms=(time.perf_counter() - started) * 1000)
+                    raise
+                except Exception as e:
+                    _record_failure(s, breaker, e, budget, started)
+                    raise
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(f"Bedrock call failed: {str(e)}") from e
+        finally:
+            # Whatever was generated is billed, even when the stream broke off
+            if parts:
+                content_chars = sum(len(p) for p in parts)
+                completion.update(
+                    finish_reason=finish_reason,
+                    completion_tokens=usage.get("completion_tokens") or max(1, content_chars // 4),
+                    latency_ms=(time.perf_counter() - started) * 1000,
+                )
+                prompt_tokens = usage.get("prompt_tokens") or max(1, len(full_prompt) // 4)
+                s.set(
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion["completion_tokens"],
+                    completion_chars=content_chars,
+                    finish_reason=finish_reason,
+                )
+                get_usage_meter().record(call_site, prompt_tokens, completion["completion_tokens"])
+                capture_llm(
+                    call_site, started_wall, full_prompt, max_tokens or LLM_MAX_TOKENS,
+                    "".join(parts), finish_reason, completion["latency_ms"], stream=True,
+                )
+        breaker.record(failed=False, latency_ms=(time.perf_counter() - started) * 1000)
 
+
+@traced()
 def _extract_json(raw: str) -> str:
     """
     Robustly extract JSON from LLM output that may have extra text.
@@ -88,23 +346,109 @@ def _extract_json(raw: str) -> str:
     return raw
 
 
-def call_llm_json(prompt: str, system_prompt: str = "") -> dict:
-    raw = call_llm(prompt, system_prompt, json_mode=True)
+def _parse_json_output(raw: str):
+    """
+    _extract_json + json.loads, inline: outputs are capped by the token
+    ceiling (a few KB), which parses faster than it pickles to the CPU pool.
+    """
+    return json.loads(_extract_json(raw))
+
+
+def _call_llm_budgeted(
+    prompt: str,
+    system_prompt: str,
+    call_site: str,
+    difficulty_level: Optional[str],
+    num_questions: Optional[int],
+) -> str:
+    """
+    Call the LLM with a per-call-site max_tokens budget.
+    If the completion was cut off mid-JSON, retry once with a bigger budget.
+    """
+    budgeter = get_token_budgeter()
+    key = budgeter.bucket_key(call_site, difficulty_level, num_questions)
+    budget = budgeter.budget_for(call_site, difficulty_level, num_questions)
+
+    completion = _invoke_llm(prompt, system_prompt, True, budget, call_site)
+    raw = completion["content"]
+    hit_cap = completion["finish_reason"] in ("length", "max_tokens")
+    broken = looks_truncated(_extract_json(raw))
+    budgeter.record(
+        key, budget, completion["completion_tokens"], completion["latency_ms"],
+        truncated=hit_cap or broken, retried=broken,
+    )
+
+    if broken and not has_budget():
+        logger.warning(f"Truncated JSON from LLM ({call_site}), no time left to retry")
+    elif broken:
+        retry_budget = budgeter.retry_budget(budget)
+        logger.warning(
+            f"Truncated JSON from LLM ({call_site}, max_tokens={budget}), "
+            f"retrying with max_tokens={retry_budget}"
+        )
+        budgeter.record_retry(key, completion["latency_ms"])
+        completion = _invoke_llm(prompt, system_prompt, True, retry_budget, call_site)
+        raw = completion["content"]
+        budgeter.record(
+            key, retry_budget, completion["completion_tokens"], completion["latency_ms"],
+            truncated=completion["finish_reason"] in ("length", "max_tokens"),
+        )
+
+    return raw
+
+
+def stream_llm_json(
+    prompt: str,
+    system_prompt: str = "",
+    call_site: str = "default",
+    difficulty_level: Optional[str] = None,
+    num_questions: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Streaming counterpart of _call_llm_budgeted: yields the raw JSON text as
+    it is generated (parse it with services.json_stream). There is no
+    truncation retry — whatever was streamed has already been delivered —
+    but truncations still feed the token budgeter.
+    """
+    budgeter = get_token_budgeter()
+    key = budgeter.bucket_key(call_site, difficulty_level, num_questions)
+    budget = budgeter.budget_for(call_site, difficulty_level, num_questions)
+
+    completion: dict = {}
+    yield from _stream_llm(prompt, system_prompt, True, budget, call_site, completion)
+    if completion:
+        budgeter.record(
+            key, budget, completion["completion_tokens"], completion["latency_ms"],
+            truncated=completion["finish_reason"] in ("length", "max_tokens"),
+        )
+
+
+def call_llm_json(
+    prompt: str,
+    system_prompt: str = "",
+    call_site: str = "default",
+    difficulty_level: Optional[str] = None,
+) -> dict:
+    raw = _call_llm_budgeted(prompt, system_prompt, call_site, difficulty_level, None)
     logger.debug(f"Raw LLM response: {raw[:300]}")
     try:
-        cleaned = _extract_json(raw)
-        return json.loads(cleaned)
+        return _parse_json_output(raw)
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse LLM JSON: {raw}")
         raise LLMError(f"LLM returned invalid JSON: {str(e)}") from e
 
 
-def call_llm_json_list(prompt: str, system_prompt: str = "") -> list:
-    raw = call_llm(prompt, system_prompt, json_mode=True)
+def call_llm_json_list(
+    prompt: str,
+    system_prompt: str = "",
+    call_site: str = "default",
+    difficulty_level: Optional[str] = None,
+    num_questions: Optional[int] = None,
+) -> list:
+    raw = _call_llm_budgeted(prompt, system_prompt, call_site, difficulty_level, num_questions)
     logger.debug(f"Raw LLM response: {raw[:300]}")
     try:
-        cleaned = _extract_json(raw)
-        result = json.loads(cleaned)
+        result = _parse_json_output(raw)
         if isinstance(result, list):
             return result
         for v in result.values():
@@ -116,4 +460,11 @@ def call_llm_json_list(prompt: str, system_prompt: str = "") -> list:
 
 
 class LLMError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class LLMUnavailable(LLMError):
+    """
+    The call was not attempted: the circuit breaker is open, the request's
+    deadline is spent, or its client has disconnected.
+    """
\ No newline at end of file
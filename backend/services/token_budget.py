@@ -0,0 +1,256 @@
+"""
+Token Budget — picks max_tokens per call site instead of one global value.
+
+Each LLM call is bucketed by call site (diagnosis, explanation, practice, ...)
+plus the knobs that change output length (difficulty_level, num_questions).
+A bucket starts from a static budget and, once it has enough samples, switches
+to the observed p95 completion length plus headroom. Truncated completions
+count as at least their cap, so a truncation can only raise the budget.
+"""
+
+import logging
+import math
+import os
+import threading
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# The old single global — kept as the reference point for "tokens saved"
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1024"))
+
+TOKEN_BUDGET_CEILING     = int(os.getenv("TOKEN_BUDGET_CEILING", "2048"))
+TOKEN_BUDGET_FLOOR       = int(os.getenv("TOKEN_BUDGET_FLOOR", "128"))
+TOKEN_BUDGET_WINDOW      = int(os.getenv("TOKEN_BUDGET_WINDOW", "200"))
+TOKEN_BUDGET_MIN_SAMPLES = int(os.getenv("TOKEN_BUDGET_MIN_SAMPLES", "20"))
+TOKEN_BUDGET_HEADROOM    = float(os.getenv("TOKEN_BUDGET_HEADROOM", "1.2"))
+TOKEN_BUDGET_ADAPTIVE    = os.getenv("TOKEN_BUDGET_ADAPTIVE", "true").lower() == "true"
+
+# Static starting budgets per call site (before any samples are observed)
+_BASE_BUDGETS: dict[str, int] = {
+    "diagnosis":   256,
+    "explanation": 768,
+    "follow_up":   256,   # delta answers on a concept explained moments ago
+    "practice":    128,   # fixed overhead, plus _PER_QUESTION_TOKENS per question
+    "feedback":    384,
+}
+_PER_QUESTION_TOKENS = 224
+
+# Longer explanations are expected as difficulty goes up
+_DIFFICULTY_MULTIPLIERS: dict[str, float] = {
+    "beginner":     1.0,
+    "intermediate": 1.25,
+    "advanced":     1.6,
+}
+
+
+class TokenBudgeter:
+    """
+    Hands out max_tokens per bucket and learns from completion lengths.
+    Thread-safe: LLM calls may run from worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._observed: dict[str, deque] = {}
+        self._buckets: dict[str, dict] = {}
+        self._ms_per_token: Optional[float] = None
+        self._totals = {
+            "calls": 0,
+            "retries": 0,
+            "truncations": 0,
+            "max_tokens_reserved_saved": 0,
+            "tokens_cut_off_estimate": 0,
+            "retry_latency_ms": 0.0,
+        }
+
+    # ── Budget selection ───────────────────────────────────────
+
+    @staticmethod
+    def bucket_key(
+        call_site: str,
+        difficulty_level: Optional[str] = None,
+        num_questions: Optional[int] = None,
+    ) -> str:
+        parts = [call_site]
+        if difficulty_level:
+            parts.append(difficulty_level.lower())
+        if num_questions:
+            parts.append(f"q{num_questions}")
+        return ":".join(parts)
+
+    def budget_for(
+        self,
+        call_site: str,
+        difficulty_level: Optional[str] = None,
+        num_questions: Optional[int] = None,
+    ) -> int:
+        """Return the max_tokens to request for this call."""
+        key = self.bucket_key(call_site, difficulty_level, num_questions)
+        with self._lock:
+            samples = self._observed.get(key)
+            if TOKEN_BUDGET_ADAPTIVE and samples and len(samples) >= TOKEN_BUDGET_MIN_SAMPLES:
+                budget = math.ceil(_percentile(samples, 0.95) * TOKEN_BUDGET_HEADROOM)
+            else:
+                budget = _static_budget(call_site, difficulty_level, num_questions)
+        return _clamp(budget)
+
+    @staticmethod
+    def retry_budget(budget: int) -> int:
+        """Bigger budget for the single retry after a truncated completion."""
+        return _clamp(max(budget * 2, LLM_MAX_TOKENS))
+
+    # ── Observation ────────────────────────────────────────────
+
+    def record(
+        self,
+        key: str,
+        budget: int,
+        completion_tokens: int,
+        latency_ms: float,
+        truncated: bool,
+        retried: bool = False,
+    ) -> None:
+        """Record one completed call for learning and reporting."""
+        with self._lock:
+            samples = self._observed.setdefault(key, deque(maxlen=TOKEN_BUDGET_WINDOW))
+            # A truncated completion was at least as long as its cap; its
+            # capped length would drag the budget down toward that cap
+            samples.append(max(completion_tokens, budget) if truncated else completion_tokens)
+
+            bucket = self._buckets.setdefault(key, {
+                "calls": 0, "truncations": 0, "retries": 0, "last_budget": budget,
+            })
+            bucket["calls"] += 1
+            bucket["last_budget"] = budget
+
+            self._totals["calls"] += 1
+            self._totals["max_tokens_reserved_saved"] += max(0, LLM_MAX_TOKENS - budget)
+
+            if completion_tokens > 0 and latency_ms > 0:
+                per_token = latency_ms / completion_tokens
+                self._ms_per_token = (
+                    per_token if self._ms_per_token is None
+                    else 0.9 * self._ms_per_token + 0.1 * per_token
+                )
+
+            if truncated:
+                bucket["truncations"] += 1
+                self._totals["truncations"] += 1
+                if not retried and budget < LLM_MAX_TOKENS:
+                    # The cap stopped a completion that was still usable —
+                    # the old global would have let it run on.
+                    self._totals["tokens_cut_off_estimate"] += LLM_MAX_TOKENS - budget
+
+    def record_retry(self, key: str, wasted_latency_ms: float) -> None:
+        """Record that a truncated completion had to be regenerated."""
+        with self._lock:
+            self._totals["retries"] += 1
+            self._totals["retry_latency_ms"] += wasted_latency_ms
+            if key in self._buckets:
+                self._buckets[key]["retries"] += 1
+
+    # ── Reporting ──────────────────────────────────────────────
+
+    def report(self) -> dict:
+        """Summary of budgets in use and what they saved."""
+        with self._lock:
+            ms_per_token = self._ms_per_token or 0.0
+            saved_ms = self._totals["tokens_cut_off_estimate"] * ms_per_token
+            buckets = {}
+            for key, bucket in self._buckets.items():
+                samples = self._observed.get(key) or ()
+                buckets[key] = {
+                    **bucket,
+                    "samples": len(samples),
+                    "p95_completion_tokens": int(_percentile(samples, 0.95)) if samples else None,
+                }
+            return {
+                "reference_max_tokens": LLM_MAX_TOKENS,
+                "calls": self._totals["calls"],
+                "retries": self._totals["retries"],
+                "truncations": self._totals["truncations"],
+                "max_tokens_reserved_saved": self._totals["max_tokens_reserved_saved"],
+                "ms_per_completion_token": round(ms_per_token, 3),
+                "estimated_latency_saved_ms": round(saved_ms, 1),
+                "retry_latency_ms": round(self._totals["retry_latency_ms"], 1),
+                "net_latency_saved_ms": round(saved_ms - self._totals["retry_latency_ms"], 1),
+                "buckets": buckets,
+            }
+
+    def reset(self) -> None:
+        """Forget everything learned (mainly for tests/benchmarks)."""
+        with self._lock:
+            self._reset_state()
+
+
+# ── Truncation detection ───────────────────────────────────────
+
+def looks_truncated(text: str) -> bool:
+    """
+    True if the text opens a JSON object/array that is never closed,
+    i.e. generation stopped mid-structure.
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start == -1:
+        return False
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for ch in text[start:]:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return False
+    return True
+
+
+# ── Helpers ────────────────────────────────────────────────────
+
+def _static_budget(
+    call_site: str,
+    difficulty_level: Optional[str],
+    num_questions: Optional[int],
+) -> int:
+    budget = _BASE_BUDGETS.get(call_site, LLM_MAX_TOKENS)
+    if call_site == "practice":
+        budget += _PER_QUESTION_TOKENS * (num_questions or 2)
+    if difficulty_level:
+        budget *= _DIFFICULTY_MULTIPLIERS.get(difficulty_level.lower(), 1.0)
+    return int(budget)
+
+
+def _clamp(budget: int) -> int:
+    return max(TOKEN_BUDGET_FLOOR, min(int(budget), TOKEN_BUDGET_CEILING))
+
+
+def _percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return float(ordered[idx])
+
+
+_budgeter = TokenBudgeter()
+
+
+def get_token_budgeter() -> TokenBudgeter:
+    """Process-wide budgeter shared by every LLM call site."""
+    return _budgeter
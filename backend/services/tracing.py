@@ -0,0 +1,307 @@
+"""
+Tracing — lightweight per-request spans, no OpenTelemetry SDK required.
+
+- The request-ID middleware (api/middleware/request_id.py) starts a trace
+  per HTTP request; span()/traced() record nested, timed spans inside it.
+  Context lives in contextvars, so spans follow asyncio.to_thread into
+  worker threads and parent correctly. Outside a request they are no-ops.
+- Export (TRACE_EXPORTER): none | stdout (one JSON line per trace) |
+  otlp (OTLP/HTTP JSON to a local collector, sent from a background thread).
+  TRACE_SAMPLE_RATE picks which traces are exported.
+- Slow requests (>= TRACE_SLOW_REQUEST_MS) are always logged with their
+  span tree, sampled or not — that's the trace you actually want.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORTER         = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_SAMPLE_RATE      = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_SLOW_REQUEST_MS  = float(os.getenv("TRACE_SLOW_REQUEST_MS", "5000"))
+TRACE_OTLP_ENDPOINT    = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME     = os.getenv("TRACE_SERVICE_NAME", "brainboost-backend")
+# Guards against pathological fan-out (e.g. a huge batch) bloating one trace
+TRACE_MAX_SPANS        = int(os.getenv("TRACE_MAX_SPANS", "500"))
+
+if TRACE_EXPORTER not in ("none", "stdout", "otlp"):
+    raise ValueError(f"TRACE_EXPORTER must be none|stdout|otlp, got '{TRACE_EXPORTER}'")
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 2),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned outside a trace so call sites never need to check."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, request_id: str, sampled: bool):
+        self.trace_id = uuid.uuid4().hex
+        self.request_id = request_id
+        self.sampled = sampled
+        self.spans: list[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()  # spans may finish on worker threads
+
+    def add(self, span: Span) -> bool:
+        with self._lock:
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped += 1
+                return False
+            self.spans.append(span)
+            return True
+
+
+# ── Recording ──────────────────────────────────────────────────
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """Time a block as a child of the current span. No-op outside a request."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    s = Span(name, parent.span_id if parent else None, attributes)
+    if not trace.add(s):
+        yield s
+        return
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator form of span() for plain (sync) functions."""
+
+    def decorate(fn: Callable) -> Callable:
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def start_trace(request_id: str, name: str, **attributes: Any) -> tuple[Trace, Span, tuple]:
+    """Begin a request trace; pass the returned tokens to finish_trace."""
+    trace = Trace(request_id, sampled=random.random() < TRACE_SAMPLE_RATE)
+    root = Span(name, None, attributes)
+    trace.add(root)
+    tokens = (_current_trace.set(trace), _current_span.set(root))
+    return trace, root, tokens
+
+
+def finish_trace(trace: Trace, root: Span, tokens: tuple) -> None:
+    root.end_ns = time.time_ns()
+    duration = root.duration_ms
+    if TRACE_SLOW_REQUEST_MS and duration >= TRACE_SLOW_REQUEST_MS:
+        logger.warning(f"Slow request {duration:.0f}ms:\n{format_span_tree(trace)}")
+    _current_span.reset(tokens[1])
+    _current_trace.reset(tokens[0])
+
+    if trace.sampled and TRACE_EXPORTER != "none":
+        _export(trace)
+
+
+def format_span_tree(trace: Trace) -> str:
+    children: dict[Optional[str], list[Span]] = {}
+    with trace._lock:
+        spans = list(trace.spans)
+    for s in spans:
+        children.setdefault(s.parent_id, []).append(s)
+
+    lines = []
+
+    def walk(parent_id: Optional[str], depth: int) -> None:
+        for s in sorted(children.get(parent_id, []), key=lambda x: x.start_ns):
+            attrs = " ".join(f"{k}={v}" for k, v in s.attributes.items())
+            error = f" ERROR {s.error}" if s.error else ""
+            lines.append(f"{'  ' * (depth + 1)}{s.name} {s.duration_ms:.1f}ms {attrs}{error}".rstrip())
+            walk(s.span_id, depth + 1)
+
+    walk(None, 0)
+    if trace.dropped:
+        lines.append(f"  ... {trace.dropped} span(s) dropped (TRACE_MAX_SPANS)")
+    return "\n".join(lines)
+
+
+# ── Export ─────────────────────────────────────────────────────
+
+def _export(trace: Trace) -> None:
+    if TRACE_EXPORTER == "stdout":
+        with trace._lock:
+            spans = [s.to_dict() for s in trace.spans]
+        print(json.dumps({
+            "trace_id": trace.trace_id,
+            "request_id": trace.request_id,
+            "spans": spans,
+        }, default=str), flush=True)
+    elif TRACE_EXPORTER == "otlp":
+        _get_otlp_exporter().submit(trace)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces: list[Trace]) -> dict:
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest) for a batch of traces."""
+    otlp_spans = []
+    for trace in traces:
+        with trace._lock:
+            spans = list(trace.spans)
+        for s in spans:
+            attributes = [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()]
+            attributes.append({"key": "request.id", "value": {"stringValue": trace.request_id}})
+            otlp_spans.append({
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "kind": 2 if s.parent_id is None else 1,  # SERVER root, INTERNAL children
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": attributes,
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "services.tracing"}, "spans": otlp_spans}],
+        }]
+    }
+
+
+class _OtlpExporter:
+    """Batches traces on a background thread; drops (never blocks) when the collector can't keep up."""
+
+    def __init__(self, endpoint: str, max_queue: int = 1000, batch_size: int = 50):
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        threading.Thread(target=self._run, name="otlp-exporter", daemon=True).start()
+
+    def submit(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                request = urllib.request.Request(
+                    self.endpoint,
+                    data=json.dumps(to_otlp(batch)).encode("utf-8"),
+                    headers={"Content-Type": "application/json"},
+                    method="POST",
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            except Exception as e:
+                logger.debug(f"OTLP export of {len(batch)} trace(s) failed: {e}")
+
+
+_otlp_exporter: Optional[_OtlpExporter] = None
+_otlp_lock = threading.Lock()
+
+
+def _get_otlp_exporter() -> _OtlpExporter:
+    global _otlp_exporter
+    if _otlp_exporter is None:
+        with _otlp_lock:
+            if _otlp_exporter is None:
+                _otlp_exporter = _OtlpExporter(TRACE_OTLP_ENDPOINT)
+    return _otlp_exporter
+
+
+# ── Logging ────────────────────────────────────────────────────
+
+class RequestIdLogFilter(logging.Filter):
+    """Adds %(request_id)s to every log record ("-" outside a request)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id() or "-"
+        return True
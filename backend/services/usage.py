@@ -0,0 +1,303 @@
+"""
+Usage — LLM token and cost accounting per learner, concept, strategy and endpoint.
+
+- Every Bedrock call reports its usage block (llm_client._invoke_llm).
+  Who it's attributed to comes from usage_scope(), a contextvar set by the
+  routes (endpoint, learner, concept) and the generators (strategy), so no
+  signature in between has to carry it.
+- Counts aggregate in-process per (hour bucket, learner, concept, strategy,
+  endpoint, call site) and are flushed to SQLite every USAGE_FLUSH_SECONDS
+  (or USAGE_FLUSH_MAX_KEYS distinct keys, and at shutdown) as one upsert
+  batch — a few writes per interval instead of one per LLM call.
+- Per-learner daily quotas (USAGE_LEARNER_DAILY_TOKENS) are checked from
+  memory: a per-learner snapshot of today's flushed total, refreshed every
+  USAGE_QUOTA_REFRESH_SECONDS, plus this worker's unflushed tokens. Other
+  workers' usage shows up within one flush + refresh interval, so the
+  quota is soft by at most that much.
+"""
+
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from memory.sqlite_store import get_connection, register_schema
+
+logger = logging.getLogger(__name__)
+
+USAGE_BUCKET_SECONDS         = 3600
+USAGE_FLUSH_SECONDS          = float(os.getenv("USAGE_FLUSH_SECONDS", "10"))
+USAGE_FLUSH_MAX_KEYS         = int(os.getenv("USAGE_FLUSH_MAX_KEYS", "500"))
+# 0 = no quota
+USAGE_LEARNER_DAILY_TOKENS   = int(os.getenv("USAGE_LEARNER_DAILY_TOKENS", "0"))
+USAGE_QUOTA_REFRESH_SECONDS  = float(os.getenv("USAGE_QUOTA_REFRESH_SECONDS", "30"))
+# USD per 1K tokens for the configured model; 0 leaves cost_usd at 0
+USAGE_PRICE_PER_1K_INPUT     = float(os.getenv("USAGE_PRICE_PER_1K_INPUT", "0"))
+USAGE_PRICE_PER_1K_OUTPUT    = float(os.getenv("USAGE_PRICE_PER_1K_OUTPUT", "0"))
+
+_DAY_SECONDS = 86400
+_UNATTRIBUTED = "-"
+DIMENSIONS = ("learner_id", "concept", "strategy", "endpoint", "call_site")
+GROUP_BY_OPTIONS = (*DIMENSIONS, "bucket")
+
+register_schema("""
+CREATE TABLE IF NOT EXISTS llm_usage (
+    bucket_start      INTEGER NOT NULL,
+    learner_id        TEXT NOT NULL,
+    concept           TEXT NOT NULL,
+    strategy          TEXT NOT NULL,
+    endpoint          TEXT NOT NULL,
+    call_site         TEXT NOT NULL,
+    calls             INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens     INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_start, learner_id, concept, strategy, endpoint, call_site)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_llm_usage_learner ON llm_usage (learner_id, bucket_start);
+""")
+
+_attribution: contextvars.ContextVar[dict] = contextvars.ContextVar("usage_attribution", default={})
+
+
+@contextmanager
+def usage_scope(**dimensions: Optional[str]):
+    """Attribute LLM calls made inside this block (nested scopes add/override dimensions)."""
+    unknown = set(dimensions) - {"learner_id", "concept", "strategy", "endpoint"}
+    if unknown:
+        raise ValueError(f"Unknown usage dimension(s): {sorted(unknown)}")
+    token = _attribution.set({**_attribution.get(), **{k: v for k, v in dimensions.items() if v}})
+    try:
+        yield
+    finally:
+        _attribution.reset(token)
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, learner_id: str, used: int, quota: int, retry_after: int):
+        super().__init__(f"Learner '{learner_id}' used {used} of {quota} LLM tokens today")
+        self.learner_id = learner_id
+        self.used = used
+        self.quota = quota
+        self.retry_after = retry_after
+
+
+def cost_usd(prompt_tokens: int, completion_tokens: int) -> float:
+    return round(
+        prompt_tokens / 1000 * USAGE_PRICE_PER_1K_INPUT
+        + completion_tokens / 1000 * USAGE_PRICE_PER_1K_OUTPUT,
+        6,
+    )
+
+
+class UsageMeter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (bucket_start, learner, concept, strategy, endpoint, call_site) -> [calls, prompt, completion]
+        self._pending: dict[tuple, list[int]] = {}
+        # (learner, day_start) -> unflushed tokens
+        self._pending_learner_day: dict[tuple[str, int], int] = {}
+        # learner -> [day_start, flushed tokens today, fetched_at]
+        self._snapshots: dict[str, list] = {}
+        self._last_flush = time.monotonic()
+
+    # ── Recording (hot path) ───────────────────────────────────
+
+    def record(self, call_site: str, prompt_tokens: int, completion_tokens: int) -> None:
+        dims = _attribution.get()
+        now = time.time()
+        learner = dims.get("learner_id") or _UNATTRIBUTED
+        key = (
+            int(now // USAGE_BUCKET_SECONDS) * USAGE_BUCKET_SECONDS,
+            learner,
+            (dims.get("concept") or _UNATTRIBUTED).strip().lower()[:100],
+            dims.get("strategy") or _UNATTRIBUTED,
+            dims.get("endpoint") or _UNATTRIBUTED,
+            call_site,
+        )
+        with self._lock:
+            counts = self._pending.setdefault(key, [0, 0, 0])
+            counts[0] += 1
+            counts[1] += prompt_tokens
+            counts[2] += completion_tokens
+            if learner != _UNATTRIBUTED:
+                day_key = (learner, _day_start(now))
+                self._pending_learner_day[day_key] = (
+                    self._pending_learner_day.get(day_key, 0) + prompt_tokens + completion_tokens
+                )
+            due = (
+                time.monotonic() - self._last_flush >= USAGE_FLUSH_SECONDS
+                or len(self._pending) >= USAGE_FLUSH_MAX_KEYS
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending counts to SQLite. Returns the number of rows upserted."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            learner_days, self._pending_learner_day = self._pending_learner_day, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            conn = get_connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT INTO llm_usage (bucket_start, learner_id, concept, strategy, endpoint, call_site, "
+                    "calls, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (bucket_start, learner_id, concept, strategy, endpoint, call_site) DO UPDATE SET "
+                    "calls = calls + excluded.calls, "
+                    "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                    "completion_tokens = completion_tokens + excluded.completion_tokens",
+                    [(*key, *counts) for key, counts in pending.items()],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Usage flush failed, keeping {len(pending)} row(s) for the next attempt: {e}")
+            with self._lock:
+                for key, counts in pending.items():
+                    merged = self._pending.setdefault(key, [0, 0, 0])
+                    for i, n in enumerate(counts):
+                        merged[i] += n
+                for day_key, tokens in learner_days.items():
+                    self._pending_learner_day[day_key] = self._pending_learner_day.get(day_key, 0) + tokens
+            return 0
+
+        # What just left "pending" is now part of the flushed total
+        with self._lock:
+            for (learner, day), tokens in learner_days.items():
+                snapshot = self._snapshots.get(learner)
+                if snapshot is not None and snapshot[0] == day:
+                    snapshot[1] += tokens
+        return len(pending)
+
+    # ── Quotas ─────────────────────────────────────────────────
+
+    def tokens_used_today(self, learner_id: str) -> int:
+        now = time.time()
+        day = _day_start(now)
+        with self._lock:
+            snapshot = self._snapshots.get(learner_id)
+        if snapshot is None or snapshot[0] != day or now - snapshot[2] >= USAGE_QUOTA_REFRESH_SECONDS:
+            row = get_connection().execute(
+                "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) AS tokens "
+                "FROM llm_usage WHERE learner_id = ? AND bucket_start >= ?",
+                (learner_id, day),
+            ).fetchone()
+            snapshot = [day, row["tokens"], now]
+            with self._lock:
+                self._snapshots[learner_id] = snapshot
+        with self._lock:
+            return snapshot[1] + self._pending_learner_day.get((learner_id, day), 0)
+
+    def check_quota(self, learner_id: Optional[str]) -> None:
+        """Raise QuotaExceeded if the learner has used up today's token quota."""
+        if not learner_id or USAGE_LEARNER_DAILY_TOKENS <= 0:
+            return
+        try:
+            used = self.tokens_used_today(learner_id)
+        except (sqlite3.Error, OSError) as e:
+            # Fail open: an unreadable usage table shouldn't block learning
+            logger.warning(f"Could not check quota for {learner_id}: {e}")
+            return
+        if used >= USAGE_LEARNER_DAILY_TOKENS:
+            now = time.time()
+            raise QuotaExceeded(
+                learner_id, used, USAGE_LEARNER_DAILY_TOKENS,
+                retry_after=int(_day_start(now) + _DAY_SECONDS - now) + 1,
+            )
+
+    # ── Queries ────────────────────────────────────────────────
+
+    def report(
+        self,
+        group_by: tuple[str, ...] = ("endpoint", "strategy"),
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        bucket_seconds: int = USAGE_BUCKET_SECONDS,
+        learner_id: Optional[str] = None,
+        concept: Optional[str] = None,
+        limit: int = 100,
+    ) -> dict:
+        """
+        Totals grouped by any of GROUP_BY_OPTIONS, most tokens first.
+        "bucket" groups by time in bucket_seconds steps (a multiple of an hour).
+        """
+        unknown = set(group_by) - set(GROUP_BY_OPTIONS)
+        if unknown:
+            raise ValueError(f"Cannot group usage by {sorted(unknown)}; choose from {', '.join(GROUP_BY_OPTIONS)}")
+        if bucket_seconds <= 0 or bucket_seconds % USAGE_BUCKET_SECONDS:
+            raise ValueError(f"bucket_seconds must be a positive multiple of {USAGE_BUCKET_SECONDS}")
+        self.flush()
+
+        where, params = [], []
+        if since is not None:
+            where.append("bucket_start >= ?")
+            params.append(int(since // USAGE_BUCKET_SECONDS) * USAGE_BUCKET_SECONDS)
+        if until is not None:
+            where.append("bucket_start < ?")
+            params.append(until)
+        if learner_id:
+            where.append("learner_id = ?")
+            params.append(learner_id)
+        if concept:
+            where.append("concept = ?")
+            params.append(concept.strip().lower())
+
+        columns = [
+            f"(bucket_start / {int(bucket_seconds)}) * {int(bucket_seconds)} AS bucket" if g == "bucket" else g
+            for g in group_by
+        ]
+        sums = "SUM(calls) AS calls, SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens"
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        conn = get_connection()
+
+        rows = conn.execute(
+            f"SELECT {', '.join(columns + [sums])} FROM llm_usage{where_sql}"
+            + (f" GROUP BY {', '.join(group_by)}" if group_by else "")
+            + " ORDER BY SUM(prompt_tokens + completion_tokens) DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        totals = conn.execute(f"SELECT {sums} FROM llm_usage{where_sql}", params).fetchone()
+
+        def usage_row(row) -> dict:
+            prompt, completion = row["prompt_tokens"] or 0, row["completion_tokens"] or 0
+            return {
+                "calls": row["calls"] or 0,
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "total_tokens": prompt + completion,
+                "cost_usd": cost_usd(prompt, completion),
+            }
+
+        return {
+            "group_by": list(group_by),
+            "bucket_seconds": bucket_seconds,
+            "rows": [
+                {"dimensions": {g: row[g] for g in group_by}, **usage_row(row)}
+                for row in rows
+            ],
+            "totals": usage_row(totals),
+            "price_per_1k_input": USAGE_PRICE_PER_1K_INPUT,
+            "price_per_1k_output": USAGE_PRICE_PER_1K_OUTPUT,
+        }
+
+
+def _day_start(timestamp: float) -> int:
+    return int(timestamp // _DAY_SECONDS) * _DAY_SECONDS
+
+
+_meter = UsageMeter()
+
+
+def get_usage_meter() -> UsageMeter:
+    return _meter
@@ -0,0 +1,144 @@
+"""
+Warm-up — does the one-off work of a first request at startup instead.
+
+Importing the app stays cheap and side-effect free (no boto3, no numpy, no
+prompt files, no directories). lifespan then runs warm_up() once, so the
+first learner to hit a fresh container doesn't pay for:
+- the boto3 import + bedrock-runtime client (credential/endpoint resolution)
+- reading every prompt template
+- opening the SQLite index (creates MEMORY_DIR on first run)
+- loading numpy and the explanation index
+- starting the CPU pool's worker processes
+- optionally (WARMUP_PROBE_LLM=true) one tiny call against the configured model
+
+Each step is timed and failures are recorded, not raised: a missing
+optional dependency or unreachable disk only means that step stays cold.
+The app is ready (see /health/ready) once every REQUIRED_STEPS step is ok.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+# A 1-token completion: verifies credentials, model access and region latency
+WARMUP_PROBE_LLM  = os.getenv("WARMUP_PROBE_LLM", "false").lower() == "true"
+
+# Without these the app can't answer a single request
+REQUIRED_STEPS = ("llm_client", "prompts", "sqlite")
+
+_state = {
+    "state": "pending",  # pending | running | done
+    "started_at": None,
+    "finished_at": None,
+    "duration_ms": None,
+    "steps": {},
+}
+_state_lock = threading.Lock()
+
+
+def _warm_llm_client() -> str:
+    from services.llm_client import get_bedrock_client
+
+    get_bedrock_client()
+    return "bedrock-runtime client ready"
+
+
+def _warm_prompts() -> str:
+    from core.strategy_selector import preload_prompts
+
+    return f"{preload_prompts()} templates cached"
+
+
+def _warm_sqlite() -> str:
+    # Importing the modules registers their schemas on the connection
+    import memory.review_scheduler  # noqa: F401
+    import memory.cohort_analytics  # noqa: F401
+    from memory.sqlite_store import get_connection
+
+    get_connection().execute("SELECT 1")
+    return "learner index open"
+
+
+def _warm_explanation_index() -> str:
+    from memory.explanation_index import get_explanation_index
+
+    index = get_explanation_index()
+    if index is None:
+        return "disabled"
+    index.search("", "", "", "")  # maps the vectors and reads the row metadata
+    return "index loaded"
+
+
+def _warm_cpu_pool() -> str:
+    from services.cpu_pool import get_cpu_pool
+
+    pool = get_cpu_pool()
+    if pool is None:
+        return "inline"
+    started = pool.warm_up()
+    return f"{pool.mode} pool, {started} worker process(es) started" if started else f"{pool.mode} pool"
+
+
+def probe_llm() -> str:
+    """Smallest possible round-trip to the configured model."""
+    from services.llm_client import call_llm
+
+    call_llm("Reply with OK.", system_prompt="", json_mode=False, max_tokens=1)
+    return "model responded"
+
+
+WARMUP_STEPS: dict[str, Callable[[], str]] = {
+    "llm_client":        _warm_llm_client,
+    "prompts":           _warm_prompts,
+    "sqlite":            _warm_sqlite,
+    "explanation_index": _warm_explanation_index,
+    "cpu_pool":          _warm_cpu_pool,
+}
+if WARMUP_PROBE_LLM:
+    WARMUP_STEPS["llm_probe"] = probe_llm
+
+
+def warm_up() -> dict:
+    """Run every warm-up step (blocking). Returns the warm-up report."""
+    started = time.perf_counter()
+    with _state_lock:
+        _state["state"] = "running"
+        _state["started_at"] = time.time()
+        _state["steps"] = {}
+
+    for name, step in WARMUP_STEPS.items():
+        step_started = time.perf_counter()
+        try:
+            detail, ok = step(), True
+        except Exception as e:
+            detail, ok = f"{type(e).__name__}: {e}", False
+            logger.warning(f"Warm-up step '{name}' failed: {detail}")
+        with _state_lock:
+            _state["steps"][name] = {
+                "ok": ok,
+                "ms": round((time.perf_counter() - step_started) * 1000, 1),
+                "detail": detail,
+            }
+
+    with _state_lock:
+        _state["state"] = "done"
+        _state["finished_at"] = time.time()
+        _state["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return get_warmup_report()
+
+
+def is_warmed_up() -> bool:
+    """Warm-up finished and every required step succeeded."""
+    with _state_lock:
+        steps = _state["steps"]
+        return _state["state"] == "done" and all(steps.get(n, {}).get("ok") for n in REQUIRED_STEPS)
+
+
+def get_warmup_report() -> dict:
+    with _state_lock:
+        return {**_state, "steps": {k: dict(v) for k, v in _state["steps"].items()}}